@@ -2,6 +2,7 @@
 
 import logging
 import logging.config
+import multiprocessing
 import os
 from tkinter.ttk import Style
 
@@ -18,26 +19,31 @@ VERSION = "4.0.0"
 # set the backend for credentials
 keyring.set_keyring(WinVaultKeyring())
 
-# check if app is ready/configured and if not launch
-# the installer
-if is_configured():
-    from gui.main import Base
-
-    logging.config.dictConfig(DEV_LOGGING)
-    logger = logging.getLogger("babel")
-
-    app = Base()
-    s = Style()
-    s.theme_use("xpnative")
-    s.configure(".", font=("device", 12))
-    app.iconbitmap("./icons/babel2.ico")
-    app.title(f"Babel v.{VERSION}")
-    app.mainloop()
-else:
-    app = Installer()
-    s = Style()
-    s.theme_use("xpnative")
-    s.configure(".", font=("device", 12))
-    app.iconbitmap("./icons/babel2.ico")
-    app.title("Babel Setup")
-    app.mainloop()
+# batch MARC exports build records in worker processes which import
+# this module on Windows; the app must be launched only by the main process
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+
+    # check if app is ready/configured and if not launch
+    # the installer
+    if is_configured():
+        from gui.main import Base
+
+        logging.config.dictConfig(DEV_LOGGING)
+        logger = logging.getLogger("babel")
+
+        app = Base()
+        s = Style()
+        s.theme_use("xpnative")
+        s.configure(".", font=("device", 12))
+        app.iconbitmap("./icons/babel2.ico")
+        app.title(f"Babel v.{VERSION}")
+        app.mainloop()
+    else:
+        app = Installer()
+        s = Style()
+        s.theme_use("xpnative")
+        s.configure(".", font=("device", 12))
+        app.iconbitmap("./icons/babel2.ico")
+        app.title("Babel Setup")
+        app.mainloop()
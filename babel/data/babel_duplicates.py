@@ -0,0 +1,150 @@
+"""
+Detection of resources ordered previously in Babel.
+
+A resource is a Babel duplicate when another order of a cart of the same
+system & library has the same ISBN (or the same UPC if the resource has
+no ISBN, regardless of ISBN of the other order). Identifiers of all
+resources of a cart are matched against prior orders with one query
+returning matching orders, dup_babel flags of the whole cart are cleared
+with one UPDATE and flags of duplicates set with one UPDATE per batch,
+so the number of queries barely depends on the size of the cart.
+"""
+
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import and_, or_, select, update
+
+try:
+    from data.datastore import Cart, Order, Resource
+except ImportError:
+    from babel.data.datastore import Cart, Order, Resource
+
+
+# number of resource ids per IN list of flag updates
+UPDATE_BATCH_SIZE = 1000
+
+# order of the same identifier found in Babel
+BabelDup = namedtuple("BabelDup", ["cart_id", "cart_name", "order_id"])
+
+
+def cart_identifiers_stmn(cart_id: int, checked_before: datetime = None):
+    """
+    Creates query of identifiers of cart resources; checked_before limits
+    it to resources due for catalog duplicate recheck: never checked
+    (including ones which ISBN or UPC changed since, see datastore's
+    `reset_dup_timestamp`), checked before that time, or which search failed
+    """
+    stmn = (
+        select(Resource.did, Resource.order_id, Resource.isbn, Resource.upc)
+        .join(Order, Order.did == Resource.order_id)
+        .where(Order.cart_id == cart_id)
+    )
+    if checked_before is not None:
+        stmn = stmn.where(
+            or_(
+                Resource.dup_timestamp.is_(None),
+                Resource.dup_timestamp < checked_before,
+                and_(
+                    Resource.dup_catalog.is_(None),
+                    or_(Resource.isbn.isnot(None), Resource.upc.isnot(None)),
+                ),
+            )
+        )
+    return stmn
+
+
+def babel_matches_stmn(cart_id: int, system_id: int, library_id: int):
+    """
+    Creates query of orders of the system & library which resources share
+    ISBN with resources of the cart or UPC with cart resources without ISBN
+    """
+    cart_isbns = (
+        select(Resource.isbn)
+        .join(Order, Order.did == Resource.order_id)
+        .where(Order.cart_id == cart_id, Resource.isbn.isnot(None))
+    )
+    cart_upcs = (
+        select(Resource.upc)
+        .join(Order, Order.did == Resource.order_id)
+        .where(
+            Order.cart_id == cart_id,
+            Resource.isbn.is_(None),
+            Resource.upc.isnot(None),
+        )
+    )
+    return (
+        select(
+            Resource.isbn,
+            Resource.upc,
+            Order.did.label("order_id"),
+            Cart.did.label("cart_id"),
+            Cart.name.label("cart_name"),
+        )
+        .join(Order, Order.did == Resource.order_id)
+        .join(Cart, Cart.did == Order.cart_id)
+        .where(
+            Cart.system_id == system_id,
+            Cart.library_id == library_id,
+            or_(
+                Resource.isbn.in_(cart_isbns),
+                Resource.upc.in_(cart_upcs),
+            ),
+        )
+        .order_by(Cart.did, Order.did)
+    )
+
+
+def find_babel_duplicates(session, cart_id: int) -> dict:
+    """
+    Finds previous orders of cart resources and marks them as Babel
+    duplicates; flags of resources without matches are cleared
+
+    args:
+        session: sqlalchemy Session instance
+        cart_id: int, datastore cart did
+    returns:
+        duplicates: dict of {resource did: list of BabelDup} including only
+                    resources with matches
+    """
+    cart_rec = session.execute(
+        select(Cart.system_id, Cart.library_id).where(Cart.did == cart_id)
+    ).one()
+
+    matches = {}
+    for row in session.execute(
+        babel_matches_stmn(cart_id, cart_rec.system_id, cart_rec.library_id)
+    ):
+        dup = BabelDup(row.cart_id, row.cart_name, row.order_id)
+        if row.isbn:
+            matches.setdefault(("isbn", row.isbn), []).append(dup)
+        if row.upc:
+            matches.setdefault(("upc", row.upc), []).append(dup)
+
+    duplicates = {}
+    for row in session.execute(cart_identifiers_stmn(cart_id)):
+        if row.isbn:
+            key = ("isbn", row.isbn)
+        elif row.upc:
+            key = ("upc", row.upc)
+        else:
+            continue
+        others = [m for m in matches.get(key, []) if m.order_id != row.order_id]
+        if others:
+            duplicates[row.did] = others
+
+    session.execute(
+        update(Resource)
+        .where(Resource.order_id.in_(select(Order.did).where(Order.cart_id == cart_id)))
+        .values(dup_babel=False)
+        .execution_options(synchronize_session=False)
+    )
+    dids = list(duplicates)
+    for n in range(0, len(dids), UPDATE_BATCH_SIZE):
+        session.execute(
+            update(Resource)
+            .where(Resource.did.in_(dids[n : n + UPDATE_BATCH_SIZE]))
+            .values(dup_babel=True)
+            .execution_options(synchronize_session=False)
+        )
+    return duplicates
@@ -0,0 +1,271 @@
+"""
+Set-based updates of cart orders.
+
+Global changes to a cart are executed as a handful of statements
+independent of the number of orders: one UPDATE of order attributes,
+one UPDATE of resource prices computed in SQL, and replacement
+of order locations with a bulk DELETE followed by batches of
+executemany INSERTs. Grids appended to orders are merged with existing
+locations in memory and written back with executemany UPDATEs & INSERTs.
+Results of catalog searches are written back with executemany UPDATEs.
+"""
+
+from collections import OrderedDict
+from decimal import Decimal
+
+from sqlalchemy import bindparam, case, delete, select, update
+
+try:
+    from data.datastore import Order, OrderLocation, Resource
+    from data.datastore_worker import insert_many
+except ImportError:
+    from babel.data.datastore import Order, OrderLocation, Resource
+    from babel.data.datastore_worker import insert_many
+
+
+# number of orders which locations are inserted per executemany statement
+LOCATIONS_BATCH_SIZE = 1000
+
+
+def cart_order_ids_stmn(cart_id: int):
+    return select(Order.did).where(Order.cart_id == cart_id)
+
+
+def update_cart_orders(session, cart_id: int, **kwargs) -> int:
+    """
+    Sets given Order attributes of all orders in the cart
+
+    args:
+        session: sqlalchemy Session instance
+        cart_id: int, datastore cart did
+        kwargs: Order column values
+    returns:
+        rowcount: int, number of updated orders
+    """
+    if not kwargs:
+        return 0
+    result = session.execute(
+        update(Order)
+        .where(Order.cart_id == cart_id)
+        .values(**kwargs)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def update_cart_prices(
+    session, cart_id: int, list_price: Decimal = None, discount: Decimal = None
+) -> int:
+    """
+    Sets list price and/or recalculates discounted price of all resources
+    in the cart. Discounted price is computed in the datastore from each
+    resource's list price; resources without list price keep their
+    discounted price.
+
+    args:
+        session: sqlalchemy Session instance
+        cart_id: int, datastore cart did
+        list_price: Decimal, new list price of all resources
+        discount: Decimal, discount percentage
+    returns:
+        rowcount: int, number of updated resources
+    """
+    values = {}
+    if list_price is not None:
+        values["price_list"] = list_price
+        if discount:
+            values["price_disc"] = list_price - ((list_price * discount) / 100)
+        else:
+            values["price_disc"] = list_price
+    elif discount is not None:
+        values["price_disc"] = case(
+            (Resource.price_list.is_(None), Resource.price_disc),
+            else_=Resource.price_list - (Resource.price_list * discount / 100),
+        )
+    if not values:
+        return 0
+
+    result = session.execute(
+        update(Resource)
+        .where(Resource.order_id.in_(cart_order_ids_stmn(cart_id)))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def _delete_locations(session, order_ids) -> None:
+    session.execute(
+        delete(OrderLocation)
+        .where(OrderLocation.order_id.in_(order_ids))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def replace_order_locations(
+    session,
+    order_ids: list,
+    grid_locations: list,
+    progbar=None,
+    batch_size: int = LOCATIONS_BATCH_SIZE,
+) -> int:
+    """
+    Replaces locations of given orders with copies of distribution grid
+    locations. Existing locations of orders given as select are removed
+    with one DELETE, a list of ids is processed in batches. New locations
+    are inserted with one executemany statement per batch of orders.
+
+    args:
+        session: sqlalchemy Session instance
+        order_ids: list of datastore order dids or select of them
+        grid_locations: list of GridLocation instances
+        progbar: tkinter Progressbar widget, advanced per batch of orders
+        batch_size: int, number of orders per INSERT statement
+    returns:
+        rowcount: int, number of inserted locations
+    """
+    if isinstance(order_ids, list):
+        # long lists of ids are deleted in batches to stay within
+        # limits of bound parameters per statement
+        delete_batches = True
+    else:
+        _delete_locations(session, order_ids)
+        order_ids = [did for did, in session.execute(order_ids)]
+        delete_batches = False
+
+    grid_values = [
+        dict(branch_id=l.branch_id, shelfcode_id=l.shelfcode_id, qty=l.qty)
+        for l in grid_locations
+    ]
+    inserted = 0
+    for n in range(0, len(order_ids), batch_size):
+        batch = order_ids[n : n + batch_size]
+        if delete_batches:
+            _delete_locations(session, batch)
+        inserted += insert_many(
+            session,
+            OrderLocation,
+            [dict(order_id=oid, **values) for oid in batch for values in grid_values],
+        )
+        if progbar is not None:
+            progbar["value"] += len(batch)
+            progbar.update()
+    return inserted
+
+
+def _grid_quantities(grid_locations) -> OrderedDict:
+    quantities = OrderedDict()
+    for l in grid_locations:
+        key = (l.branch_id, l.shelfcode_id)
+        quantities[key] = quantities.get(key, 0) + (l.qty or 0)
+    return quantities
+
+
+def append_order_locations(
+    session,
+    order_ids: list,
+    grid_locations: list,
+    progbar=None,
+    batch_size: int = LOCATIONS_BATCH_SIZE,
+) -> tuple:
+    """
+    Adds distribution grid locations to given orders. Quantities of grid
+    locations matching existing location's branch & shelf code are added
+    to the existing location, the other grid locations are inserted.
+    Each batch of orders costs one SELECT, one executemany UPDATE and one
+    executemany INSERT.
+
+    args:
+        session: sqlalchemy Session instance
+        order_ids: list of datastore order dids
+        grid_locations: list of GridLocation instances
+        progbar: tkinter Progressbar widget, advanced per batch of orders
+        batch_size: int, number of orders per batch
+    returns:
+        tuple of (updated, inserted) counts of order locations
+    """
+    grid_qty = _grid_quantities(grid_locations)
+    update_stmn = (
+        update(OrderLocation)
+        .where(OrderLocation.did == bindparam("loc_did"))
+        .values(qty=bindparam("new_qty"))
+        .execution_options(synchronize_session=False)
+    )
+
+    updated = inserted = 0
+    for n in range(0, len(order_ids), batch_size):
+        batch = order_ids[n : n + batch_size]
+
+        # existing locations keyed by (order_id, branch_id, shelfcode_id)
+        existing = {}
+        for row in session.execute(
+            select(
+                OrderLocation.did,
+                OrderLocation.order_id,
+                OrderLocation.branch_id,
+                OrderLocation.shelfcode_id,
+                OrderLocation.qty,
+            ).where(OrderLocation.order_id.in_(batch))
+        ):
+            key = (row.order_id, row.branch_id, row.shelfcode_id)
+            existing.setdefault(key, []).append(row)
+
+        updates, inserts = [], []
+        for oid in batch:
+            for (branch_id, shelfcode_id), qty in grid_qty.items():
+                matches = existing.get((oid, branch_id, shelfcode_id))
+                if matches:
+                    for row in matches:
+                        updates.append(
+                            dict(loc_did=row.did, new_qty=(row.qty or 0) + qty)
+                        )
+                else:
+                    inserts.append(
+                        dict(
+                            order_id=oid,
+                            branch_id=branch_id,
+                            shelfcode_id=shelfcode_id,
+                            qty=qty,
+                        )
+                    )
+
+        if updates:
+            session.execute(update_stmn, updates)
+            updated += len(updates)
+        inserted += insert_many(session, OrderLocation, inserts)
+
+        if progbar is not None:
+            progbar["value"] += len(batch)
+            progbar.update()
+    return updated, inserted
+
+
+def update_catalog_dups(session, results: list, timestamp=None) -> int:
+    """
+    Records results of catalog duplicate searches with one
+    executemany UPDATE
+
+    args:
+        session: sqlalchemy Session instance
+        results: list of (resource did, catalog_dup, dup_bibs) tuples
+        timestamp: datetime, time of searches
+    returns:
+        rowcount: int, number of updated resources
+    """
+    if not results:
+        return 0
+    session.execute(
+        update(Resource)
+        .where(Resource.did == bindparam("res_did"))
+        .values(
+            dup_catalog=bindparam("catalog_dup"),
+            dup_bibs=bindparam("bibs"),
+            dup_timestamp=bindparam("searched"),
+        )
+        .execution_options(synchronize_session=False),
+        [
+            dict(res_did=did, catalog_dup=dup, bibs=bibs, searched=timestamp)
+            for did, dup, bibs in results
+        ],
+    )
+    return len(results)
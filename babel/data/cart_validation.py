@@ -0,0 +1,157 @@
+"""
+Cart validation before finalization.
+
+All order, resource, location & branch values needed for validation are
+retrieved with one projection query ordered by order and location, and
+funds are checked against rules loaded once per cart, so the number of
+queries does not depend on the size of the cart.
+"""
+
+from collections import OrderedDict
+
+from sqlalchemy import select
+
+try:
+    from data.datastore import Branch, Cart, Order, OrderLocation, Resource
+    from data.fund_rules import load_fund_rules
+    from data.lookup_memo import session_memo
+except ImportError:
+    from babel.data.datastore import Branch, Cart, Order, OrderLocation, Resource
+    from babel.data.fund_rules import load_fund_rules
+    from babel.data.lookup_memo import session_memo
+
+
+def cart_validation_stmn(cart_id: int):
+    return (
+        select(
+            Order.did.label("order_id"),
+            Order.lang_id,
+            Order.audn_id,
+            Order.vendor_id,
+            Order.matType_id,
+            Resource.title,
+            Resource.price_disc,
+            Resource.dup_catalog,
+            Resource.dup_babel,
+            OrderLocation.did.label("loc_id"),
+            OrderLocation.branch_id,
+            OrderLocation.shelfcode_id,
+            OrderLocation.qty,
+            OrderLocation.fund_id,
+            Branch.code.label("branch_code"),
+            Branch.temp_closed,
+        )
+        .outerjoin(Resource, Resource.order_id == Order.did)
+        .outerjoin(OrderLocation, OrderLocation.order_id == Order.did)
+        .outerjoin(Branch, Branch.did == OrderLocation.branch_id)
+        .where(Order.cart_id == cart_id)
+        .order_by(Order.did, OrderLocation.did)
+    )
+
+
+def cart_fund_ids_stmn(cart_id: int):
+    return (
+        select(OrderLocation.fund_id)
+        .join(Order, Order.did == OrderLocation.order_id)
+        .where(Order.cart_id == cart_id)
+        .distinct()
+    )
+
+
+def _order_issues(row) -> list:
+    ord_issues = []
+    if not row.lang_id:
+        ord_issues.append("language")
+    if not row.audn_id:
+        ord_issues.append("audience")
+    if not row.vendor_id:
+        ord_issues.append("vendor")
+    if not row.matType_id:
+        ord_issues.append("material type")
+    if not row.title:
+        ord_issues.append("title")
+    if not row.price_disc:
+        ord_issues.append("discount price")
+    if row.dup_catalog:
+        ord_issues.append("catalog duplicate")
+    if row.dup_babel:
+        ord_issues.append("previously ordered")
+    return ord_issues
+
+
+def _location_issues(row, library_id, fund_rules, fund_checks) -> list:
+    loc_issues = []
+    if not row.branch_id:
+        loc_issues.append("no branch")
+    elif row.temp_closed:
+        loc_issues.append(f"branch closed ({row.branch_code})")
+    if not row.shelfcode_id:
+        loc_issues.append("no shelf code")
+    if not row.qty:
+        loc_issues.append("no quantity")
+    if not row.fund_id:
+        loc_issues.append("no fund")
+    else:
+        # locations of a cart repeat few fund, audience, material & branch
+        # combinations
+        key = (row.fund_id, library_id, row.audn_id, row.matType_id, row.branch_id)
+        if not fund_checks.get(key, lambda: fund_rules.permits(*key)):
+            loc_issues.append("(incorrect) fund")
+    return loc_issues
+
+
+def validate_cart(session, cart_id: int) -> tuple:
+    """
+    Finds missing and incorrect values in cart orders
+
+    args:
+        session: sqlalchemy Session instance
+        cart_id: int, datastore cart did
+    returns:
+        tuple of (iss_count, issues) where issues is an OrderedDict of
+        cart level issue (key 0) and {order number: (order issues,
+        {location number: location issues})}; orders & locations are
+        numbered from 1 in their display order
+    """
+    issues = OrderedDict()
+    iss_count = 0
+
+    cart_rec = session.query(Cart).filter_by(did=cart_id).one()
+    if cart_rec.system_id == 1 and cart_rec.library_id != 1:
+        iss_count += 1
+        issues[0] = "BPL cart library parameter must be set to 'branches'"
+    elif cart_rec.system_id == 2:
+        if not cart_rec.library_id or cart_rec.library_id == 3:
+            iss_count += 1
+            issues[0] = "NYPL carts must specify library"
+
+    fund_rules = load_fund_rules(session, fund_ids=cart_fund_ids_stmn(cart_id))
+    fund_checks = session_memo(session, "fund_check")
+
+    n = 0
+    current_order = None
+    for row in session.execute(cart_validation_stmn(cart_id)):
+        if row.order_id != current_order:
+            current_order = row.order_id
+            n += 1
+            m = 0
+            ord_issues = _order_issues(row)
+            grid_issues = OrderedDict()
+            iss_count += len(ord_issues)
+            if row.loc_id is None:
+                iss_count += 1
+                ord_issues.append("locations")
+            if ord_issues:
+                issues[n] = (ord_issues, grid_issues)
+
+        if row.loc_id is None:
+            continue
+        m += 1
+        loc_issues = _location_issues(row, cart_rec.library_id, fund_rules, fund_checks)
+        if loc_issues:
+            iss_count += len(loc_issues)
+            grid_issues[m] = loc_issues
+            if n not in issues:
+                issues[n] = (ord_issues, grid_issues)
+
+    return iss_count, issues
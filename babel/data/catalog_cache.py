@@ -0,0 +1,309 @@
+"""
+Persistent cache of catalog lookups kept in the datastore, so results
+fetched on one workstation are reused by all.
+
+Results of catalog duplicate searches are cached per ISBN or UPC,
+system and, for NYPL, library (branches or research), because Platform
+matches are limited to bibs with locations of the library. Bib & item
+data displayed for catalog duplicates are cached per system and bib
+number. Entries older than the TTL set in settings are ignored and
+replaced by the next lookup; forced refresh bypasses cached entries
+but still stores fetched ones. Hits & misses of each lookup are logged
+and, when query profiling is enabled, appended to the profile log.
+Cache settings also hold the age of catalog duplicate checks after which
+incremental searches recheck resources. Cache tables missing in datastores
+predating them are created on first use; if that fails lookups skip
+the cache.
+"""
+
+from datetime import datetime, timedelta
+import json
+import logging
+import shelve
+from typing import Optional
+
+from sqlalchemy import delete, insert, select
+
+try:
+    from data.datastore import CatalogBibCache, CatalogDupCache, ensure_table
+    from data.query_profiler import append_to_profile_log
+except ImportError:
+    from babel.data.datastore import CatalogBibCache, CatalogDupCache, ensure_table
+    from babel.data.query_profiler import append_to_profile_log
+
+
+mlogger = logging.getLogger("babel")
+
+
+# user_data key of catalog cache settings
+CATALOG_CACHE = "catalog_cache"
+
+# hours after which cached entries are fetched again, 0 disables cache
+TTL_HOURS = 24
+
+# days after which incremental duplicate searches recheck resources
+RECHECK_DAYS = 7
+
+# number of identifiers per IN list
+LOOKUP_BATCH_SIZE = 500
+
+
+def catalog_cache_options(user_data_fh: str) -> dict:
+    """
+    Reads catalog cache settings from user_data
+
+    args:
+        user_data_fh: str, path to user_data
+    returns:
+        options: dict with TTL_HOURS, FORCE_REFRESH & RECHECK_DAYS keys
+    """
+    user_data = shelve.open(user_data_fh)
+    options = user_data.get(CATALOG_CACHE, {})
+    user_data.close()
+    return dict(
+        TTL_HOURS=int(options.get("TTL_HOURS", TTL_HOURS)),
+        FORCE_REFRESH=bool(options.get("FORCE_REFRESH", False)),
+        RECHECK_DAYS=int(options.get("RECHECK_DAYS", RECHECK_DAYS)),
+    )
+
+
+def save_catalog_cache_options(
+    user_data_fh: str, ttl_hours: int, force_refresh: bool, recheck_days: int
+) -> None:
+    user_data = shelve.open(user_data_fh)
+    user_data[CATALOG_CACHE] = dict(
+        TTL_HOURS=ttl_hours, FORCE_REFRESH=force_refresh, RECHECK_DAYS=recheck_days
+    )
+    user_data.close()
+
+
+def cache_library(system_id: int, library: Optional[str]) -> str:
+    """
+    Returns library scope of cached duplicate searches; BPL searches
+    do not depend on library
+    """
+    if system_id == 2:
+        return library or ""
+    return ""
+
+
+def _cutoff(ttl_hours: int, now: datetime = None) -> datetime:
+    return (now or datetime.now()) - timedelta(hours=ttl_hours)
+
+
+def _insert_or_ignore(model):
+    # concurrent workstations may store the same entry, any of them will do
+    return (
+        insert(model)
+        .prefix_with("OR IGNORE", dialect="sqlite")
+        .prefix_with("IGNORE", dialect="mysql")
+    )
+
+
+def cached_catalog_dups(
+    session,
+    system_id: int,
+    library: Optional[str],
+    identifiers: list,
+    ttl_hours: int,
+    now: datetime = None,
+) -> dict:
+    """
+    Retrieves cached results of duplicate searches newer than TTL
+
+    args:
+        session: sqlalchemy Session instance
+        system_id: int, datastore system did
+        library: str, 'branches' or 'research' for NYPL
+        identifiers: list of ISBNs and UPCs
+        ttl_hours: int, maximum age of entries in hours
+        now: datetime, time of the lookup
+    returns:
+        cached: dict of {identifier: (catalog_dup, dup_bibs)}
+    """
+    identifiers = list(dict.fromkeys(identifiers))
+    cached = {}
+    if not ttl_hours or not ensure_table(session.get_bind(), CatalogDupCache):
+        return cached
+    cutoff = _cutoff(ttl_hours, now)
+    library = cache_library(system_id, library)
+    for n in range(0, len(identifiers), LOOKUP_BATCH_SIZE):
+        rows = session.execute(
+            select(
+                CatalogDupCache.identifier,
+                CatalogDupCache.catalog_dup,
+                CatalogDupCache.dup_bibs,
+            ).where(
+                CatalogDupCache.system_id == system_id,
+                CatalogDupCache.library == library,
+                CatalogDupCache.identifier.in_(identifiers[n : n + LOOKUP_BATCH_SIZE]),
+                CatalogDupCache.fetched_at >= cutoff,
+            )
+        )
+        for identifier, catalog_dup, dup_bibs in rows:
+            cached[identifier] = (catalog_dup, dup_bibs)
+    return cached
+
+
+def store_catalog_dups(
+    session,
+    system_id: int,
+    library: Optional[str],
+    results: dict,
+    fetched_at: datetime,
+) -> int:
+    """
+    Replaces cached results of duplicate searches; failed searches
+    (catalog_dup None) are not cached
+
+    args:
+        session: sqlalchemy Session instance
+        system_id: int, datastore system did
+        library: str, 'branches' or 'research' for NYPL
+        results: dict of {identifier: (catalog_dup, dup_bibs)}
+        fetched_at: datetime, time of the searches
+    returns:
+        count: int, number of stored entries
+    """
+    if not ensure_table(session.get_bind(), CatalogDupCache):
+        return 0
+    library = cache_library(system_id, library)
+    mappings = [
+        dict(
+            system_id=system_id,
+            library=library,
+            identifier=identifier,
+            catalog_dup=catalog_dup,
+            dup_bibs=dup_bibs,
+            fetched_at=fetched_at,
+        )
+        for identifier, (catalog_dup, dup_bibs) in results.items()
+        if catalog_dup is not None
+    ]
+    identifiers = [m["identifier"] for m in mappings]
+    for n in range(0, len(identifiers), LOOKUP_BATCH_SIZE):
+        session.execute(
+            delete(CatalogDupCache)
+            .where(
+                CatalogDupCache.system_id == system_id,
+                CatalogDupCache.library == library,
+                CatalogDupCache.identifier.in_(identifiers[n : n + LOOKUP_BATCH_SIZE]),
+            )
+            .execution_options(synchronize_session=False)
+        )
+    if mappings:
+        session.execute(_insert_or_ignore(CatalogDupCache), mappings)
+    return len(mappings)
+
+
+def cached_bib_data(
+    session,
+    system_id: int,
+    sierra_number: str,
+    ttl_hours: int,
+    now: datetime = None,
+) -> Optional[tuple]:
+    """
+    Retrieves cached bib & item data newer than TTL
+
+    args:
+        session: sqlalchemy Session instance
+        system_id: int, datastore system did
+        sierra_number: str, 8 digit bib number
+        ttl_hours: int, maximum age of entry in hours
+        now: datetime, time of the lookup
+    returns:
+        (bib_data, item_data) or None if not cached
+    """
+    if not ttl_hours or not ensure_table(session.get_bind(), CatalogBibCache):
+        return None
+    row = session.execute(
+        select(CatalogBibCache.bib_data, CatalogBibCache.item_data).where(
+            CatalogBibCache.system_id == system_id,
+            CatalogBibCache.sierra_number == sierra_number,
+            CatalogBibCache.fetched_at >= _cutoff(ttl_hours, now),
+        )
+    ).first()
+    if row is None:
+        return None
+    return json.loads(row.bib_data), json.loads(row.item_data)
+
+
+def store_bib_data(
+    session,
+    system_id: int,
+    sierra_number: str,
+    bib_data: Optional[dict],
+    item_data: Optional[list],
+    fetched_at: datetime,
+) -> bool:
+    """
+    Replaces cached bib & item data; failed lookups (bib_data None)
+    are not cached
+
+    returns:
+        stored: bool
+    """
+    if bib_data is None or not ensure_table(session.get_bind(), CatalogBibCache):
+        return False
+    session.execute(
+        delete(CatalogBibCache)
+        .where(
+            CatalogBibCache.system_id == system_id,
+            CatalogBibCache.sierra_number == sierra_number,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    session.execute(
+        _insert_or_ignore(CatalogBibCache),
+        [
+            dict(
+                system_id=system_id,
+                sierra_number=sierra_number,
+                bib_data=json.dumps(bib_data),
+                item_data=json.dumps(item_data),
+                fetched_at=fetched_at,
+            )
+        ],
+    )
+    return True
+
+
+def report_cache_stats(
+    cache: str,
+    operation: str,
+    hits: int,
+    misses: int,
+    profile: bool = False,
+    log_fh: str = None,
+) -> None:
+    """
+    Logs hit rate of a lookup; if profiling is enabled appends it also
+    to the profile log (PROFILE_LOG_PATH if log_fh not given)
+
+    args:
+        cache: str, name of the cache
+        operation: str, name of the lookup
+        hits: int, number of entries found in cache
+        misses: int, number of entries fetched from catalog
+        profile: bool, query profiling enabled in settings
+    """
+    total = hits + misses
+    hit_rate = hits / total if total else 0.0
+    mlogger.debug(
+        f"Catalog cache {cache} on {operation}: {hits} hits/{misses} misses "
+        f"({hit_rate:.0%})."
+    )
+    if not profile:
+        return
+    append_to_profile_log(
+        dict(
+            started=datetime.now().isoformat(timespec="seconds"),
+            cache=cache,
+            operation=operation,
+            hits=hits,
+            misses=misses,
+            hit_rate=round(hit_rate, 4),
+        ),
+        log_fh,
+    )
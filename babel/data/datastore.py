@@ -4,22 +4,33 @@ Defines and initiates local DB that stores Babel data
 
 from contextlib import contextmanager
 from datetime import datetime
+import logging
+import os
+import threading
+import weakref
 
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     DateTime,
     Float,
     Column,
     ForeignKey,
+    Index,
     Integer,
     String,
+    Text,
     UniqueConstraint,
+    event,
+    select,
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.inspection import inspect
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship, sessionmaker, Session
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import mysql
 from sqlalchemy.engine import URL
+from sqlalchemy.pool import StaticPool
 
 # from sqlalchemy.sql import text
 import shelve
@@ -29,21 +40,58 @@ try:
     from credentials import get_from_vault
     from data.datastore_values import *
     from data.datastore_worker import insert_or_ignore
+    from data.query_profiler import (
+        instrument_engine,
+        profile_session,
+        profiling_options,
+    )
     from paths import get_user_data_handle
 except ImportError:
     from babel.credentials import get_from_vault
     from babel.data.datastore_values import *
     from babel.data.datastore_worker import insert_or_ignore
+    from babel.data.query_profiler import (
+        instrument_engine,
+        profile_session,
+        profiling_options,
+    )
     from babel.paths import get_user_data_handle
 
+
+mlogger = logging.getLogger("babel")
+
 DB_DIALECT = "mysql"
 DB_DRIVER = "pymysql"
 DB_CHARSET = "utf8"
 
+# local datastore mode for development & benchmarking, selected with
+# DB_DIALECT="sqlite" key of user_data["db_config"]; DB_PATH key points
+# to the database file, in-memory datastore is used if it is omitted
+SQLITE_DIALECT = "sqlite"
+SQLITE_MEMORY = ":memory:"
+
+# connection pool defaults, can be overridden with optional
+# DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE & DB_POOL_PRE_PING
+# keys of user_data["db_config"]
+DB_POOL_SIZE = 5
+DB_MAX_OVERFLOW = 10
+DB_POOL_RECYCLE = 3600  # seconds; must be shorter than server's wait_timeout
+DB_POOL_PRE_PING = True
+
 
 Base = declarative_base()
 
 
+def bin_string(length: int):
+    """
+    Case & accent sensitive string type. The collation applies to
+    MySQL only, other dialects compare strings binary by default.
+    """
+    return String(length).with_variant(
+        mysql.VARCHAR(length, collation="utf8_bin"), DB_DIALECT
+    )
+
+
 class System(Base):
     __tablename__ = "system"
     did = Column(Integer, primary_key=True, autoincrement=False)
@@ -201,7 +249,7 @@ class DistSet(Base):
     )
 
     did = Column(Integer, primary_key=True)
-    name = Column(String(80, collation="utf8_bin"), nullable=False)
+    name = Column(bin_string(80), nullable=False)
     system_id = Column(Integer, ForeignKey("system.did"), nullable=False)
     user_id = Column(Integer, ForeignKey("user.did"), nullable=False)
 
@@ -290,25 +338,25 @@ class Resource(Base):
     __tablename__ = "resource"
 
     did = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey("order.did"), nullable=False)
-    title = Column(String(length=250, collation="utf8_bin"), nullable=False)
-    add_title = Column(String(length=250, collation="utf8_bin"))
-    author = Column(String(length=150, collation="utf8_bin"))
-    series = Column(String(length=250, collation="utf8_bin"))
-    publisher = Column(String(length=150, collation="utf8_bin"))
+    order_id = Column(Integer, ForeignKey("order.did"), nullable=False, index=True)
+    title = Column(bin_string(250), nullable=False)
+    add_title = Column(bin_string(250))
+    author = Column(bin_string(150))
+    series = Column(bin_string(250))
+    publisher = Column(bin_string(150))
     pub_date = Column(String(25))
-    pub_place = Column(String(length=50, collation="utf8_bin"))
-    summary = Column(String(length=500, collation="utf8_bin"))
-    isbn = Column(String(13))
-    upc = Column(String(20))
-    other_no = Column(String(25))
+    pub_place = Column(bin_string(50))
+    summary = Column(bin_string(500))
+    isbn = Column(String(13), index=True)
+    upc = Column(String(20), index=True)
+    other_no = Column(String(25), index=True)
     price_list = Column(Float(asdecimal=True))
     price_disc = Column(Float(asdecimal=True), default=0.0, nullable=False)
-    desc_url = Column(String(length=500, collation="utf8_bin"))
+    desc_url = Column(bin_string(500))
     misc = Column(String(250))
     dup_babel = Column(Boolean)
     dup_catalog = Column(Boolean)
-    dup_bibs = Column(String(length=200, collation="utf8_bin"))
+    dup_bibs = Column(bin_string(200))
     dup_timestamp = Column(DateTime)
 
     order = relationship("Order", back_populates="resource", lazy="joined")
@@ -323,11 +371,12 @@ class Cart(Base):
     __tablename__ = "cart"
     __table_args__ = (
         UniqueConstraint("name", "system_id", "user_id", name="uix_cart"),
+        Index("ix_cart_system_id_library_id", "system_id", "library_id"),
     )
 
     did = Column(Integer, primary_key=True)
     name = Column(String(75), nullable=False)
-    created = Column(DateTime, nullable=False, default=datetime.now())
+    created = Column(DateTime, nullable=False, default=datetime.now(), index=True)
     updated = Column(DateTime, nullable=False, default=datetime.now())
     status_id = Column(Integer, ForeignKey("status.did"), nullable=False, default=1)
     linked = Column(Boolean, nullable=False, default=False)
@@ -348,10 +397,10 @@ class Order(Base):
     __tablename__ = "order"
 
     did = Column(Integer, primary_key=True)
-    oid = Column(String(9))
-    bid = Column(String(10))
-    wlo = Column(String(13))
-    cart_id = Column(Integer, ForeignKey("cart.did"), nullable=False)
+    oid = Column(String(9), index=True)
+    bid = Column(String(10), index=True)
+    wlo = Column(String(13), index=True)
+    cart_id = Column(Integer, ForeignKey("cart.did"), nullable=False, index=True)
     lang_id = Column(Integer, ForeignKey("lang.did"))
     audn_id = Column(Integer, ForeignKey("audn.did"))
     vendor_id = Column(Integer, ForeignKey("vendor.did"))
@@ -385,7 +434,7 @@ class OrderLocation(Base):
     __tablename__ = "orderlocation"
 
     did = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey("order.did"), nullable=False)
+    order_id = Column(Integer, ForeignKey("order.did"), nullable=False, index=True)
     branch_id = Column(Integer, ForeignKey("branch.did"))
     shelfcode_id = Column(Integer, ForeignKey("shelfcode.did"))
     qty = Column(Integer)
@@ -459,6 +508,218 @@ class Wlos(Base):
         return f"<Wlo({attrs})>"
 
 
+class RefVersion(Base):
+    """
+    stores version stamps of reference tables (languages, vendors, funds,
+    etc.) which are bumped on each change and allow workstations
+    to keep their in-memory copies of these tables up to date
+    """
+
+    __tablename__ = "refversion"
+
+    name = Column(String(25), primary_key=True, autoincrement=False)
+    version = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        state = inspect(self)
+        attrs = ", ".join([f"{attr.key}={attr.loaded_value!r}" for attr in state.attrs])
+        return f"<RefVersion({attrs})>"
+
+
+class Sequence(Base):
+    """
+    stores named counters of last allocated values (wlo numbers, blanket
+    PO suffixes); blocks of values are reserved by incrementing a counter
+    with a single UPDATE, so concurrent workstations never receive
+    the same value
+    """
+
+    __tablename__ = "sequence"
+
+    name = Column(String(50), primary_key=True, autoincrement=False)
+    value = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        state = inspect(self)
+        attrs = ", ".join([f"{attr.key}={attr.loaded_value!r}" for attr in state.attrs])
+        return f"<Sequence({attrs})>"
+
+
+class CatalogDupCache(Base):
+    """
+    caches results of catalog duplicate searches of ISBNs & UPCs;
+    NYPL results depend on library (branches or research) which
+    locations bibs must have, BPL results are stored with empty library
+    """
+
+    __tablename__ = "catalog_dup_cache"
+
+    system_id = Column(Integer, primary_key=True, autoincrement=False)
+    library = Column(String(8), primary_key=True, default="")
+    identifier = Column(String(20), primary_key=True)
+    catalog_dup = Column(Boolean, nullable=False)
+    dup_bibs = Column(bin_string(200))
+    fetched_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        state = inspect(self)
+        attrs = ", ".join([f"{attr.key}={attr.loaded_value!r}" for attr in state.attrs])
+        return f"<CatalogDupCache({attrs})>"
+
+
+class CatalogBibCache(Base):
+    """
+    caches bibliographic & item data of Sierra bibs as JSON
+    """
+
+    __tablename__ = "catalog_bib_cache"
+
+    system_id = Column(Integer, primary_key=True, autoincrement=False)
+    sierra_number = Column(String(10), primary_key=True)
+    bib_data = Column(Text().with_variant(mysql.MEDIUMTEXT(), DB_DIALECT))
+    item_data = Column(Text().with_variant(mysql.MEDIUMTEXT(), DB_DIALECT))
+    fetched_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        state = inspect(self)
+        attrs = ", ".join([f"{attr.key}={attr.loaded_value!r}" for attr in state.attrs])
+        return f"<CatalogBibCache({attrs})>"
+
+
+# models of reference tables and version stamp names they bump
+REFERENCE_TABLES = {
+    Audn: "audn",
+    Branch: "branch",
+    Fund: "fund",
+    FundAudnJoiner: "fund",
+    FundBranchJoiner: "fund",
+    FundLibraryJoiner: "fund",
+    FundMatTypeJoiner: "fund",
+    Lang: "lang",
+    Library: "library",
+    MatType: "mattype",
+    ShelfCode: "shelfcode",
+    Status: "status",
+    System: "system",
+    User: "user",
+    Vendor: "vendor",
+}
+
+# version of the datastore schema, bump when tables or indexes are added;
+# recorded by `initialize_datastore` & `upgrade_datastore` in refversion
+SCHEMA_VERSION = 1
+SCHEMA_STAMP = "schema"
+
+
+def schema_version(engine) -> int:
+    """
+    Returns schema version recorded in the datastore, 0 for datastores
+    predating versioning
+    """
+    if not inspect(engine).has_table(RefVersion.__tablename__):
+        return 0
+    with engine.connect() as conn:
+        version = conn.execute(
+            select(RefVersion.version).where(RefVersion.name == SCHEMA_STAMP)
+        ).scalar()
+    return version or 0
+
+
+# presence of tables added in later releases in datastores of engines:
+# {engine: {table name: True if present, False if absent, None if it could
+# not be created}}; disposed engines are dropped with their entries
+_table_presence = weakref.WeakKeyDictionary()
+
+
+def _tables_of(bind) -> tuple:
+    engine = getattr(bind, "engine", bind)
+    return engine, _table_presence.setdefault(engine, {})
+
+
+def has_table(bind, model) -> bool:
+    """
+    Checks (once per engine) if datastore includes table of the model.
+    Datastores created before it was introduced lack it.
+
+    Args:
+        bind:                   `sqlalchemy.engine.Engine` or `Connection`
+        model:                  declarative model class
+
+    Returns:
+        bool
+    """
+    engine, tables = _tables_of(bind)
+    name = model.__tablename__
+    if name not in tables:
+        tables[name] = inspect(engine).has_table(name)
+    return bool(tables[name])
+
+
+def ensure_table(bind, model) -> bool:
+    """
+    Creates table of the model in datastores predating it. Creation is
+    attempted once per engine, failures (e.g. lacking privileges) are
+    remembered too.
+
+    Args:
+        bind:                   `sqlalchemy.engine.Engine` or `Connection`
+        model:                  declarative model class
+
+    Returns:
+        True if table is present, False if it could not be created
+    """
+    engine, tables = _tables_of(bind)
+    name = model.__tablename__
+    if tables.get(name, False) is False:
+        try:
+            model.__table__.create(engine, checkfirst=True)
+        except Exception as exc:
+            mlogger.warning(f"Unable to create {name} table. Error: {exc}")
+            tables[name] = None
+        else:
+            tables[name] = True
+    return bool(tables[name])
+
+
+@event.listens_for(Session, "before_flush")
+def bump_ref_versions(session, flush_context, instances):
+    """
+    Increments version stamps of reference tables modified in the flush
+    as part of the same transaction
+    """
+    names = set()
+    for instance in session.new | session.dirty | session.deleted:
+        name = REFERENCE_TABLES.get(type(instance))
+        if name and (instance not in session.dirty or session.is_modified(instance)):
+            names.add(name)
+
+    if not names or not has_table(session.get_bind(), RefVersion):
+        return
+
+    table = RefVersion.__table__
+    for name in sorted(names):
+        result = session.execute(
+            table.update()
+            .where(table.c.name == name)
+            .values(version=table.c.version + 1)
+        )
+        if result.rowcount == 0:
+            session.execute(table.insert().values(name=name, version=1))
+
+    session.info.setdefault("ref_changed", set()).update(names)
+
+
+@event.listens_for(Resource.isbn, "set", active_history=True)
+@event.listens_for(Resource.upc, "set", active_history=True)
+def reset_dup_timestamp(target, value, oldvalue, initiator):
+    """
+    Marks stored resources which ISBN or UPC changed as never checked
+    for catalog duplicates, so incremental duplicate search rechecks them
+    """
+    if value != oldvalue and inspect(target).persistent:
+        target.dup_timestamp = None
+
+
 def datastore_url(user_data_fh: str) -> URL:
     """
     Creates database URL
@@ -472,39 +733,238 @@ def datastore_url(user_data_fh: str) -> URL:
     user_data = shelve.open(user_data_fh)
     if "db_config" in user_data:
         db_details = user_data["db_config"]
-        passw = get_from_vault("babel_db", db_details["DB_USER"])
-        db_url = URL.create(
-            drivername=DB_DIALECT + "+" + DB_DRIVER,
-            username=db_details["DB_USER"],
-            password=passw,
-            host=db_details["DB_HOST"],
-            port=db_details["DB_PORT"],
-            database=db_details["DB_NAME"],
-            query={"charset": DB_CHARSET},
-        )
+        if db_details.get("DB_DIALECT", DB_DIALECT) == SQLITE_DIALECT:
+            db_url = sqlite_url(db_details.get("DB_PATH"))
+        else:
+            passw = get_from_vault("babel_db", db_details["DB_USER"])
+            db_url = URL.create(
+                drivername=DB_DIALECT + "+" + DB_DRIVER,
+                username=db_details["DB_USER"],
+                password=passw,
+                host=db_details["DB_HOST"],
+                port=db_details["DB_PORT"],
+                database=db_details["DB_NAME"],
+                query={"charset": DB_CHARSET},
+            )
     else:
         db_url = None
     user_data.close()
     return db_url
 
 
+def sqlite_url(db_path: str = None) -> URL:
+    """
+    Creates URL of local SQLite datastore
+
+    Args:
+        db_path:                path to database file, in-memory database
+                                if omitted
+
+    Returns:
+        `sqlalchemy.engine.url.URL` instance
+    """
+    if db_path == SQLITE_MEMORY:
+        db_path = None
+    return URL.create(drivername=SQLITE_DIALECT, database=db_path or None)
+
+
+def _option_int(value, default: int, minimum: int) -> int:
+    # user_data values may be entered by hand, fall back on invalid ones
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    if value < minimum:
+        return default
+    return value
+
+
+def _option_bool(value, default: bool) -> bool:
+    # user_data values may be stored as strings like "False" or "0"
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in ("1", "true", "yes", "on"):
+        return True
+    if value in ("0", "false", "no", "off"):
+        return False
+    return default
+
+
+def datastore_pool_options(user_data_fh: str) -> dict:
+    """
+    Determines connection pool parameters of the datastore engine
+
+    Args:
+        user_data_fh:           path to user_data
+
+    Returns:
+        dictionary of `sqlalchemy.create_engine` pool arguments
+    """
+    user_data = shelve.open(user_data_fh)
+    db_details = user_data.get("db_config", {})
+    user_data.close()
+
+    if db_details.get("DB_DIALECT", DB_DIALECT) == SQLITE_DIALECT:
+        if db_details.get("DB_PATH", SQLITE_MEMORY) in (None, "", SQLITE_MEMORY):
+            # all sessions and threads must share the single connection
+            # holding in-memory database
+            return dict(poolclass=StaticPool, connect_args={"check_same_thread": False})
+        return dict(connect_args={"check_same_thread": False})
+
+    return dict(
+        pool_size=_option_int(db_details.get("DB_POOL_SIZE"), DB_POOL_SIZE, 1),
+        max_overflow=_option_int(db_details.get("DB_MAX_OVERFLOW"), DB_MAX_OVERFLOW, 0),
+        pool_recycle=_option_int(
+            db_details.get("DB_POOL_RECYCLE"), DB_POOL_RECYCLE, -1
+        ),
+        pool_pre_ping=_option_bool(
+            db_details.get("DB_POOL_PRE_PING"), DB_POOL_PRE_PING
+        ),
+    )
+
+
+def _enforce_sqlite_foreign_keys(dbapi_conn, connection_record):
+    # SQLite ignores foreign key constraints unless asked per connection
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def create_datastore_engine(db_url, **kwargs):
+    """
+    Creates engine with dialect specific set-up
+
+    Args:
+        db_url:                 `sqlalchemy.engine.url.URL` or str
+        kwargs:                 `sqlalchemy.create_engine` arguments
+
+    Returns:
+        `sqlalchemy.engine.Engine` instance
+    """
+    engine = create_engine(db_url, **kwargs)
+    if engine.dialect.name == SQLITE_DIALECT:
+        event.listen(engine, "connect", _enforce_sqlite_foreign_keys)
+    return engine
+
+
 class DataAccessLayer:
     def __init__(self):
         user_data_fh = get_user_data_handle()
         self.db_url = datastore_url(user_data_fh)
+        self.pool_options = datastore_pool_options(user_data_fh)
+        self.profiling = profiling_options(user_data_fh)
         self.engine = None
         self.Session = None
 
     def connect(self):
-        self.engine = create_engine(self.db_url)
+        self.engine = create_datastore_engine(self.db_url, **self.pool_options)
+        local = self.engine.dialect.name == SQLITE_DIALECT
+        if local and not inspect(self.engine).has_table(Cart.__tablename__):
+            # local datastores are set up on first use
+            initialize_datastore(self.engine)
+        else:
+            self.check_schema(upgrade=local)
+        if self.profiling["ENABLED"]:
+            instrument_engine(self.engine)
         self.Session = sessionmaker(bind=self.engine)
 
+    def check_schema(self, upgrade: bool) -> None:
+        """
+        Compares schema version recorded in the datastore with the current
+        one. Outdated local datastores (of a single user) are upgraded,
+        schema of shared datastores is altered only by administrators with
+        `update_datastore`. Datastores with outdated schema are still
+        usable, features relying on missing tables fall back or create
+        them on first use.
+        """
+        try:
+            if schema_version(self.engine) >= SCHEMA_VERSION:
+                return
+            if not upgrade:
+                mlogger.warning(
+                    "Datastore schema is outdated, it should be updated "
+                    "by an administrator."
+                )
+                return
+            created = upgrade_datastore(self.engine)
+        except Exception as exc:
+            mlogger.warning(f"Unable to upgrade datastore schema. Error: {exc}")
+        else:
+            if created:
+                mlogger.info(f"Datastore schema upgraded: {', '.join(created)}")
+
+    def dispose(self):
+        """Closes all pooled connections"""
+        if self.engine is not None:
+            self.engine.dispose()
+        self.engine = None
+        self.Session = None
+
+
+# process-wide datastore access shared by all sessions;
+# created lazily on first use & reset when settings change
+_dal = None
+_dal_lock = threading.Lock()
+
+
+def get_data_access_layer() -> DataAccessLayer:
+    """
+    Returns connected, process-wide `DataAccessLayer` instance.
+    Database URL & credentials are looked up only once and the engine's
+    connection pool is reused by all subsequent sessions.
+    """
+    global _dal
+    if _dal is None:
+        with _dal_lock:
+            if _dal is None:
+                dal = DataAccessLayer()
+                dal.connect()
+                _dal = dal
+    return _dal
+
+
+def dispose_data_access_layer() -> None:
+    """
+    Disposes the process-wide engine and its pooled connections.
+    Next session will reconnect using current user_data settings.
+    """
+    global _dal
+    with _dal_lock:
+        if _dal is not None:
+            _dal.dispose()
+        _dal = None
+
+
+def apply_profiling_options() -> None:
+    """
+    Applies profiling settings saved in user_data to the process-wide
+    datastore access without disposing its pooled connections.
+    Sessions opened afterwards are profiled with the new settings.
+    """
+    with _dal_lock:
+        if _dal is None:
+            return
+        _dal.profiling = profiling_options(get_user_data_handle())
+        if _dal.profiling["ENABLED"] and _dal.engine is not None:
+            instrument_engine(_dal.engine)
+
 
 @contextmanager
 def session_scope():
     """Provide a transactional scope around a series of operations."""
-    dal = DataAccessLayer()
-    dal.connect()
+    dal = get_data_access_layer()
+    if dal.profiling["ENABLED"]:
+        with profile_session(dal.profiling["N_PLUS_ONE_THRESHOLD"]):
+            with _transaction(dal) as session:
+                yield session
+    else:
+        with _transaction(dal) as session:
+            yield session
+
+
+@contextmanager
+def _transaction(dal):
     session = dal.Session()
     try:
         yield session
@@ -516,11 +976,7 @@ def session_scope():
         session.close()
 
 
-def create_datastore(db_name=None, user=None, password=None, host=None, port=None):
-    """
-    Creates new Babel datastore
-    """
-
+def _admin_url(db_name, user, password, host, port) -> URL:
     if not db_name:
         raise ValueError("Missing db_name parameter.")
     if not user:
@@ -532,8 +988,7 @@ def create_datastore(db_name=None, user=None, password=None, host=None, port=Non
     if not port:
         raise ValueError("Missing port parameter.")
 
-    # create engine
-    database_url = URL.create(
+    return URL.create(
         drivername=DB_DIALECT + "+" + DB_DRIVER,
         username=user,
         password=password,
@@ -542,6 +997,53 @@ def create_datastore(db_name=None, user=None, password=None, host=None, port=Non
         database=db_name,
         query={"charset": DB_CHARSET},
     )
+
+
+def update_datastore(
+    db_name=None, user=None, password=None, host=None, port=None, dialect=DB_DIALECT
+):
+    """
+    Brings existing Babel datastore up to date with the current schema.
+    Run by an administrator after installing a release which adds
+    tables or indexes; creating indexes on large tables of a busy
+    datastore may take a while.
+
+    For local SQLite datastore (dialect="sqlite") db_name is a path to
+    the database file and remaining connection parameters are ignored.
+    """
+    if dialect == SQLITE_DIALECT:
+        engine = create_datastore_engine(sqlite_url(db_name))
+    else:
+        engine = create_engine(_admin_url(db_name, user, password, host, port))
+
+    created = upgrade_datastore(engine)
+    engine.dispose()
+    print(f"Created: {', '.join(created) or 'nothing'}")
+    print("DB update complete.")
+
+
+def create_datastore(
+    db_name=None, user=None, password=None, host=None, port=None, dialect=DB_DIALECT
+):
+    """
+    Creates new Babel datastore
+
+    For local SQLite datastore (dialect="sqlite") db_name is a path to
+    the database file and remaining connection parameters are ignored.
+    """
+
+    if dialect == SQLITE_DIALECT:
+        # recreate existing datastore as with MySQL
+        if db_name and os.path.isfile(db_name):
+            os.remove(db_name)
+        engine = create_datastore_engine(sqlite_url(db_name))
+        initialize_datastore(engine)
+        engine.dispose()
+        print("DB set-up complete.")
+        return
+
+    # create engine
+    database_url = _admin_url(db_name, user, password, host, port)
     print(database_url)
     engine = create_engine(database_url)
 
@@ -556,11 +1058,23 @@ def create_datastore(db_name=None, user=None, password=None, host=None, port=Non
     engine.execute("CREATE DATABASE IF NOT EXISTS %s" % db_name)
 
     engine = create_engine(database_url)
+    initialize_datastore(engine)
+
+    print("DB set-up complete.")
+
+
+def initialize_datastore(engine):
+    """
+    Creates schema & views in an empty datastore and populates
+    tables with pre-defined values. Works with MySQL & SQLite.
+
+    Args:
+        engine:                 `sqlalchemy.engine.Engine` instance
+    """
     Base.metadata.create_all(engine)
 
     # populate table with pre-defined values
     print("Populating pre-defined tables...")
-    Base.metadata.bind = engine
     DBSession = sessionmaker(bind=engine)
     session = DBSession()
 
@@ -605,18 +1119,23 @@ def create_datastore(db_name=None, user=None, password=None, host=None, port=Non
     for item in STATUS:
         insert_or_ignore(session, Status, did=item[0], name=item[1])
 
+    for name in sorted(set(REFERENCE_TABLES.values())):
+        insert_or_ignore(session, RefVersion, name=name)
+    insert_or_ignore(session, RefVersion, name=SCHEMA_STAMP, version=SCHEMA_VERSION)
+
     session.commit()
 
+    # backtick quoted identifiers are understood by both MySQL & SQLite
     print("creating carts data view...")
     stmn = """
     CREATE VIEW carts_meta AS
         SELECT cart.did AS cart_id, cart.name AS cart_name,
                cart.created AS cart_date, cart.system_id AS system_id,
-               status.name AS cart_status, user.name AS cart_owner,
+               status.name AS cart_status, `user`.name AS cart_owner,
                cart.linked AS linked
         FROM cart
             JOIN status ON status.did = cart.status_id
-            JOIN user ON user.did = cart.user_id
+            JOIN `user` ON `user`.did = cart.user_id
     """
     session.execute(stmn)
 
@@ -654,4 +1173,77 @@ def create_datastore(db_name=None, user=None, password=None, host=None, port=Non
 
     session.close()
 
-    print("DB set-up complete.")
+
+def missing_indexes(engine) -> list:
+    """
+    Determines indexes declared on models but absent in the datastore.
+    An existing index (including ones created implicitly by MySQL for
+    foreign keys) on the same columns satisfies the declared one.
+
+    Args:
+        engine:                 `sqlalchemy.engine.Engine` instance
+
+    Returns:
+        list of `sqlalchemy.Index` instances
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = inspector.get_indexes(table.name)
+        names = {idx["name"] for idx in present}
+        columns = {tuple(idx["column_names"]) for idx in present}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name in names:
+                continue
+            if tuple(c.name for c in index.columns) in columns:
+                continue
+            missing.append(index)
+    return missing
+
+
+def upgrade_datastore(engine) -> list:
+    """
+    Brings existing datastore up to date with the current schema:
+    creates missing tables (without touching existing ones) and missing
+    secondary indexes and records the schema version. Safe to run
+    repeatedly.
+
+    Args:
+        engine:                 `sqlalchemy.engine.Engine` instance
+
+    Returns:
+        list of names of created tables and indexes
+    """
+    created = []
+
+    existing_tables = set(inspect(engine).get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            table.create(engine)
+            created.append(table.name)
+    if RefVersion.__tablename__ in created:
+        with engine.begin() as conn:
+            for name in sorted(set(REFERENCE_TABLES.values())):
+                conn.execute(RefVersion.__table__.insert().values(name=name))
+
+    for index in missing_indexes(engine):
+        index.create(engine)
+        created.append(index.name)
+    _table_presence.pop(engine, None)
+
+    table = RefVersion.__table__
+    with engine.begin() as conn:
+        result = conn.execute(
+            table.update()
+            .where(table.c.name == SCHEMA_STAMP)
+            .values(version=SCHEMA_VERSION)
+        )
+        if result.rowcount == 0:
+            conn.execute(
+                table.insert().values(name=SCHEMA_STAMP, version=SCHEMA_VERSION)
+            )
+
+    return created
@@ -1,7 +1,15 @@
 # datastore transations and methods
 
+from datetime import date
+
+from sqlalchemy import Date, Float, delete, inspect, select
 from sqlalchemy.orm import load_only
-from sqlalchemy.sql import text
+from sqlalchemy.orm.interfaces import ONETOMANY
+from sqlalchemy.sql import bindparam, text
+
+
+# number of ids deleted per statement by set-based deletes
+DELETE_BATCH_SIZE = 1000
 
 
 def count_records(session, model, **kwargs):
@@ -14,6 +22,89 @@ def delete_record(session, model, **kwargs):
     session.delete(instance)
 
 
+def delete_where(session, model, *criteria):
+    """
+    Deletes rows matching criteria with a single DELETE statement
+    bypassing ORM unit of work; does not cascade to related tables
+
+    args:
+        model: datastore class
+        criteria: sqlalchemy expressions, may include subqueries
+    returns:
+        rowcount: int, number of deleted rows
+    """
+    stmn = delete(model).where(*criteria).execution_options(synchronize_session=False)
+    return session.execute(stmn).rowcount
+
+
+def delete_in(session, model, column, values, batch_size=DELETE_BATCH_SIZE):
+    """
+    Deletes rows which column value is in given values with one DELETE
+    per batch of values; does not cascade to related tables
+
+    args:
+        model: datastore class
+        column: model's column attribute
+        values: list of column values
+    returns:
+        rowcount: int, number of deleted rows
+    """
+    values = list(values)
+    row_count = 0
+    for n in range(0, len(values), batch_size):
+        row_count += delete_where(
+            session, model, column.in_(values[n : n + batch_size])
+        )
+    return row_count
+
+
+def _cascaded_children(model):
+    """
+    Returns (child model, foreign key column) pairs of model's
+    one-to-many relationships configured with delete cascade
+    """
+    children = []
+    for rel in inspect(model).relationships:
+        if rel.direction is ONETOMANY and rel.cascade.delete:
+            for _, remote in rel.local_remote_pairs:
+                children.append(
+                    (rel.mapper.class_, getattr(rel.mapper.class_, remote.key))
+                )
+    return children
+
+
+def delete_cascade(session, model, ids, batch_size=DELETE_BATCH_SIZE):
+    """
+    Set-based equivalent of deleting records through ORM session: rows
+    of related tables configured with delete cascade (for example Order's
+    Resource & OrderLocation) are deleted first, then the rows themselves,
+    with one DELETE per table and batch of ids
+
+    args:
+        model: datastore class
+        ids: list of primary keys of rows to delete
+    returns:
+        rowcount: int, number of deleted rows of the model
+    """
+    ids = list(ids)
+    pk = inspect(model).primary_key[0]
+    children = _cascaded_children(model)
+    row_count = 0
+    for n in range(0, len(ids), batch_size):
+        batch = ids[n : n + batch_size]
+        for child, fk in children:
+            if _cascaded_children(child):
+                child_pk = inspect(child).primary_key[0]
+                child_ids = [
+                    r[0] for r in session.execute(select(child_pk).where(fk.in_(batch)))
+                ]
+                delete_cascade(session, child, child_ids, batch_size)
+            else:
+                delete_where(session, child, fk.in_(batch))
+        row_count += delete_where(session, model, pk.in_(batch))
+    return row_count
+
+
 def get_column_values(session, model, column, **kwargs):
     instances = (
         session.query(model)
@@ -31,6 +122,23 @@ def insert(session, model, **kwargs):
     return instance
 
 
+def insert_many(session, model, mappings):
+    """
+    Inserts multiple rows with a single executemany statement
+    bypassing ORM unit of work
+
+    args:
+        model: datastore class
+        mappings: list of dicts, column values of each row
+    returns:
+        rowcount: int, number of inserted rows
+    """
+    if not mappings:
+        return 0
+    session.execute(model.__table__.insert(), mappings)
+    return len(mappings)
+
+
 def insert_or_ignore(session, model, **kwargs):
     instance = session.query(model).filter_by(**kwargs).first()
     if not instance:
@@ -146,6 +254,32 @@ def retrieve_cart_details_view_stmn(cart_id):
     return stmn
 
 
+def cart_order_sheet_stmn(cart_id):
+    """
+    Order sheet rows of a cart in order id order with copies and total
+    price of each order summed up by the database
+    """
+    stmn = text(
+        """
+        SELECT resource.other_no, resource.isbn, resource.title,
+               resource.author, resource.price_disc AS price,
+               COALESCE(SUM(orderlocation.qty), 0) AS qty,
+               COALESCE(SUM(orderlocation.qty * resource.price_disc), 0) AS cost,
+               `order`.oid
+        FROM `order`
+        JOIN resource ON resource.order_id = `order`.did
+        LEFT JOIN orderlocation ON orderlocation.order_id = `order`.did
+        WHERE `order`.cart_id=:cart_id
+        GROUP BY `order`.did, resource.did
+        ORDER BY `order`.did
+        """
+    )
+    stmn = stmn.bindparams(cart_id=cart_id).columns(
+        price=Float(asdecimal=True), cost=Float(asdecimal=True)
+    )
+    return stmn
+
+
 def retrieve_unique_vendors_from_cart(session, cart_id):
     stmn = text(
         """
@@ -167,6 +301,12 @@ def update_record(session, model, did, **kwargs):
         setattr(instance, key, value)
 
 
+def _as_date(value) -> date:
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
 def construct_report_query_stmn(
     system_id: int, library_id: int, user_ids: list[int], start_date: str, end_date: str
 ):
@@ -179,7 +319,9 @@ def construct_report_query_stmn(
         library_id:                     int, datastore library.did
         user_ids:                       list, list of datastore user.did
         start_date:                     str, starting date (inclusive) in format YYYY-MM-DD
+                                        or datetime.date
         end_date:                       str, ending date (inclusive) in format YYYY-MM-DD
+                                        or datetime.date
 
     returns:
         stmn: instance of sqlalchemy.sql.expression.TextClause
@@ -217,10 +359,11 @@ def construct_report_query_stmn(
         JOIN orderlocation ON `order`.did = orderlocation.order_id
         JOIN branch ON orderlocation.branch_id = branch.did
         JOIN fund ON orderlocation.fund_id = fund.did
-        WHERE cart.created BETWEEN CAST(:start_date AS DATE) AND CAST(:end_date AS DATE)
+        WHERE cart.created BETWEEN :start_date AND :end_date
     """
 
-    params = dict(start_date=start_date, end_date=end_date)
+    # typed date parameters are rendered by each dialect, no need for CAST
+    params = dict(start_date=_as_date(start_date), end_date=_as_date(end_date))
 
     if system_id is not None:
         params["system_id"] = system_id
@@ -241,6 +384,9 @@ def construct_report_query_stmn(
         sql_str += " AND cart.library_id=:library_id"
 
     stmn = text(sql_str)
+    stmn = stmn.bindparams(
+        bindparam("start_date", type_=Date), bindparam("end_date", type_=Date)
+    )
     stmn = stmn.bindparams(**params)
 
     return stmn
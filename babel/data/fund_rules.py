@@ -0,0 +1,201 @@
+"""
+Fund eligibility rules.
+
+A fund can be applied to an order location only if the cart's library,
+order's audience & material type, and location's branch are among values
+permitted for the fund. Rules of all needed funds are loaded with a single
+query into sets, so checking an order location costs four set lookups.
+Funds are assigned to whole carts in the datastore with one UPDATE
+per fund.
+"""
+
+from sqlalchemy import and_, case, false, func, literal, or_, select, union_all, update
+
+try:
+    from data.datastore import (
+        Cart,
+        Fund,
+        FundAudnJoiner,
+        FundBranchJoiner,
+        FundLibraryJoiner,
+        FundMatTypeJoiner,
+        Order,
+        OrderLocation,
+    )
+except ImportError:
+    from babel.data.datastore import (
+        Cart,
+        Fund,
+        FundAudnJoiner,
+        FundBranchJoiner,
+        FundLibraryJoiner,
+        FundMatTypeJoiner,
+        Order,
+        OrderLocation,
+    )
+
+
+AUDN = "audn"
+MATTYPE = "mattype"
+BRANCH = "branch"
+LIBRARY = "library"
+
+_EMPTY = frozenset()
+
+
+class FundRules:
+    """
+    Permitted audience, material type, branch & library ids of funds
+    """
+
+    def __init__(self):
+        self.rules = {AUDN: {}, MATTYPE: {}, BRANCH: {}, LIBRARY: {}}
+
+    def add(self, fund_id: int, rule: str, value_id: int) -> None:
+        self.rules[rule].setdefault(fund_id, set()).add(value_id)
+
+    def permitted(self, fund_id: int, rule: str) -> set:
+        return self.rules[rule].get(fund_id, _EMPTY)
+
+    def permits(
+        self,
+        fund_id: int,
+        library_id: int,
+        audn_id: int,
+        mattype_id: int,
+        branch_id: int,
+    ) -> bool:
+        """
+        Checks if fund can be applied to the order location. Incomplete
+        orders are not rejected here, missing values are reported
+        by other checks.
+        """
+        if library_id is None or audn_id is None:
+            return True
+        if mattype_id is None or branch_id is None:
+            return True
+        return (
+            library_id in self.permitted(fund_id, LIBRARY)
+            and audn_id in self.permitted(fund_id, AUDN)
+            and mattype_id in self.permitted(fund_id, MATTYPE)
+            and branch_id in self.permitted(fund_id, BRANCH)
+        )
+
+
+def fund_rules_stmn(fund_ids=None, system_id=None):
+    """
+    Creates a single query returning (fund_id, rule, value_id) rows
+    of all rule types
+
+    args:
+        fund_ids: list or select of fund ids to limit rules to
+        system_id: int, limits rules to funds of the system
+    returns:
+        stmn: sqlalchemy select
+    """
+    selects = []
+    for rule, joiner, column in (
+        (AUDN, FundAudnJoiner, FundAudnJoiner.audn_id),
+        (MATTYPE, FundMatTypeJoiner, FundMatTypeJoiner.matType_id),
+        (BRANCH, FundBranchJoiner, FundBranchJoiner.branch_id),
+        (LIBRARY, FundLibraryJoiner, FundLibraryJoiner.library_id),
+    ):
+        stmn = select(
+            joiner.fund_id.label("fund_id"),
+            literal(rule).label("rule"),
+            column.label("value_id"),
+        )
+        if fund_ids is not None:
+            stmn = stmn.where(joiner.fund_id.in_(fund_ids))
+        if system_id is not None:
+            stmn = stmn.join(Fund, Fund.did == joiner.fund_id).where(
+                Fund.system_id == system_id
+            )
+        selects.append(stmn)
+    return union_all(*selects)
+
+
+def load_fund_rules(session, fund_ids=None, system_id=None) -> FundRules:
+    """
+    Loads rules of funds with one query
+
+    args:
+        session: sqlalchemy Session instance
+        fund_ids: list or select of fund ids to limit rules to
+        system_id: int, limits rules to funds of the system
+    returns:
+        rules: FundRules instance
+    """
+    rules = FundRules()
+    for row in session.execute(fund_rules_stmn(fund_ids, system_id)):
+        rules.add(row.fund_id, row.rule, row.value_id)
+    return rules
+
+
+def _fund_conditions(fund_id: int) -> tuple:
+    """
+    Returns conditions on Order & Cart, and on OrderLocation columns
+    met when the fund can be applied to an order location
+    """
+    order_conditions = [
+        Order.audn_id.in_(
+            select(FundAudnJoiner.audn_id).where(FundAudnJoiner.fund_id == fund_id)
+        ),
+        Order.matType_id.in_(
+            select(FundMatTypeJoiner.matType_id).where(
+                FundMatTypeJoiner.fund_id == fund_id
+            )
+        ),
+        Cart.library_id.in_(
+            select(FundLibraryJoiner.library_id).where(
+                FundLibraryJoiner.fund_id == fund_id
+            )
+        ),
+    ]
+    location_condition = OrderLocation.branch_id.in_(
+        select(FundBranchJoiner.branch_id).where(FundBranchJoiner.fund_id == fund_id)
+    )
+    return order_conditions, location_condition
+
+
+def apply_funds(session, cart_id: int, fund_ids: list) -> tuple:
+    """
+    Assigns funds to cart's order locations permitted by fund rules.
+    Issues one UPDATE per fund, when more than one fund matches
+    a location the last one in the list is assigned.
+
+    args:
+        session: sqlalchemy Session instance
+        cart_id: int, datastore cart did
+        fund_ids: list, datastore fund dids in order of application
+    returns:
+        tuple of (updated, unmatched) counts of cart's order locations
+    """
+    match_conditions = []
+    for fund_id in fund_ids:
+        order_conditions, location_condition = _fund_conditions(fund_id)
+        matching_orders = (
+            select(Order.did)
+            .join(Cart, Cart.did == Order.cart_id)
+            .where(Order.cart_id == cart_id, *order_conditions)
+        )
+        session.execute(
+            update(OrderLocation)
+            .where(OrderLocation.order_id.in_(matching_orders), location_condition)
+            .values(fund_id=fund_id)
+            .execution_options(synchronize_session=False)
+        )
+        match_conditions.append(and_(location_condition, *order_conditions))
+
+    stmn = (
+        select(
+            func.count(OrderLocation.did),
+            func.sum(case((or_(false(), *match_conditions), 1), else_=0)),
+        )
+        .join(Order, Order.did == OrderLocation.order_id)
+        .join(Cart, Cart.did == Order.cart_id)
+        .where(Order.cart_id == cart_id)
+    )
+    total, updated = session.execute(stmn).one()
+    updated = updated or 0
+    return updated, total - updated
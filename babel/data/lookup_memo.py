@@ -0,0 +1,130 @@
+"""
+Bounded memoization of datastore lookups scoped to a unit of work.
+
+Memos are kept in session.info, so they live exactly as long as
+the session created by session_scope and never hold on to other
+sessions or their identity maps. Keys include only entity ids or codes.
+Memos are cleared when the session commits or rolls back, so values
+are never reused across transactions.
+"""
+
+from collections import OrderedDict
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+mlogger = logging.getLogger("babel")
+
+
+# default number of entries kept by each memo
+MEMO_SIZE = 256
+
+_MISSING = object()
+
+
+class LookupMemo:
+    """
+    Least recently used memo with hit/miss counters
+    """
+
+    def __init__(self, maxsize: int = MEMO_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, loader):
+        """
+        Returns memoized value for key or calls loader to obtain it
+
+        args:
+            key: hashable, lookup key
+            loader: callable, returns value for the key on a miss
+        """
+        value = self._data.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            self._data.move_to_end(key)
+            return value
+
+        self.misses += 1
+        value = loader()
+        self._data[key] = value
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return value
+
+    def invalidate(self, *keys) -> None:
+        """
+        Removes given keys (all if none given) from the memo
+        """
+        if not keys:
+            self._data.clear()
+        for key in keys:
+            self._data.pop(key, None)
+
+    def stats(self) -> dict:
+        return dict(
+            hits=self.hits, misses=self.misses, size=len(self._data), max=self.maxsize
+        )
+
+
+def session_memo(session, name: str, maxsize: int = MEMO_SIZE) -> LookupMemo:
+    """
+    Returns memo of given name attached to the session
+
+    args:
+        session: sqlalchemy Session instance
+        name: str, memo name, typically name of memoized function
+        maxsize: int, number of entries kept
+    """
+    memos = session.info.setdefault("lookup_memos", {})
+    try:
+        return memos[name]
+    except KeyError:
+        memo = memos[name] = LookupMemo(maxsize)
+        return memo
+
+
+def invalidate_session_memos(session, *names) -> None:
+    """
+    Clears memos of given names (all if none given) attached to the session
+    """
+    memos = session.info.get("lookup_memos", {})
+    if not names:
+        names = tuple(memos.keys())
+    for name in names:
+        if name in memos:
+            memos[name].invalidate()
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _invalidate_on_transaction_end(session):
+    invalidate_session_memos(session)
+
+
+def session_memo_stats(session) -> dict:
+    """
+    Returns {memo name: stats} of memos attached to the session
+    """
+    memos = session.info.get("lookup_memos", {})
+    return {name: memo.stats() for name, memo in sorted(memos.items())}
+
+
+def log_session_memo_stats(session, operation: str) -> None:
+    stats = session_memo_stats(session)
+    if stats:
+        summary = ", ".join(
+            f"{name}: {s['hits']} hits/{s['misses']} misses"
+            for name, s in stats.items()
+        )
+        mlogger.debug(f"Lookup memo stats on {operation}: {summary}.")
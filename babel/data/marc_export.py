@@ -0,0 +1,477 @@
+"""
+Denormalized order rows of a cart for MARC export.
+
+Orders with their resources and codes of material type, vendor,
+audience & language are read with one joined query and order locations
+with branch, shelf & fund codes with another, so the number of queries
+does not depend on the size of the cart. Rows are streamed in order id
+order and turned into lightweight objects consumed by `marc21.make_bib`.
+
+Batch exports of several carts fetch orders of each cart in the main
+process and hand chunks of them to worker processes which build the
+MARC records. Output of workers is merged in cart order into a single
+file or one file per cart. A cart that fails is reported and skipped
+without stopping the export of the others.
+"""
+
+from collections import deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack
+from datetime import date, datetime
+import logging
+import os
+import re
+import time
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import select
+
+try:
+    from data.datastore import (
+        Audn,
+        Branch,
+        Cart,
+        Fund,
+        Lang,
+        Library,
+        MatType,
+        Order,
+        OrderLocation,
+        Resource,
+        ShelfCode,
+        Status,
+        User,
+        Vendor,
+    )
+    from marc.marc21 import make_bib, make_bib_marc, marc_file_writer
+except ImportError:
+    from babel.data.datastore import (
+        Audn,
+        Branch,
+        Cart,
+        Fund,
+        Lang,
+        Library,
+        MatType,
+        Order,
+        OrderLocation,
+        Resource,
+        ShelfCode,
+        Status,
+        User,
+        Vendor,
+    )
+    from babel.marc.marc21 import make_bib, make_bib_marc, marc_file_writer
+
+
+mlogger = logging.getLogger("babel")
+
+
+# number of order rows fetched from the cursor at a time
+FETCH_SIZE = 1000
+
+# number of orders serialized by a worker process at a time
+CHUNK_SIZE = 500
+
+# chunks submitted to each worker ahead of merging, bounds memory
+# held by fetched orders and built records of a batch export
+CHUNKS_AHEAD = 4
+
+MarcResource = namedtuple(
+    "MarcResource",
+    [
+        "title",
+        "author",
+        "isbn",
+        "upc",
+        "other_no",
+        "pub_date",
+        "pub_place",
+        "publisher",
+        "price_disc",
+    ],
+)
+
+MarcOrder = namedtuple(
+    "MarcOrder",
+    [
+        "wlo",
+        "poPerLine",
+        "note",
+        "mat_bib",
+        "mat_ord",
+        "vendor",
+        "audn",
+        "lang",
+        "copies",
+        "locs",
+        "funds",
+        "order_date",
+        "resource",
+    ],
+)
+
+CartExport = namedtuple(
+    "CartExport",
+    [
+        "cart_id",
+        "name",
+        "orders",
+        "file",
+        "fetch_seconds",
+        "build_seconds",
+        "write_seconds",
+        "error",
+    ],
+)
+
+
+class InlineExecutor:
+    """
+    Runs submitted calls in the calling process; used instead of
+    a process pool when only one worker is available
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+
+def cart_orders_stmn(cart_id: int, system_id: int):
+    if system_id == 1:
+        mat_bib, mat_ord, vendor = (
+            MatType.bpl_bib_code,
+            MatType.bpl_ord_code,
+            Vendor.bpl_code,
+        )
+    else:
+        mat_bib, mat_ord, vendor = (
+            MatType.nyp_bib_code,
+            MatType.nyp_ord_code,
+            Vendor.nyp_code,
+        )
+    return (
+        select(
+            Order.did,
+            Order.wlo,
+            Order.poPerLine,
+            Order.note,
+            mat_bib.label("mat_bib"),
+            mat_ord.label("mat_ord"),
+            vendor.label("vendor"),
+            Audn.code.label("audn"),
+            Lang.code.label("lang"),
+            Resource.title,
+            Resource.author,
+            Resource.isbn,
+            Resource.upc,
+            Resource.other_no,
+            Resource.pub_date,
+            Resource.pub_place,
+            Resource.publisher,
+            Resource.price_disc,
+        )
+        .join(Resource, Resource.order_id == Order.did)
+        .outerjoin(MatType, MatType.did == Order.matType_id)
+        .outerjoin(Vendor, Vendor.did == Order.vendor_id)
+        .outerjoin(Audn, Audn.did == Order.audn_id)
+        .outerjoin(Lang, Lang.did == Order.lang_id)
+        .where(Order.cart_id == cart_id)
+        .order_by(Order.did)
+    )
+
+
+def cart_locations_stmn(cart_id: int):
+    return (
+        select(
+            OrderLocation.order_id,
+            OrderLocation.qty,
+            Branch.code.label("branch"),
+            ShelfCode.code.label("shelfcode"),
+            ShelfCode.includes_audn,
+            Fund.code.label("fund"),
+        )
+        .join(Order, Order.did == OrderLocation.order_id)
+        .outerjoin(Branch, Branch.did == OrderLocation.branch_id)
+        .outerjoin(ShelfCode, ShelfCode.did == OrderLocation.shelfcode_id)
+        .outerjoin(Fund, Fund.did == OrderLocation.fund_id)
+        .where(Order.cart_id == cart_id)
+        .order_by(OrderLocation.did)
+    )
+
+
+def location_strings(locations: list, audn: str) -> tuple[int, str, str]:
+    """
+    Formats order locations as Sierra order record's locations & funds
+
+    args:
+        locations: list of rows of cart_locations_stmn
+        audn: str, audience code of the order
+    returns:
+        copies, locations string, funds string
+    """
+    copies = 0
+    locs = []
+    funds = []
+    for loc in locations:
+        shelfcode = loc.shelfcode or ""
+        copies += loc.qty
+        if loc.includes_audn:
+            locs.append(f"{loc.branch}{audn}{shelfcode}/{loc.qty}")
+        else:
+            locs.append(f"{loc.branch}{shelfcode}/{loc.qty}")
+        funds.append(f"{loc.fund or ''}/{loc.qty}")
+    return copies, ",".join(locs), ",".join(funds)
+
+
+def cart_marc_orders(
+    session, cart_id: int, system_id: int, order_date: str
+) -> Iterator[MarcOrder]:
+    """
+    Streams orders of the cart with all data needed to create their
+    MARC records
+
+    args:
+        session: sqlalchemy Session instance
+        cart_id: int, datastore cart did
+        system_id: int, datastore system did
+        order_date: str, date of orders formatted as MM-DD-YYYY
+    yields:
+        MarcOrder instances in order id order
+    """
+    locations = {}
+    for loc in session.execute(cart_locations_stmn(cart_id)):
+        locations.setdefault(loc.order_id, []).append(loc)
+
+    result = session.execute(
+        cart_orders_stmn(cart_id, system_id).execution_options(yield_per=FETCH_SIZE)
+    )
+    for row in result:
+        copies, locs, funds = location_strings(locations.get(row.did, []), row.audn)
+        yield MarcOrder(
+            wlo=row.wlo,
+            poPerLine=row.poPerLine,
+            note=row.note,
+            mat_bib=row.mat_bib,
+            mat_ord=row.mat_ord,
+            vendor=row.vendor,
+            audn=row.audn,
+            lang=row.lang,
+            copies=str(copies),
+            locs=locs,
+            funds=funds,
+            order_date=order_date,
+            resource=MarcResource(
+                title=row.title,
+                author=row.author,
+                isbn=row.isbn,
+                upc=row.upc,
+                other_no=row.other_no,
+                pub_date=row.pub_date,
+                pub_place=row.pub_place,
+                publisher=row.publisher,
+                price_disc=row.price_disc,
+            ),
+        )
+
+
+def cart_marc_header(cart, selector, library) -> tuple:
+    """
+    Determines values shared by MARC records of all orders of a cart
+
+    args:
+        cart: datastore Cart record
+        selector: datastore User record of cart owner
+        library: datastore Library record of cart
+    returns:
+        oclc_code, library_code, blanketPO, selector_code
+    """
+    if cart.system_id == 1:
+        return "BKL", library.code, cart.blanketPO, selector.bpl_code
+    elif cart.system_id == 2:
+        return "NYP", library.code, cart.blanketPO, selector.nyp_code
+    raise ValueError(f"Unknown system of cart {cart.name}.")
+
+
+def serialize_orders(header: tuple, orders: list, fast_serializer: bool = True):
+    """
+    Builds MARC records of orders; runs in worker processes of batch
+    exports
+
+    args:
+        header: tuple, values returned by cart_marc_header
+        orders: list of MarcOrder instances
+        fast_serializer: bool, serialize records without pymarc objects
+    returns:
+        data, seconds: bytes of records & time it took to build them
+    """
+    start = time.perf_counter()
+    if fast_serializer:
+        data = b"".join([make_bib_marc(*header, order) for order in orders])
+    else:
+        data = b"".join([make_bib(*header, order).as_marc() for order in orders])
+    return data, time.perf_counter() - start
+
+
+def cart_file_name(name: str, taken: set) -> str:
+    """
+    Returns MARC file name of a cart not yet taken by the batch
+
+    args:
+        name: str, cart name
+        taken: set of file names of the batch, updated in place
+    """
+    stem = re.sub(r'[<>:"/\\|?*\x00-\x1f]', "_", name).strip(" .") or "cart"
+    file_name = f"{stem}.mrc"
+    n = 1
+    while file_name.lower() in taken:
+        n += 1
+        file_name = f"{stem} ({n}).mrc"
+    taken.add(file_name.lower())
+    return file_name
+
+
+def export_carts_to_marc(
+    session,
+    cart_ids: list,
+    dst: str,
+    combined: bool = True,
+    max_workers: Optional[int] = None,
+    progress: Optional[Callable] = None,
+    fast_serializer: bool = True,
+) -> list:
+    """
+    Exports MARC records of orders of finalized carts in parallel worker
+    processes; the destination file(s) are replaced only after all
+    records were written
+
+    args:
+        session: sqlalchemy Session instance
+        cart_ids: list of datastore cart dids, determines order of output
+        dst: str, path to the .mrc file if combined, otherwise path to
+             directory where a file named after each cart is written
+        combined: bool, write records of all carts to a single file
+        max_workers: int, number of worker processes (default: cpu count),
+                     records are built in the calling process if 1
+        progress: callable called with (done, total, CartExport) as
+                  each cart is completed
+        fast_serializer: bool, serialize records without pymarc objects
+    returns:
+        list of CartExport in cart_ids order; error is None for
+        exported carts
+    """
+    order_date = datetime.strftime(date.today(), "%m-%d-%Y")
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max_workers * CHUNKS_AHEAD
+    taken = set()
+    report = []
+    pending = deque()
+
+    def complete(job):
+        export, futures = job
+        if export.error is None:
+            position = None
+            try:
+                build_seconds = 0.0
+                chunks = []
+                for future in futures:
+                    data, seconds = future.result()
+                    chunks.append(data)
+                    build_seconds += seconds
+                start = time.perf_counter()
+                if combined:
+                    file_name = dst
+                    position = combined_file.tell()
+                    combined_file.write(b"".join(chunks))
+                else:
+                    file_name = os.path.join(dst, cart_file_name(export.name, taken))
+                    with marc_file_writer(file_name) as file:
+                        file.writelines(chunks)
+                export = export._replace(
+                    file=file_name,
+                    build_seconds=build_seconds,
+                    write_seconds=time.perf_counter() - start,
+                )
+            except Exception as exc:
+                if position is not None:
+                    # drop records of the failed cart written so far; the whole
+                    # export fails if the combined file cannot be restored
+                    combined_file.seek(position)
+                    combined_file.truncate()
+                export = export._replace(error=f"{type(exc).__name__}: {exc}")
+        if export.error is not None:
+            mlogger.warning(
+                f"Batch MARC export of cart {export.name} ({export.cart_id}) "
+                f"failed: {export.error}"
+            )
+        report.append(export)
+        if progress is not None:
+            progress(len(report), len(cart_ids), export)
+
+    with ExitStack() as stack:
+        if combined:
+            combined_file = stack.enter_context(marc_file_writer(dst))
+        # workers are shut down before the combined file is replaced
+        if max_workers > 1:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers))
+        else:
+            executor = stack.enter_context(InlineExecutor())
+        for cart_id in cart_ids:
+            start = time.perf_counter()
+            export = CartExport(cart_id, None, 0, None, 0.0, 0.0, 0.0, None)
+            futures = []
+            try:
+                cart = session.get(Cart, cart_id)
+                if cart is None:
+                    raise ValueError("Cart not found.")
+                export = export._replace(name=cart.name)
+                status = session.get(Status, cart.status_id)
+                if status.name != "finalized":
+                    raise ValueError("Cart is not finalized.")
+                header = cart_marc_header(
+                    cart,
+                    session.get(User, cart.user_id),
+                    session.get(Library, cart.library_id),
+                )
+                orders = list(
+                    cart_marc_orders(session, cart.did, cart.system_id, order_date)
+                )
+                export = export._replace(
+                    orders=len(orders), fetch_seconds=time.perf_counter() - start
+                )
+                for n in range(0, len(orders), CHUNK_SIZE):
+                    futures.append(
+                        executor.submit(
+                            serialize_orders,
+                            header,
+                            orders[n : n + CHUNK_SIZE],
+                            fast_serializer,
+                        )
+                    )
+            except Exception as exc:
+                export = export._replace(error=f"{type(exc).__name__}: {exc}")
+            pending.append((export, futures))
+
+            # merge completed carts while workers build the following ones
+            while sum(len(f) for _, f in pending) > max_pending:
+                complete(pending.popleft())
+        while pending:
+            complete(pending.popleft())
+
+    failed = [e for e in report if e.error is not None]
+    mlogger.info(
+        f"Batch MARC export of {len(report) - len(failed)} carts "
+        f"({sum(e.orders for e in report if e.error is None)} orders) "
+        f"to {dst}, {len(failed)} failed."
+    )
+    return report
@@ -0,0 +1,289 @@
+"""
+Profiling of datastore queries executed within session_scope.
+
+When enabled in settings, each session_scope records number of queries,
+database time and rows reported by the driver, grouped by statement shape,
+and attributes them to the transactions function and GUI action that
+opened the session. Statement shapes executed more than the configured
+number of times in one session are flagged as likely N+1 patterns.
+Summaries are appended as JSON lines to the profile log in the log
+directory.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import logging
+import os
+import re
+import shelve
+import sys
+import threading
+import time
+
+from sqlalchemy import event
+
+try:
+    from paths import PROFILE_LOG_PATH
+except ImportError:
+    from babel.paths import PROFILE_LOG_PATH
+
+
+mlogger = logging.getLogger("babel")
+
+
+# user_data key of profiling settings
+PROFILING = "profiling"
+
+# number of executions of the same statement in one session
+# above which it is reported as N+1 pattern
+N_PLUS_ONE_THRESHOLD = 20
+
+# number of the most expensive statements included in a summary
+TOP_STATEMENTS = 10
+
+_WHITESPACE = re.compile(r"\s+")
+_PARAM_LIST = re.compile(r"\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,?)+\)")
+_VALUES_LIST = re.compile(r"(\(\?\))(?:\s*,\s*\(\?\))+")
+
+_active = threading.local()
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Normalizes SQL statement, so executions differing only in number
+    of bound parameters share the same shape
+
+    args:
+        statement: str, SQL statement as passed to the cursor
+    returns:
+        shape: str
+    """
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _PARAM_LIST.sub("(?)", shape)
+    return _VALUES_LIST.sub(r"\1", shape)
+
+
+class StatementStats:
+    __slots__ = ("count", "duration", "rows")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.rows = 0
+
+
+class SessionProfile:
+    """
+    Query statistics of a single session_scope
+    """
+
+    def __init__(
+        self,
+        function: str = None,
+        action: str = None,
+        threshold: int = N_PLUS_ONE_THRESHOLD,
+    ):
+        self.function = function
+        self.action = action
+        self.threshold = threshold
+        self.started = datetime.now()
+        self.duration = 0.0
+        self.statements = OrderedDict()
+        self._start = time.perf_counter()
+
+    @property
+    def queries(self) -> int:
+        return sum(s.count for s in self.statements.values())
+
+    @property
+    def db_time(self) -> float:
+        return sum(s.duration for s in self.statements.values())
+
+    @property
+    def rows(self) -> int:
+        return sum(s.rows for s in self.statements.values())
+
+    def record(self, statement: str, duration: float, rows: int) -> None:
+        shape = statement_shape(statement)
+        try:
+            stats = self.statements[shape]
+        except KeyError:
+            stats = self.statements[shape] = StatementStats()
+        stats.count += 1
+        stats.duration += duration
+        if rows > 0:
+            stats.rows += rows
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self._start
+
+    def n_plus_one(self) -> list:
+        """
+        Returns list of (shape, count) of statements executed
+        more times than the threshold
+        """
+        return [
+            (shape, s.count)
+            for shape, s in self.statements.items()
+            if s.count > self.threshold
+        ]
+
+    def summary(self) -> dict:
+        top = sorted(
+            self.statements.items(), key=lambda i: i[1].duration, reverse=True
+        )[:TOP_STATEMENTS]
+        return dict(
+            started=self.started.isoformat(timespec="seconds"),
+            function=self.function,
+            action=self.action,
+            duration=round(self.duration, 6),
+            queries=self.queries,
+            db_time=round(self.db_time, 6),
+            rows=self.rows,
+            n_plus_one=[dict(statement=s, count=c) for s, c in self.n_plus_one()],
+            statements=[
+                dict(
+                    statement=shape,
+                    count=s.count,
+                    db_time=round(s.duration, 6),
+                    rows=s.rows,
+                )
+                for shape, s in top
+            ],
+        )
+
+
+def profiling_options(user_data_fh: str) -> dict:
+    """
+    Reads profiling settings from user_data
+
+    args:
+        user_data_fh: str, path to user_data
+    returns:
+        options: dict with ENABLED & N_PLUS_ONE_THRESHOLD keys
+    """
+    user_data = shelve.open(user_data_fh)
+    options = user_data.get(PROFILING, {})
+    user_data.close()
+    return dict(
+        ENABLED=bool(options.get("ENABLED", False)),
+        N_PLUS_ONE_THRESHOLD=int(
+            options.get("N_PLUS_ONE_THRESHOLD", N_PLUS_ONE_THRESHOLD)
+        ),
+    )
+
+
+def save_profiling_options(user_data_fh: str, enabled: bool, threshold: int) -> None:
+    user_data = shelve.open(user_data_fh)
+    user_data[PROFILING] = dict(ENABLED=enabled, N_PLUS_ONE_THRESHOLD=threshold)
+    user_data.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_active, "profiles", None):
+        # kept on the statement's execution context, so statements which
+        # raise leave nothing behind on the pooled connection
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profiles = getattr(_active, "profiles", None)
+    if not profiles:
+        return
+    start = getattr(context, "_query_start", None)
+    if start is None:
+        # profiling started while the statement was executing
+        return
+    duration = time.perf_counter() - start
+    # MySQL drivers report number of rows returned by SELECTs,
+    # SQLite only rows affected by DML statements
+    profiles[-1].record(statement, duration, cursor.rowcount)
+
+
+def instrument_engine(engine) -> None:
+    """
+    Attaches profiling listeners to the engine. Listeners return
+    immediately unless a session is profiled in the current thread.
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _caller_labels(frame) -> tuple:
+    """
+    Finds the nearest transactions function and GUI method in the stack
+    """
+    function = action = None
+    while frame is not None and action is None:
+        module = frame.f_globals.get("__name__", "")
+        name = module.rsplit(".", 1)[-1]
+        if function is None and name.startswith("transactions_"):
+            function = f"{name}.{frame.f_code.co_name}"
+        elif module.startswith(("gui.", "babel.gui.")):
+            action = f"{module.split('gui.', 1)[1]}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return function, action
+
+
+@contextmanager
+def profile_session(threshold: int = N_PLUS_ONE_THRESHOLD, log_fh: str = None):
+    """
+    Profiles queries executed in the current thread until exit
+
+    args:
+        threshold: int, number of executions of a statement shape above
+                   which it is reported as N+1 pattern
+        log_fh: str, path to profile log, default PROFILE_LOG_PATH
+    yields:
+        profile: SessionProfile instance
+    """
+    # skip this generator & contextlib frames
+    function, action = _caller_labels(sys._getframe(2))
+    profile = SessionProfile(function, action, threshold)
+    profiles = getattr(_active, "profiles", None)
+    if profiles is None:
+        profiles = _active.profiles = []
+    profiles.append(profile)
+    try:
+        yield profile
+    finally:
+        profiles.pop()
+        profile.finish()
+        report_profile(profile, log_fh)
+
+
+def report_profile(profile: SessionProfile, log_fh: str = None) -> None:
+    """
+    Logs N+1 warnings and appends summary of the profile to the profile log
+    (PROFILE_LOG_PATH if log_fh not given)
+    """
+    label = " / ".join(l for l in (profile.action, profile.function) if l)
+    label = label or "unknown caller"
+    for shape, count in profile.n_plus_one():
+        mlogger.warning(
+            f"Possible N+1 query in {label}: executed {count} times: {shape[:200]}"
+        )
+    mlogger.debug(
+        f"Query profile of {label}: {profile.queries} queries, "
+        f"{profile.db_time:.3f}s in database, {profile.rows} rows."
+    )
+
+    append_to_profile_log(profile.summary(), log_fh)
+
+
+def append_to_profile_log(record: dict, log_fh: str = None) -> None:
+    """
+    Appends record as a JSON line to the profile log
+    (PROFILE_LOG_PATH if log_fh not given)
+    """
+    if log_fh is None:
+        log_fh = PROFILE_LOG_PATH
+    try:
+        os.makedirs(os.path.dirname(log_fh), exist_ok=True)
+        with open(log_fh, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+    except OSError as exc:
+        mlogger.warning(f"Unable to save query profile to {log_fh}. Error: {exc}")
@@ -0,0 +1,211 @@
+"""
+In-memory cache of small reference tables (languages, vendors, funds, etc.)
+shared by GUI views and datastore transactions.
+
+Each table is loaded once and reloaded only when its version stamp stored
+in the refversion table changes. Stamps are bumped in the same transaction
+as any change to reference table, so several workstations stay coherent
+without reloading all the data on each view activation.
+"""
+
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+try:
+    from data.datastore import (
+        session_scope,
+        ensure_table,
+        Audn,
+        Branch,
+        Fund,
+        Lang,
+        Library,
+        MatType,
+        RefVersion,
+        REFERENCE_TABLES,
+        ShelfCode,
+        Status,
+        System,
+        User,
+        Vendor,
+    )
+except ImportError:
+    # tests
+    from babel.data.datastore import (
+        session_scope,
+        ensure_table,
+        Audn,
+        Branch,
+        Fund,
+        Lang,
+        Library,
+        MatType,
+        RefVersion,
+        REFERENCE_TABLES,
+        ShelfCode,
+        Status,
+        System,
+        User,
+        Vendor,
+    )
+
+
+mlogger = logging.getLogger("babel")
+
+
+CACHED_MODELS = (
+    Audn,
+    Branch,
+    Fund,
+    Lang,
+    Library,
+    MatType,
+    ShelfCode,
+    Status,
+    System,
+    User,
+    Vendor,
+)
+
+# seconds between version stamp checks; bursts of lookups made
+# during a single view activation are served with one check
+CHECK_INTERVAL = 2.0
+
+
+class ReferenceDataCache:
+    """
+    Versioned cache of reference tables.
+
+    Returned records are detached from any session and shared between
+    callers - treat them as read-only.
+    """
+
+    def __init__(self, check_interval: float = CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._rows = {}  # model: list of records ordered by did
+        self._by_id = {}  # model: {did: record}
+        self._loaded_versions = {}  # model: version stamp at load time
+        self._versions = {}  # stamp name: version
+        self._versioned = None
+        self._checked_at = None
+
+    def _check_versions(self) -> None:
+        now = time.monotonic()
+        if self._checked_at is not None and (
+            now - self._checked_at < self.check_interval
+        ):
+            return
+
+        with session_scope() as session:
+            if self._versioned is None:
+                self._versioned = ensure_table(session.get_bind(), RefVersion)
+                if not self._versioned:
+                    mlogger.warning(
+                        "Datastore lacks refversion table. Reference data "
+                        f"cache expires every {self.check_interval}s."
+                    )
+            if self._versioned:
+                self._versions = {
+                    r.name: r.version for r in session.query(RefVersion).all()
+                }
+            else:
+                # without version stamps fall back to time based expiration
+                self._rows.clear()
+                self._by_id.clear()
+        self._checked_at = now
+
+    def _load(self, model) -> None:
+        self._check_versions()
+        version = self._versions.get(REFERENCE_TABLES[model])
+        if model in self._rows and self._loaded_versions.get(model) == version:
+            return
+
+        with session_scope() as session:
+            rows = session.query(model).order_by(model.did).all()
+            session.expunge_all()
+
+        self._rows[model] = rows
+        self._by_id[model] = {r.did: r for r in rows}
+        self._loaded_versions[model] = version
+        mlogger.debug(
+            f"Reference data cache loaded {len(rows)} {model.__name__} "
+            f"records (version {version})."
+        )
+
+    def invalidate(self, *models) -> None:
+        """
+        Forces reload of given models (all if none given) on next access
+        """
+        with self._lock:
+            if not models:
+                models = tuple(self._rows.keys())
+                # datastore may have changed as well
+                self._versioned = None
+                self._versions = {}
+            for model in models:
+                self._rows.pop(model, None)
+                self._by_id.pop(model, None)
+                self._loaded_versions.pop(model, None)
+            self._checked_at = None
+
+    def records(self, model, **kwargs) -> list:
+        """
+        Returns records of given model matching all kwargs filters
+        """
+        with self._lock:
+            self._load(model)
+            rows = self._rows[model]
+        return [r for r in rows if all(getattr(r, k) == v for k, v in kwargs.items())]
+
+    def record(self, model, **kwargs):
+        """
+        Returns first record of given model matching kwargs filters or None
+        """
+        if list(kwargs.keys()) == ["did"]:
+            with self._lock:
+                self._load(model)
+                return self._by_id[model].get(kwargs["did"])
+
+        rows = self.records(model, **kwargs)
+        if rows:
+            return rows[0]
+        else:
+            return None
+
+    def name_index(self, model, **kwargs) -> dict:
+        """
+        Returns {did: name} index of given model
+        """
+        return {
+            r.did: "" if r.name is None else r.name
+            for r in self.records(model, **kwargs)
+        }
+
+    def code_index(self, model, **kwargs) -> dict:
+        """
+        Returns {did: code} index of given model
+        """
+        return {
+            r.did: "" if r.code is None else r.code
+            for r in self.records(model, **kwargs)
+        }
+
+
+ref_data = ReferenceDataCache()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_changes(session):
+    names = session.info.pop("ref_changed", None)
+    if names:
+        ref_data.invalidate(*[m for m in CACHED_MODELS if REFERENCE_TABLES[m] in names])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_changes(session):
+    session.info.pop("ref_changed", None)
@@ -0,0 +1,203 @@
+"""
+Atomic allocation of unique numbers.
+
+Values are handed out in blocks from named counters of the sequence table.
+A block of any size costs a single UPDATE incrementing the counter followed
+by a read of the new value within the same transaction. The UPDATE takes
+a write lock on the counter (row lock in MySQL, database lock in SQLite)
+held until commit, so concurrent workstations receive disjoint blocks
+without retries. Blocks of rolled back transactions are returned
+to the counter, committed but unused values leave gaps.
+
+Datastores lacking the sequence table, which cannot create it either,
+number values after the last used one as before, without protection
+against concurrent allocations.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import bindparam, delete, func, insert, select, update
+
+try:
+    from data.blanket_po_generator import create_blanketPO
+    from data.datastore import Cart, Order, Sequence, Wlos, ensure_table
+    from data.datastore_worker import insert_many
+except ImportError:
+    from babel.data.blanket_po_generator import create_blanketPO
+    from babel.data.datastore import Cart, Order, Sequence, Wlos, ensure_table
+    from babel.data.datastore_worker import insert_many
+
+
+WLO_SEQUENCE = "wlo"
+WLO_PREFIX = "wlo"
+WLO_MAX = 9999999999
+BLANKETPO_SEQUENCE = "blanketPO:{}"
+
+
+def _increment(session, name: str, quantity: int) -> int:
+    result = session.execute(
+        update(Sequence)
+        .where(Sequence.name == name)
+        .values(value=Sequence.value + quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def create_sequence(session, name: str, value: int = 0) -> None:
+    """
+    Creates counter starting after given value unless it already exists.
+    Safe to call concurrently, only the first insert takes effect.
+
+    args:
+        session: sqlalchemy Session instance
+        name: str, sequence name
+        value: int, last already used value
+    """
+    session.execute(
+        insert(Sequence)
+        .prefix_with("OR IGNORE", dialect="sqlite")
+        .prefix_with("IGNORE", dialect="mysql")
+        .values(name=name, value=value)
+    )
+
+
+def reserve_block(session, name: str, quantity: int, initial=None) -> int:
+    """
+    Reserves a block of consecutive values of the sequence
+
+    args:
+        session: sqlalchemy Session instance
+        name: str, sequence name
+        quantity: int, number of values to reserve
+        initial: callable returning last already used value, called
+                 only if the sequence does not exist yet (defaults to 0)
+    returns:
+        first: int, first value of reserved block
+    """
+    if quantity < 1:
+        raise ValueError("Number of reserved values must be positive.")
+
+    if not ensure_table(session.get_bind(), Sequence):
+        return (initial() if initial else 0) + 1
+
+    if not _increment(session, name, quantity):
+        create_sequence(session, name, initial() if initial else 0)
+        _increment(session, name, quantity)
+
+    last = session.execute(
+        select(Sequence.value).where(Sequence.name == name)
+    ).scalar_one()
+    return last - quantity + 1
+
+
+def last_wlo_digits(session) -> int:
+    """
+    Returns numeric part of the highest wlo number stored in the datastore
+    """
+    last_wlo = session.execute(select(func.max(Wlos.did))).scalar()
+    if last_wlo is None:
+        return 0
+    return int(last_wlo[len(WLO_PREFIX) :])
+
+
+def allocate_wlo_numbers(session, quantity: int) -> list:
+    """
+    Reserves block of unique wlo numbers
+
+    args:
+        session: sqlalchemy Session instance
+        quantity: int, number of wlo numbers
+    returns:
+        wlo_numbers: list of str, wlo numbers in 'wlo0000000001' format
+    """
+    if not quantity:
+        return []
+    first = reserve_block(
+        session, WLO_SEQUENCE, quantity, initial=lambda: last_wlo_digits(session)
+    )
+    if first + quantity - 1 > WLO_MAX:
+        raise ValueError("wlo numbers grew too large!")
+    return [f"{WLO_PREFIX}{digits:010}" for digits in range(first, first + quantity)]
+
+
+def assign_wlo_numbers(session, order_ids: list, wlo_numbers: list) -> int:
+    """
+    Sets wlo numbers of orders and records them as used with one
+    executemany UPDATE and one executemany INSERT
+
+    args:
+        session: sqlalchemy Session instance
+        order_ids: list of datastore order dids
+        wlo_numbers: list of str, wlo numbers matching order ids
+    returns:
+        rowcount: int, number of assigned wlo numbers
+    """
+    if not order_ids:
+        return 0
+    session.execute(
+        update(Order)
+        .where(Order.did == bindparam("o_did"))
+        .values(wlo=bindparam("o_wlo"))
+        .execution_options(synchronize_session=False),
+        [dict(o_did=did, o_wlo=wlo) for did, wlo in zip(order_ids, wlo_numbers)],
+    )
+    timestamp = datetime.now()
+    return insert_many(
+        session, Wlos, [dict(did=wlo, timestamp=timestamp) for wlo in wlo_numbers]
+    )
+
+
+def last_blanketPO_sequence(session, prefix: str) -> int:
+    """
+    Returns highest sequence suffix of stored blanket POs starting with
+    given vendor/date prefix or -1 if there are none
+    """
+    last = -1
+    for (blanketPO,) in session.execute(
+        select(Cart.blanketPO).where(Cart.blanketPO.startswith(prefix, autoescape=True))
+    ):
+        suffix = blanketPO[len(prefix) :]
+        if suffix.isdigit():
+            last = max(last, int(suffix))
+    return last
+
+
+def start_blanketPO_sequence(session, prefix: str) -> int:
+    """
+    Drops counters of blanket PO prefixes of previous days, which are
+    never used again, and returns last stored sequence of given prefix
+    """
+    date_today = prefix[-8:]
+    session.execute(
+        delete(Sequence)
+        .where(Sequence.name.startswith(BLANKETPO_SEQUENCE.format(""), autoescape=True))
+        .where(~Sequence.name.endswith(date_today, autoescape=True))
+        .execution_options(synchronize_session=False)
+    )
+    return last_blanketPO_sequence(session, prefix)
+
+
+def allocate_blanketPO(session, vendor_codes: list) -> str:
+    """
+    Creates unique blanket PO of cart's vendors; sequence suffixes
+    of each vendor/date prefix are allocated from a counter of the prefix,
+    counters of previous days are dropped when the first blanket PO
+    of a prefix is allocated
+
+    args:
+        session: sqlalchemy Session instance
+        vendor_codes: list of str, vendor codes of cart orders
+    returns:
+        blanketPO: str, None if no vendor codes given
+    """
+    prefix = create_blanketPO(vendor_codes, "")
+    if prefix is None:
+        return None
+    sequence = reserve_block(
+        session,
+        BLANKETPO_SEQUENCE.format(prefix),
+        1,
+        initial=lambda: start_blanketPO_sequence(session, prefix),
+    )
+    return create_blanketPO(vendor_codes, sequence)
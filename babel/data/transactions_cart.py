@@ -1,18 +1,34 @@
 from collections import OrderedDict
-from datetime import datetime
+from datetime import datetime, timedelta
 from decimal import Decimal, InvalidOperation
-from functools import lru_cache
 import hashlib
 import logging
 import sys
 
-from sqlalchemy import and_
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import and_, select
 from sqlalchemy.sql import text
 
 
 from errors import BabelError
-from data.blanket_po_generator import create_blanketPO
+from data.babel_duplicates import cart_identifiers_stmn, find_babel_duplicates
+from data.bulk_updates import (
+    append_order_locations,
+    cart_order_ids_stmn,
+    replace_order_locations,
+    update_catalog_dups,
+    update_cart_orders,
+    update_cart_prices,
+)
+from data.cart_validation import validate_cart
+from data.catalog_cache import (
+    cached_bib_data,
+    cached_catalog_dups,
+    catalog_cache_options,
+    report_cache_stats,
+    store_bib_data,
+    store_catalog_dups,
+)
+from data.fund_rules import apply_funds
 from data.datastore import (
     session_scope,
     Audn,
@@ -23,35 +39,50 @@ from data.datastore import (
     Fund,
     GridLocation,
     Lang,
+    Library,
     MatType,
     Order,
     OrderLocation,
     Resource,
     ShelfCode,
     Vendor,
-    Wlos,
 )
 from data.datastore_worker import (
     count_records,
-    delete_record,
-    insert_or_ignore,
+    delete_cascade,
+    delete_in,
+    delete_where,
     insert,
     retrieve_last_record,
     retrieve_record,
     retrieve_records,
     update_record,
 )
+from data.lookup_memo import session_memo, log_session_memo_stats
+from data.query_profiler import profiling_options
+from data.sequences import (
+    allocate_blanketPO,
+    allocate_wlo_numbers,
+    assign_wlo_numbers,
+)
 from data.transactions_carts import get_cart_details_as_dataframe
-from data.wlo_generator import wlo_pool
 from gui.utils import get_id_from_index
 from logging_settings import format_traceback, LogglyAdapter
-from sierra_adapters.comms import catalog_dup_search
+from sierra_adapters.comms import catalog_dup_search_many, catalog_lookup
+from sierra_adapters.concurrent_search import (
+    BATCH_SIZE,
+    MAX_IN_FLIGHT,
+    REQUESTS_PER_SECOND,
+)
 from sierra_adapters.platform import NypPlatform
 from sierra_adapters.solr import BplSolr
 
 
 mlogger = LogglyAdapter(logging.getLogger("babel"), None)
 
+# number of catalog search results saved per transaction
+CATALOG_BATCH_SIZE = 100
+
 
 def add_resource(cart_id, **kwargs):
     try:
@@ -67,54 +98,36 @@ def add_resource(cart_id, **kwargs):
 
 
 def apply_fund_to_cart(system_id, cart_id, fund_codes):
+    """
+    Assigns selected funds to all matching order locations in the cart
 
+    args:
+        system_id: int, datastore system did
+        cart_id: int, datastore cart did
+        fund_codes: list, codes of funds to apply
+    returns:
+        tuple of (updated, unmatched) counts of order locations
+    """
     try:
         with session_scope() as session:
-            cart_rec = retrieve_record(session, Cart, did=cart_id)
-            ord_recs = retrieve_records(session, Order, cart_id=cart_id)
-
-            for code in fund_codes:
-                fund_rec = retrieve_record(
-                    session, Fund, code=code, system_id=system_id
-                )
-
-                fund_audn, fund_mat, fund_branch, fund_lib = valid_fund_ids(fund_rec)
-
-                for orec in ord_recs:
-                    audn_match = False
-                    mat_match = False
-                    library_match = False
-
-                    if orec.audn_id in fund_audn:
-                        audn_match = True
-
-                    if orec.matType_id in fund_mat:
-                        mat_match = True
-
-                    if cart_rec.library_id in fund_lib:
-                        library_match = True
+            fund_recs = (
+                session.query(Fund.did, Fund.code)
+                .filter(Fund.system_id == system_id, Fund.code.in_(fund_codes))
+                .all()
+            )
+            fund_ids = {rec.code: rec.did for rec in fund_recs}
+            missing = [code for code in fund_codes if code not in fund_ids]
+            if missing:
+                raise BabelError(f"Unknown fund(s): {', '.join(missing)}")
 
-                    for oloc in orec.locations:
-                        if oloc.branch_id in fund_branch:
-                            mlogger.debug(
-                                "OrdRec-Fund branch {} match".format(oloc.branch_id)
-                            )
-                            if audn_match and library_match and mat_match:
-                                # update
-                                mlogger.debug("Complete match. Updating OrderLocation.")
-                                update_record(
-                                    session,
-                                    OrderLocation,
-                                    oloc.did,
-                                    fund_id=fund_rec.did,
-                                )
-                            else:
-                                mlogger.debug(
-                                    "Incomplete match: lib={}, audn={}, "
-                                    "mat={}.".format(
-                                        library_match, audn_match, mat_match
-                                    )
-                                )
+            updated, unmatched = apply_funds(
+                session, cart_id, [fund_ids[code] for code in fund_codes]
+            )
+            mlogger.debug(
+                f"Funds {fund_codes} applied to {updated} locations in cart "
+                f"{cart_id}, {unmatched} locations unmatched."
+            )
+        return updated, unmatched
 
     except Exception as exc:
         _, _, exc_traceback = sys.exc_info()
@@ -123,7 +136,15 @@ def apply_fund_to_cart(system_id, cart_id, fund_codes):
         raise BabelError(exc)
 
 
-def apply_globals_to_cart(cart_id, widgets):
+def apply_globals_to_cart(cart_id, widgets, progbar=None):
+    """
+    Applies values of global widgets to all orders in the cart
+
+    args:
+        cart_id: int, datastore cart did
+        widgets: dict, global widgets of the cart view
+        progbar: tkinter Progressbar widget
+    """
     try:
 
         with session_scope() as session:
@@ -137,55 +158,38 @@ def apply_globals_to_cart(cart_id, widgets):
             mlogger.debug(f"Applying globally grid {grid_rec}")
 
             # resource data
-            rkwargs = {}
-
             discount = None
             if "discEnt" in widgets:
                 if widgets["discEnt"].get() != "":
                     discount = Decimal(widgets["discEnt"].get())
 
+            list_price = None
             if "priceEnt" in widgets:
                 if widgets["priceEnt"].get() != "":
                     list_price = Decimal(widgets["priceEnt"].get())
-                    rkwargs["price_list"] = list_price
-                    if discount:
-                        rkwargs["price_disc"] = list_price - (
-                            (list_price * discount) / Decimal(100)
-                        )
-                    else:
-                        rkwargs["price_disc"] = list_price
             mlogger.debug(
-                "Global update to prices: {}, discount: {}".format(rkwargs, discount)
+                f"Global update to prices: list price: {list_price}, "
+                f"discount: {discount}"
             )
 
-            ord_recs = retrieve_records(session, Order, cart_id=cart_id)
-
-            for rec in ord_recs:
-                if grid_rec:
-                    olocs = []
-                    for l in grid_rec.gridlocations:
-                        olocs.append(
-                            OrderLocation(
-                                order_id=rec.did,
-                                branch_id=l.branch_id,
-                                shelfcode_id=l.shelfcode_id,
-                                qty=l.qty,
-                            )
-                        )
-                    okwargs["locations"] = olocs
-                update_record(session, Order, rec.did, **okwargs)
+            if progbar is not None:
+                progbar["maximum"] = count_records(session, Order, cart_id=cart_id)
+                progbar["value"] = 0
 
-                if rkwargs:
-                    update_record(session, Resource, rec.resource.did, **rkwargs)
+            updated = update_cart_orders(session, cart_id, **okwargs)
+            mlogger.debug(f"Global values {okwargs} applied to {updated} orders.")
 
-                session.flush()
+            updated = update_cart_prices(session, cart_id, list_price, discount)
+            mlogger.debug(f"Prices of {updated} resources updated.")
 
-                if discount is not None:
-                    rkwargs["price_disc"] = rec.resource.price_list - (
-                        (rec.resource.price_list * discount) / Decimal(100)
-                    )
-                    update_record(session, Resource, rec.resource.did, **rkwargs)
-                    rkwargs = {}
+            if grid_rec:
+                inserted = replace_order_locations(
+                    session,
+                    cart_order_ids_stmn(cart_id),
+                    grid_rec.gridlocations,
+                    progbar,
+                )
+                mlogger.debug(f"Cart locations replaced with {inserted} new ones.")
 
     except Exception as exc:
         _, _, exc_traceback = sys.exc_info()
@@ -207,74 +211,26 @@ def apply_grid_to_selected_orders(order_ids, grid_id, append=False):
     with session_scope() as session:
         # retrieve grid location data
         grid_rec = retrieve_record(session, DistGrid, did=grid_id)
+        order_ids = list(order_ids)
 
         if append:
             # add to existing locations
-            for oid in order_ids:
-                ord_rec = retrieve_record(session, Order, did=oid)
-
-                for gloc in grid_rec.gridlocations:
-                    # find duplicates and merge
-                    dup = False
-                    for oloc in ord_rec.locations:
-                        if (
-                            oloc.branch_id == gloc.branch_id
-                            and oloc.shelfcode_id == gloc.shelfcode_id
-                        ):
-                            # add quantity to existing oloc
-                            dup = True
-                            mlogger.debug(
-                                "Updating existing "
-                                f"OrderLocation.did={oloc.did} "
-                                f"with new qty={oloc.qty + gloc.qty}"
-                            )
-                            update_record(
-                                session,
-                                OrderLocation,
-                                oloc.did,
-                                order_id=oid,
-                                branch_id=oloc.branch_id,
-                                shelfcode_id=oloc.shelfcode_id,
-                                qty=oloc.qty + gloc.qty,
-                                fund_id=oloc.fund_id,
-                            )
-                    if not dup:
-                        mlogger.debug(
-                            f"Inserting new OrderLocation for Order.did={oid} "
-                            f"based on DistGrid.did={gloc.did}"
-                        )
-                        insert_or_ignore(
-                            session,
-                            OrderLocation,
-                            order_id=oid,
-                            branch_id=gloc.branch_id,
-                            shelfcode_id=gloc.shelfcode_id,
-                            qty=gloc.qty,
-                        )
+            updated, inserted = append_order_locations(
+                session, order_ids, grid_rec.gridlocations
+            )
+            mlogger.debug(
+                f"Appended DistGrid.did={grid_id} to {len(order_ids)} orders: "
+                f"{updated} locations updated, {inserted} inserted."
+            )
         else:
             # replace existing locations
-            for oid in order_ids:
-                # delete exiting locaations
-                loc_recs = retrieve_records(session, OrderLocation, order_id=oid)
-                for oloc in loc_recs:
-                    mlogger.debug(
-                        f"Deleting OrderLocation.did={oloc.did} " f"of order.did={oid}"
-                    )
-                    delete_record(session, OrderLocation, did=oloc.did)
-
-                for gloc in grid_rec.gridlocations:
-                    mlogger.debug(
-                        f"Inserting new OrderLocation based on "
-                        f"DistGrid.did={gloc.did}"
-                    )
-                    insert_or_ignore(
-                        session,
-                        OrderLocation,
-                        order_id=oid,
-                        branch_id=gloc.branch_id,
-                        shelfcode_id=gloc.shelfcode_id,
-                        qty=gloc.qty,
-                    )
+            inserted = replace_order_locations(
+                session, order_ids, grid_rec.gridlocations
+            )
+            mlogger.debug(
+                f"Replaced locations of {len(order_ids)} orders with "
+                f"DistGrid.did={grid_id}: {inserted} locations inserted."
+            )
 
 
 def assign_blanketPO_to_cart(cart_id):
@@ -287,18 +243,8 @@ def assign_blanketPO_to_cart(cart_id):
                     session, cart_id, cart_rec.system_id
                 )
                 vendor_codes = [code[0] for code in res]
-                blanketPO = create_blanketPO(vendor_codes)
-                unique = True
-                n = 0
-                while unique:
-                    try:
-                        update_record(session, Cart, cart_id, blanketPO=blanketPO)
-                        session.flush()
-                        unique = False
-                    except IntegrityError:
-                        session.rollback()
-                        n += 1
-                        blanketPO = create_blanketPO(vendor_codes, n)
+                blanketPO = allocate_blanketPO(session, vendor_codes)
+                update_record(session, Cart, cart_id, blanketPO=blanketPO)
 
     except Exception as exc:
         _, _, exc_traceback = sys.exc_info()
@@ -312,18 +258,21 @@ def assign_blanketPO_to_cart(cart_id):
 def assign_wlo_to_cart(cart_id):
     try:
 
+        # reserve block of wlo numbers in a short transaction to release
+        # the lock on the wlo sequence before orders are updated
         with session_scope() as session:
-            # determne how many wlo are needed and reserve them
-            last_wlo_rec = retrieve_last_record(session, Wlos)
-            order_count = count_records(session, Order, cart_id=cart_id)
-            wlo_numbers = wlo_pool(last_wlo_rec.did, order_count)
-
-            orders = retrieve_records(session, Order, cart_id=cart_id)
-            for o in orders:
-                if o.wlo is None:
-                    wlo = wlo_numbers.__next__()
-                    update_record(session, Order, o.did, wlo=wlo)
-                    insert(session, Wlos, did=wlo)
+            order_ids = [
+                did
+                for did, in session.execute(
+                    select(Order.did)
+                    .where(Order.cart_id == cart_id, Order.wlo.is_(None))
+                    .order_by(Order.did)
+                )
+            ]
+            wlo_numbers = allocate_wlo_numbers(session, len(order_ids))
+
+        with session_scope() as session:
+            assign_wlo_numbers(session, order_ids, wlo_numbers)
 
     except Exception as exc:
         _, _, exc_traceback = sys.exc_info()
@@ -332,40 +281,6 @@ def assign_wlo_to_cart(cart_id):
         raise BabelError(exc)
 
 
-def babel_resource_match(session, system_id, library_id, isbn=None, upc=None):
-    """Finds ordered previously resources"""
-    isbn_matches = 0
-    if isbn is not None:
-        isbn_matches = (
-            session.query(Cart, Order, Resource)
-            .join(Order, Cart.did == Order.cart_id)
-            .join(Resource, Order.did == Resource.order_id)
-            .filter(Cart.system_id == system_id)
-            .filter(Cart.library_id == library_id)
-            .filter(Resource.isbn == isbn)
-            .count()
-        )
-
-    upc_matches = 0
-    if upc is not None:
-        upc_matches = (
-            session.query(Cart, Order, Resource)
-            .join(Order, Cart.did == Order.cart_id)
-            .join(Resource, Order.did == Resource.order_id)
-            .filter(Cart.system_id == system_id)
-            .filter(Cart.library_id == library_id)
-            .filter(Resource.upc == upc)
-            .count()
-        )
-
-    if isbn_matches > 1:
-        return True
-    elif upc_matches > 1:
-        return True
-    else:
-        return False
-
-
 def convert_price2datastore(price_str):
     try:
         price = Decimal(price_str)
@@ -398,14 +313,18 @@ def create_order_snapshot(order_tracker):
 
 
 def delete_locations_from_selected_orders(order_ids):
+    """
+    Deletes all locations of given orders
+
+    args:
+        order_ids: list, datastore order dids
+    returns:
+        row_count: int, number of deleted locations
+    """
     with session_scope() as session:
-        for oid in order_ids:
-            loc_recs = retrieve_records(session, OrderLocation, order_id=oid)
-            for oloc in loc_recs:
-                mlogger.debug(
-                    f"Deleting OrderLocation.did={oloc.did} " f"of Order.did={oid}"
-                )
-                delete_record(session, OrderLocation, did=oloc.did)
+        row_count = delete_in(session, OrderLocation, OrderLocation.order_id, order_ids)
+        mlogger.debug(f"Deleted {row_count} OrderLocation records.")
+    return row_count
 
 
 def determine_needs_validation(cart_id):
@@ -460,75 +379,158 @@ def filter_cart(cart_id: int, filter_type: str):
         return results
 
 
-def find_matches(cart_id, creds_fh, middleware, progbar=None):
-    with session_scope() as session:
+def find_matches(
+    cart_id,
+    creds_fh,
+    middleware,
+    progbar=None,
+    max_in_flight=MAX_IN_FLIGHT,
+    rate_limit=REQUESTS_PER_SECOND,
+    batch_size=BATCH_SIZE,
+    force_refresh=None,
+    stale_only=False,
+):
+    """
+    Marks cart resources ordered previously in Babel and searches
+    the catalog for their duplicates; incremental search (stale_only)
+    rechecks only resources never checked, checked longer ago than
+    settings' recheck days or which ISBN/UPC changed; identifiers found
+    in the catalog cache are not searched again unless refresh is forced,
+    catalog searches of batches of titles run concurrently and their
+    results are saved in batches
 
+    returns:
+        babel_dups: dict of {resource did: list of BabelDup}
+    """
+    cache_options = catalog_cache_options(creds_fh)
+    ttl_hours = cache_options["TTL_HOURS"]
+    profile = profiling_options(creds_fh)["ENABLED"]
+    if force_refresh is None:
+        force_refresh = cache_options["FORCE_REFRESH"]
+    checked_before = None
+    if stale_only:
+        checked_before = datetime.now() - timedelta(days=cache_options["RECHECK_DAYS"])
+
+    with session_scope() as session:
+        # check for internal duplicates of the whole cart
+        babel_dups = find_babel_duplicates(session, cart_id)
+        resources = session.execute(
+            cart_identifiers_stmn(cart_id, checked_before)
+        ).fetchall()
+        system_id, library = session.execute(
+            select(Cart.system_id, Library.name)
+            .outerjoin(Library, Cart.library_id == Library.did)
+            .where(Cart.did == cart_id)
+        ).one()
+        cached = {}
+        if middleware is not None and not force_refresh:
+            cached = cached_catalog_dups(
+                session,
+                system_id,
+                library,
+                [res.isbn or res.upc for res in resources if res.isbn or res.upc],
+                ttl_hours,
+            )
+    mlogger.debug(f"Found {len(babel_dups)} Babel duplicates in cart {cart_id}.")
+
+    if progbar:
+        progbar["value"] = 0
+        progbar["maximum"] = len(resources)
+
+    queries = []
+    pending = []
+    identifiers = {}
+    hits = 0
+    for res in resources:
+        identifier = res.isbn or res.upc
+        if middleware is None or not identifier:
+            pending.append((res.did, None, None))
+        elif identifier in cached:
+            hits += 1
+            pending.append((res.did, *cached[identifier]))
+        else:
+            identifiers[res.did] = identifier
+            queries.append((res.did, [identifier], "isbn" if res.isbn else "upc"))
+    mlogger.debug(f"Searching catalog for {len(queries)} resources.")
+    if middleware is not None:
+        report_cache_stats("catalog_dups", "find_matches", hits, len(queries), profile)
+
+    def save(results):
+        timestamp = datetime.now()
+        with session_scope() as session:
+            update_catalog_dups(session, results, timestamp)
+            if ttl_hours:
+                store_catalog_dups(
+                    session,
+                    system_id,
+                    library,
+                    {
+                        identifiers[did]: (catalog_dup, dup_bibs)
+                        for did, catalog_dup, dup_bibs in results
+                        if did in identifiers
+                    },
+                    timestamp,
+                )
         if progbar:
-            count = count_records(session, Order, cart_id=cart_id)
-            progbar["value"] = 0
-            progbar["maximum"] = count
+            progbar["value"] += len(results)
+            progbar.update()
 
-        cart_rec = retrieve_record(session, Cart, did=cart_id)
-        ord_recs = retrieve_records(session, Order, cart_id=cart_id)
+    if queries:
+        for result in catalog_dup_search_many(
+            middleware, queries, max_in_flight, rate_limit, batch_size
+        ):
+            pending.append(result)
+            if len(pending) >= CATALOG_BATCH_SIZE:
+                save(pending)
+                pending = []
+    save(pending)
 
-        for rec in ord_recs:
+    return babel_dups
 
-            # check for internal duplicates
-            keywords = []
-            if rec.resource.isbn:
-                keywords.append(rec.resource.isbn)
-                babel_dup = babel_resource_match(
-                    session,
-                    cart_rec.system_id,
-                    cart_rec.library_id,
-                    isbn=rec.resource.isbn,
-                )
-            elif rec.resource.upc:
-                keywords.append(rec.resource.upc)
-                babel_dup = babel_resource_match(upc=rec.resource.upc)
-            else:
-                babel_dup = False
 
-            # check for duplicates in the catalog
-            mlogger.debug(
-                f"Identified following keywords for middleware query: {keywords}"
-            )
-            if middleware is not None and keywords:
-                catalog_dup, dup_bibs = catalog_dup_search(middleware, keywords)
-            else:
-                catalog_dup = None
-                dup_bibs = None
+def get_catalog_bib_data(
+    sierra_number, creds_fh, middleware, system_id, force_refresh=None
+):
+    """
+    Retrieves bib & item data of a catalog duplicate from the catalog cache
+    or Sierra
 
-            mlogger.debug(
-                f"Found following order matches for {keywords}: babel={babel_dup}, "
-                f"catalog={catalog_dup}, dub_bibs={dup_bibs}."
-            )
+    returns:
+        tuple of (bib_data, item_data)
+    """
+    cache_options = catalog_cache_options(creds_fh)
+    ttl_hours = cache_options["TTL_HOURS"]
+    profile = profiling_options(creds_fh)["ENABLED"]
+    if force_refresh is None:
+        force_refresh = cache_options["FORCE_REFRESH"]
 
-            update_record(
-                session,
-                Resource,
-                rec.resource.did,
-                dup_babel=babel_dup,
-                dup_catalog=catalog_dup,
-                dup_bibs=dup_bibs,
-                dup_timestamp=datetime.now(),
+    if not force_refresh:
+        with session_scope() as session:
+            cached = cached_bib_data(session, system_id, sierra_number, ttl_hours)
+        if cached is not None:
+            report_cache_stats("catalog_bibs", "get_catalog_bib_data", 1, 0, profile)
+            return cached
+
+    report_cache_stats("catalog_bibs", "get_catalog_bib_data", 0, 1, profile)
+    bib_data, item_data = catalog_lookup(middleware, sierra_number)
+    if ttl_hours:
+        with session_scope() as session:
+            store_bib_data(
+                session, system_id, sierra_number, bib_data, item_data, datetime.now()
             )
-
-            if progbar:
-                progbar["value"] += 1
-                progbar.update()
+    return bib_data, item_data
 
 
-@lru_cache(maxsize=24)
 def get_branch_code(session, branch_id):
-    rec = retrieve_record(session, Branch, did=branch_id)
-    return rec.code
+    return session_memo(session, "branch_code").get(
+        branch_id, lambda: retrieve_record(session, Branch, did=branch_id).code
+    )
 
 
-@lru_cache(maxsize=24)
 def get_branch_rec_id(session, branch_code):
-    rec = retrieve_record(session, Branch, code=branch_code)
-    return rec.did
+    return session_memo(session, "branch_id").get(
+        branch_code, lambda: retrieve_record(session, Branch, code=branch_code).did
+    )
 
 
 def get_branch_idx(system_id):
@@ -578,10 +580,10 @@ def get_cart_resources(cart_id):
     return resources
 
 
-@lru_cache(maxsize=2)
 def get_fund_rec_id(session, fund_code):
-    rec = retrieve_record(session, Fund, code=fund_code)
-    return rec.did
+    return session_memo(session, "fund_id").get(
+        fund_code, lambda: retrieve_record(session, Fund, code=fund_code).did
+    )
 
 
 def get_ids_for_order_boxes_values(values_dict):
@@ -652,10 +654,10 @@ def get_orders_by_id(order_ids=[]):
     return orders
 
 
-@lru_cache(maxsize=2)
 def get_shelf_rec_id(session, shelf_code):
-    rec = retrieve_record(session, ShelfCode, code=shelf_code)
-    return rec.did
+    return session_memo(session, "shelf_id").get(
+        shelf_code, lambda: retrieve_record(session, ShelfCode, code=shelf_code).did
+    )
 
 
 def has_library_assigned(cart_id):
@@ -673,26 +675,33 @@ def has_library_assigned(cart_id):
             return False
 
 
-def remove_babel_duplicates(cart_id: int) -> None:
+def _remove_flagged_orders(session, cart_id: int, flag) -> int:
+    order_ids = [
+        did
+        for did, in session.query(Order.did)
+        .join(Resource, Resource.order_id == Order.did)
+        .filter(Order.cart_id == cart_id)
+        .filter(flag == True)
+    ]
+    return delete_cascade(session, Order, order_ids)
+
+
+def remove_babel_duplicates(cart_id: int) -> int:
     """
     Deletes from the cart any orders/resources identified
     to be present in other carts.
 
     Args:
         cart_id:                `Cart.did` to perform operation on
+
+    Returns:
+        number of deleted orders
     """
     try:
         with session_scope() as session:
-            instances = (
-                session.query(Order)
-                .join(Resource, Resource.order_id == Order.did)
-                .filter(Order.cart_id == cart_id)
-                .filter(Resource.dup_babel == True)
-                .all()
-            )
-            for i in instances:
-                delete_record(session, Order, did=i.did)
-                mlogger.debug(f"Deleted Order record # {i.did}.")
+            row_count = _remove_flagged_orders(session, cart_id, Resource.dup_babel)
+            mlogger.debug(f"Deleted {row_count} Babel duplicate orders.")
+        return row_count
 
     except Exception as exc:
         _, _, exc_traceback = sys.exc_info()
@@ -701,27 +710,23 @@ def remove_babel_duplicates(cart_id: int) -> None:
         raise BabelError(exc)
 
 
-def remove_catalog_duplicates(cart_id: int) -> None:
+def remove_catalog_duplicates(cart_id: int) -> int:
     """
     Deletes from the cart any orders/resources identified to
     have a duplicate in the catalog.
 
     Args:
         cart_id:                `Cart.did` to perform operation on
+
+    Returns:
+        number of deleted orders
     """
     try:
         with session_scope() as session:
-            instances = (
-                session.query(Order)
-                .join(Resource, Resource.order_id == Order.did)
-                .filter(Order.cart_id == cart_id)
-                .filter(Resource.dup_catalog == True)
-                .all()
-            )
-            for i in instances:
-                delete_record(session, Order, did=i.did)
-                mlogger.debug(f"Deleted Order record # {i.did}.")
-            session.commit()
+            row_count = _remove_flagged_orders(session, cart_id, Resource.dup_catalog)
+            mlogger.debug(f"Deleted {row_count} catalog duplicate orders.")
+        return row_count
+
     except Exception as exc:
         _, _, exc_traceback = sys.exc_info()
         tb = format_traceback(exc, exc_traceback)
@@ -729,27 +734,32 @@ def remove_catalog_duplicates(cart_id: int) -> None:
         raise BabelError(exc)
 
 
-def remove_temp_closed_locations(cart_id: int) -> None:
+def remove_temp_closed_locations(cart_id: int) -> int:
     """
     Deletes from OrderLocation tabel locations that
     are indicated as temporarily closed.
 
     Args:
         cart_id:                `Cart.did` to perform operation on
+
+    Returns:
+        number of deleted locations
     """
     try:
         with session_scope() as session:
-            instances = (
-                session.query(OrderLocation)
-                .join(Order, OrderLocation.order_id == Order.did)
-                .join(Branch, OrderLocation.branch_id == Branch.did)
-                .filter(Order.cart_id == cart_id)
-                .filter(Branch.temp_closed == True)
-            ).all()
-            for i in instances:
-                delete_record(session, OrderLocation, did=i.did)
-                mlogger.debug(f"Deleted OrderLocation record # {i.did}.")
-            session.commit()
+            row_count = delete_where(
+                session,
+                OrderLocation,
+                OrderLocation.order_id.in_(
+                    select(Order.did).where(Order.cart_id == cart_id)
+                ),
+                OrderLocation.branch_id.in_(
+                    select(Branch.did).where(Branch.temp_closed == True)
+                ),
+            )
+            mlogger.debug(f"Deleted {row_count} temporarily closed locations.")
+        return row_count
+
     except Exception as exc:
         _, _, exc_traceback = sys.exc_info()
         tb = format_traceback(exc, exc_traceback)
@@ -830,6 +840,8 @@ def save_displayed_order_data(tracker_values):
 
                 update_record(session, Order, order["order_id"], **okwargs)
 
+            log_session_memo_stats(session, "saving cart data")
+
     except Exception as exc:
         _, _, exc_traceback = sys.exc_info()
         tb = format_traceback(exc, exc_traceback)
@@ -1026,140 +1038,7 @@ def update_resource(resource_id, **kwargs):
 
 
 def validate_cart_data(cart_id):
-    issues = OrderedDict()
-    iss_count = 0
     with session_scope() as session:
-        cart_rec = retrieve_record(session, Cart, did=cart_id)
-        if cart_rec.system_id == 1 and cart_rec.library_id != 1:
-            iss_count += 1
-            issues[0] = "BPL cart library parameter must be set to 'branches'"
-        elif cart_rec.system_id == 2:
-            if not cart_rec.library_id or cart_rec.library_id == 3:
-                iss_count += 1
-                issues[0] = "NYPL carts must specify library"
-
-        n = 0
-        order_records = retrieve_records(session, Order, cart_id=cart_id)
-        for o in order_records:
-            ord_issues = []
-            n += 1
-            if not o.lang_id:
-                iss_count += 1
-                ord_issues.append("language")
-            if not o.audn_id:
-                iss_count += 1
-                ord_issues.append("audience")
-            if not o.vendor_id:
-                iss_count += 1
-                ord_issues.append("vendor")
-            if not o.matType_id:
-                iss_count += 1
-                ord_issues.append("material type")
-            if not o.resource.title:
-                iss_count += 1
-                ord_issues.append("title")
-            if not o.resource.price_disc:
-                iss_count += 1
-                ord_issues.append("discount price")
-            if o.resource.dup_catalog:
-                iss_count += 1
-                ord_issues.append("catalog duplicate")
-            if o.resource.dup_babel:
-                iss_count += 1
-                ord_issues.append("previously ordered")
-
-            grid_issues = OrderedDict()
-            m = 0
-            if o.locations:
-                for l in o.locations:
-                    m += 1
-                    loc_issues = []
-                    if not l.branch_id:
-                        iss_count += 1
-                        loc_issues.append("no branch")
-                    else:
-                        temp_closed, branch_code = is_temp_closed(session, l.branch_id)
-                        if temp_closed:
-                            iss_count += 1
-                            loc_issues.append(f"branch closed ({branch_code})")
-                    if not l.shelfcode_id:
-                        iss_count += 1
-                        loc_issues.append("no shelf code")
-                    if not l.qty:
-                        iss_count += 1
-                        loc_issues.append("no quantity")
-                    if not l.fund_id:
-                        iss_count += 1
-                        loc_issues.append("no fund")
-                    else:
-                        # verify fund here
-                        valid_fund = validate_fund(
-                            session,
-                            l.fund_id,
-                            cart_rec.system_id,
-                            cart_rec.library_id,
-                            o.audn_id,
-                            o.matType_id,
-                            l.branch_id,
-                        )
-                        if not valid_fund:
-                            iss_count += 1
-                            loc_issues.append("(incorrect) fund")
-
-                    if loc_issues:
-                        grid_issues[m] = loc_issues
-            else:
-                iss_count += 1
-                ord_issues.append("locations")
-
-            if ord_issues or grid_issues:
-                issues[n] = (ord_issues, grid_issues)
-
-    return iss_count, issues
-
-
-@lru_cache(maxsize=24)
-def is_temp_closed(session, branch_id):
-    branch_rec = retrieve_record(session, Branch, did=branch_id)
-    return branch_rec.temp_closed, branch_rec.code
-
-
-@lru_cache(maxsize=24)
-def validate_fund(
-    session, fund_id, system_id, library_id, audn_id, mattype_id, branch_id
-):
-    valid = True
-    params = [library_id, audn_id, mattype_id, branch_id]
-    for p in params:
-        if p is None:
-            return True
-
-    fund_rec = retrieve_record(session, Fund, did=fund_id)
-
-    fund_audn, fund_mat, fund_branch, fund_lib = valid_fund_ids(fund_rec)
-    if library_id not in fund_lib:
-        valid = False
-    if audn_id not in fund_audn:
-        valid = False
-    if mattype_id not in fund_mat:
-        valid = False
-    if branch_id not in fund_branch:
-        valid = False
-
-    return valid
-
-
-def valid_fund_ids(fund_rec):
-    fund_audn_ids = [a.audn_id for a in fund_rec.audns]
-    mlogger.debug(f"Fund {fund_rec.code} permitted audns: {fund_audn_ids}")
-
-    fund_mat_ids = [m.matType_id for m in fund_rec.matTypes]
-    mlogger.debug(f"Fund {fund_rec.code} permitted mats: {fund_mat_ids}")
-
-    fund_branch_ids = [b.branch_id for b in fund_rec.branches]
-    mlogger.debug(f"Fund {fund_rec.code} permitted branches: {fund_branch_ids}")
-
-    fund_library_ids = [l.library_id for l in fund_rec.libraries]
-    mlogger.debug(f"Fund {fund_rec.code} permitted libraries: {fund_library_ids}")
-
-    return (fund_audn_ids, fund_mat_ids, fund_branch_ids, fund_library_ids)
+        results = validate_cart(session, cart_id)
+        log_session_memo_stats(session, "cart validation")
+        return results
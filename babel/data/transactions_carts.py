@@ -2,27 +2,20 @@
 
 from datetime import datetime, date
 import logging
-import os
 import sys
 
 from pandas import read_sql
 
 from data.datastore import (
     session_scope,
-    Audn,
-    Branch,
     Cart,
-    Fund,
     Order,
-    Lang,
     Library,
-    MatType,
     Resource,
-    ShelfCode,
     User,
-    Vendor,
 )
 from data.datastore_worker import (
+    cart_order_sheet_stmn,
     count_records,
     get_cart_data_view_records,
     insert,
@@ -33,16 +26,22 @@ from data.datastore_worker import (
     retrieve_first_record,
     retrieve_last_record_filtered,
 )
+from data.marc_export import cart_marc_header, cart_marc_orders, export_carts_to_marc
+from data.reference_data import ref_data
 from errors import BabelError
 from logging_settings import format_traceback
 from gui.utils import get_id_from_index
 from ingest.sierra_exports import get_sierra_ids
-from marc.marc21 import make_bib
+from marc.marc21 import make_bib, make_bib_marc, marc_file_writer
 
 
 mlogger = logging.getLogger("babel")
 
 
+# number of order sheet rows fetched from the cursor at a time
+ORDER_SHEET_FETCH_SIZE = 1000
+
+
 def get_carts_data(system_id, user="All users", status=""):
     data = []
 
@@ -69,99 +68,50 @@ def get_carts_data(system_id, user="All users", status=""):
         raise BabelError(exc)
 
 
-def export_orders_to_marc_file(fh, cart_rec, progbar):
-    # this has to be rewritten to make it more transparent
-    # and easier to maintain
-
+def export_orders_to_marc_file(fh, cart_rec, progbar, fast_serializer=True):
+    """
+    Streams MARC records of cart orders to a single writer; the destination
+    file is replaced only after all records were written. Records are
+    serialized directly to bytes unless fast_serializer is False, in
+    which case pymarc Record objects are built and serialized
+    """
     try:
         progbar["value"] = 0
 
-        # overwrite existing files
-        if os.path.isfile(fh):
-            try:
-                os.remove(fh)
-            except WindowsError as e:
-                raise BabelError(f"File in use. Error: {e}")
+        # determine some global values
+        oclc_code, library_code, blanketPO, selector_code = cart_marc_header(
+            cart_rec,
+            ref_data.record(User, did=cart_rec.user_id),
+            ref_data.record(Library, did=cart_rec.library_id),
+        )
+        order_date = datetime.strftime(date.today(), "%m-%d-%Y")
+        if fast_serializer:
+            serialize = make_bib_marc
+        else:
+            serialize = lambda *args: make_bib(*args).as_marc()
 
         with session_scope() as session:
             rec_count = count_records(session, Order, cart_id=cart_rec.did)
             progbar["maximum"] = rec_count
 
-            selector = retrieve_record(session, User, did=cart_rec.user_id)
-            blanketPO = cart_rec.blanketPO
-            # determine some global values
-            if cart_rec.system_id == 1:
-                oclc_code = "BKL"
-                selector_code = selector.bpl_code
-
-            elif cart_rec.system_id == 2:
-                oclc_code = "NYP"
-                selector_code = selector.nyp_code
-
-            lib_rec = retrieve_record(session, Library, did=cart_rec.library_id)
-            library_code = lib_rec.code
-
-            ord_recs = retrieve_records(session, Order, cart_id=cart_rec.did)
-
-            for order in ord_recs:
-                mat_rec = retrieve_record(session, MatType, did=order.matType_id)
-                ven_rec = retrieve_record(session, Vendor, did=order.vendor_id)
-
-                if cart_rec.system_id == 1:
-                    order.mat_bib = mat_rec.bpl_bib_code
-                    order.mat_ord = mat_rec.bpl_ord_code
-                    order.vendor = ven_rec.bpl_code
-                elif cart_rec.system_id == 2:
-                    order.mat_bib = mat_rec.nyp_bib_code
-                    order.mat_ord = mat_rec.nyp_ord_code
-                    order.vendor = ven_rec.nyp_code
-
-                # retrieve joined values
-                rec = retrieve_record(session, Audn, did=order.audn_id)
-                order.audn = rec.code
-                rec = retrieve_record(session, Lang, did=order.lang_id)
-                order.lang = rec.code
-
-                copies = 0
-                locs = []
-                funds = []
-                for loc in order.locations:
-                    rec = retrieve_record(session, Branch, did=loc.branch_id)
-                    branch = rec.code
-                    try:
-                        rec = retrieve_record(session, ShelfCode, did=loc.shelfcode_id)
-                        shelfcode = rec.code
-                        shelf_with_audn = rec.includes_audn
-                    except AttributeError:
-                        shelfcode = ""
-                        shelf_with_audn = False
-                    try:
-                        rec = retrieve_record(session, Fund, did=loc.fund_id)
-                        fund = rec.code
-                    except AttributeError:
-                        fund = ""
-                    copies += loc.qty
-
-                    if shelf_with_audn:
-                        loc_str = f"{branch}{order.audn}{shelfcode}/{loc.qty}"
-                    else:
-                        if shelfcode is None:
-                            loc_str = f"{branch}/{loc.qty}"
-                        else:
-                            loc_str = f"{branch}{shelfcode}/{loc.qty}"
-                    locs.append(loc_str)
-
-                    fund_str = f"{fund}/{loc.qty}"
-                    funds.append(fund_str)
-
-                order.copies = str(copies)
-                order.locs = ",".join(locs)
-                order.funds = ",".join(funds)
-                order.order_date = datetime.strftime(date.today(), "%m-%d-%Y")
-
-                make_bib(fh, oclc_code, library_code, blanketPO, selector_code, order)
-                progbar["value"] += 1
-                progbar.update()
+            try:
+                with marc_file_writer(fh) as file:
+                    for order in cart_marc_orders(
+                        session, cart_rec.did, cart_rec.system_id, order_date
+                    ):
+                        file.write(
+                            serialize(
+                                oclc_code,
+                                library_code,
+                                blanketPO,
+                                selector_code,
+                                order,
+                            )
+                        )
+                        progbar["value"] += 1
+                        progbar.update()
+            except PermissionError as e:
+                raise BabelError(f"File in use. Error: {e}")
 
     except Exception as exc:
         _, _, exc_traceback = sys.exc_info()
@@ -170,6 +120,41 @@ def export_orders_to_marc_file(fh, cart_rec, progbar):
         raise BabelError(exc)
 
 
+def export_carts_to_marc_files(cart_ids, dst, combined, progbar):
+    """
+    Exports MARC records of several finalized carts in one batch using
+    worker processes; carts that fail are reported and skipped
+
+    args:
+        cart_ids: list of cart dids in order of output
+        dst: str, path to .mrc file if combined, otherwise to directory
+        combined: bool, write all carts to a single file
+        progbar: tkinter Progressbar advanced by each completed cart
+    returns:
+        report: list of marc_export.CartExport
+    """
+    try:
+        progbar["value"] = 0
+        progbar["maximum"] = len(cart_ids)
+
+        def progress(done, total, export):
+            progbar["value"] = done
+            progbar.update()
+
+        with session_scope() as session:
+            return export_carts_to_marc(
+                session, cart_ids, dst, combined=combined, progress=progress
+            )
+
+    except PermissionError as e:
+        raise BabelError(f"File in use. Error: {e}")
+    except Exception as exc:
+        _, _, exc_traceback = sys.exc_info()
+        tb = format_traceback(exc, exc_traceback)
+        mlogger.error("Unhandled error on batch MARC export." f"Traceback: {tb}")
+        raise BabelError(exc)
+
+
 def get_cart_details_as_dataframe(cart_id):
     with session_scope() as session:
         stmn = retrieve_cart_details_view_stmn(cart_id)
@@ -177,32 +162,32 @@ def get_cart_details_as_dataframe(cart_id):
         return df
 
 
-def get_cart_data_for_order_sheet(cart_id):
+def iter_cart_data_for_order_sheet(cart_id):
+    """
+    Streams order sheet rows of a cart as they are fetched from
+    the datastore; the session is open until the rows are consumed
+    """
     try:
-        data_set = []
         with session_scope() as session:
             cart_rec = retrieve_record(session, Cart, did=cart_id)
-            order_recs = retrieve_records(session, Order, cart_id=cart_id)
-            for rec in order_recs:
-                data = []
-                data.append(rec.resource.other_no)
-                data.append(rec.resource.isbn)
-                data.append(rec.resource.title)
-                data.append(rec.resource.author)
-                total_cost = 0
-                total_qty = 0
-                for loc in rec.locations:
-                    total_cost += loc.qty * rec.resource.price_disc
-                    total_qty += loc.qty
-                data.append(f"{rec.resource.price_disc:.2f}")
-                data.append(total_qty)
-                data.append(total_cost)
-                data.append(rec.oid)
-                data.append(cart_rec.blanketPO)
-                data_set.append(data)
-            session.expunge_all()
-
-        return data_set
+            blanketPO = cart_rec.blanketPO
+            result = session.execute(
+                cart_order_sheet_stmn(cart_id).execution_options(
+                    yield_per=ORDER_SHEET_FETCH_SIZE
+                )
+            )
+            for row in result:
+                yield [
+                    row.other_no,
+                    row.isbn,
+                    row.title,
+                    row.author,
+                    f"{row.price:.2f}",
+                    row.qty,
+                    row.cost,
+                    row.oid,
+                    blanketPO,
+                ]
 
     except Exception as exc:
         _, _, exc_traceback = sys.exc_info()
@@ -211,6 +196,10 @@ def get_cart_data_for_order_sheet(cart_id):
         raise BabelError(exc)
 
 
+def get_cart_data_for_order_sheet(cart_id):
+    return list(iter_cart_data_for_order_sheet(cart_id))
+
+
 def create_cart_copy(cart_id, system, user, profile_idx, cart_name, status):
     """
     Creates a copy of a cart
@@ -1,22 +1,37 @@
 # datastore transaction of ImportView widget
 
 from datetime import datetime
+from itertools import islice
 import logging
 import sys
+import time
 
 from sqlalchemy.inspection import inspect
 
 
-from data.datastore import session_scope, Cart, Order, Resource
-from data.datastore_worker import retrieve_record, insert
-from errors import BabelError
-from ingest.xlsx import ResourceDataReader
-from logging_settings import format_traceback
+try:
+    from data.datastore import session_scope, Cart, Order, Resource
+    from data.datastore_worker import retrieve_record, insert, insert_many
+    from errors import BabelError
+    from ingest.xlsx import ResourceDataReader
+    from logging_settings import format_traceback
+except ImportError:
+    # tests
+    from babel.data.datastore import session_scope, Cart, Order, Resource
+    from babel.data.datastore_worker import (
+        retrieve_record, insert, insert_many)
+    from babel.errors import BabelError
+    from babel.ingest.xlsx import ResourceDataReader
+    from babel.logging_settings import format_traceback
 
 
 mlogger = logging.getLogger('babel')
 
 
+# number of spreadsheet rows written to datastore per batch of statements
+BULK_BATCH_SIZE = 1000
+
+
 def create_resource_reader(template_record, sheet_fh):
     record = template_record
 
@@ -65,12 +80,102 @@ def create_resource_reader(template_record, sheet_fh):
         raise BabelError(exc)
 
 
+def resource_mapping(order_id, data):
+    """
+    Maps vendor data to Resource table columns
+
+    args:
+        order_id: int, datastore Order.did
+        data: VenData namedtuple
+    returns:
+        dict of Resource column values
+    """
+    return dict(
+        order_id=order_id,
+        title=data.title,
+        add_title=data.add_title,
+        author=data.author,
+        series=data.series,
+        publisher=data.publisher,
+        pub_date=data.pub_date,
+        pub_place=data.pub_place,
+        summary=data.summary,
+        isbn=data.isbn,
+        upc=data.upc,
+        other_no=data.other_no,
+        price_list=data.price_list,
+        price_disc=data.price_disc,
+        desc_url=data.desc_url,
+        misc=data.misc)
+
+
+def insert_resources_batch(session, cart_id, batch):
+    """
+    Inserts a batch of Order and Resource rows with one executemany
+    statement each. Order primary keys are backfilled by selecting
+    cart's orders created after the last known one; autoincremented ids
+    follow insert order.
+
+    args:
+        session: sqlalchemy session
+        cart_id: int, datastore Cart.did
+        batch: list of VenData namedtuples
+    returns:
+        order_ids: list of newly created Order.did in batch order
+    """
+    last_did = (
+        session.query(Order.did)
+        .filter(Order.cart_id == cart_id)
+        .order_by(Order.did.desc())
+        .limit(1)
+        .scalar())
+
+    insert_many(
+        session, Order,
+        [dict(cart_id=cart_id, comment=d.comment) for d in batch])
+
+    query = (
+        session.query(Order.did)
+        .filter(Order.cart_id == cart_id)
+        .order_by(Order.did))
+    if last_did is not None:
+        query = query.filter(Order.did > last_did)
+    order_ids = [r.did for r in query]
+
+    if len(order_ids) != len(batch):
+        raise BabelError(
+            'Unable to match created orders with spreadsheet rows.')
+
+    insert_many(
+        session, Resource,
+        [resource_mapping(oid, d) for oid, d in zip(order_ids, batch)])
+
+    return order_ids
+
+
 def create_cart(
         cart_name, system_id, profile_id,
-        resource_data, progbar):
+        resource_data, progbar, bulk=True, batch_size=BULK_BATCH_SIZE):
+    """
+    Creates a new cart with orders from ingested spreadsheet
+
+    args:
+        cart_name: str, name of the new cart
+        system_id: int, datastore System.did
+        profile_id: int, datastore User.did
+        resource_data: iterable of VenData namedtuples
+        progbar: tkinter Progressbar widget
+        bulk: boolean, True writes rows in batches of executemany
+              statements, False inserts & flushes each row separately
+        batch_size: int, number of spreadsheet rows per batch in bulk mode
+    returns:
+        created_cart_id: int, datastore Cart.did
+    """
 
     try:
         with session_scope() as session:
+            start = time.perf_counter()
+            row_count = 0
 
             # create Cart record
             name_exists = True
@@ -103,36 +208,41 @@ def create_cart(
             progbar.update()
 
             # create Resource records
-            for d in resource_data:
-                ord_rec = insert(
-                    session, Order,
-                    cart_id=cart_rec.did,
-                    comment=d.comment)
-
-                insert(
-                    session, Resource,
-                    order_id=ord_rec.did,
-                    title=d.title,
-                    add_title=d.add_title,
-                    author=d.author,
-                    series=d.series,
-                    publisher=d.publisher,
-                    pub_date=d.pub_date,
-                    pub_place=d.pub_place,
-                    summary=d.summary,
-                    isbn=d.isbn,
-                    upc=d.upc,
-                    other_no=d.other_no,
-                    price_list=d.price_list,
-                    price_disc=d.price_disc,
-                    desc_url=d.desc_url,
-                    misc=d.misc)
-
-                progbar['value'] += 1
-                progbar.update()
+            if bulk:
+                resource_data = iter(resource_data)
+                while True:
+                    batch = list(islice(resource_data, batch_size))
+                    if not batch:
+                        break
+                    insert_resources_batch(session, cart_rec.did, batch)
+                    row_count += len(batch)
+
+                    progbar['value'] += len(batch)
+                    progbar.update()
+            else:
+                for d in resource_data:
+                    ord_rec = insert(
+                        session, Order,
+                        cart_id=cart_rec.did,
+                        comment=d.comment)
+
+                    insert(
+                        session, Resource,
+                        **resource_mapping(ord_rec.did, d))
+                    row_count += 1
+
+                    progbar['value'] += 1
+                    progbar.update()
 
             session.flush()
 
+            elapsed = time.perf_counter() - start
+            mlogger.info(
+                f'Ingested {row_count} rows into cart {cart_rec.did} '
+                f'in {elapsed:.2f}s '
+                f'({row_count / max(elapsed, 1e-6):.0f} rows/sec, '
+                f'bulk={bulk}).')
+
             created_cart_id = cart_rec.did
             return created_cart_id
 
@@ -1,11 +1,8 @@
 # supports searches in Babel search widget
 from datetime import date
-from functools import lru_cache
 import logging
 import sys
 
-from sqlalchemy.sql import text
-
 
 from data.datastore import (
     session_scope,
@@ -23,9 +20,11 @@ from data.datastore import (
     Fund,
     Branch,
     ShelfCode,
+    Status,
     Wlos,
 )
 from data.datastore_worker import retrieve_record
+from data.reference_data import ref_data
 from errors import BabelError
 from logging_settings import format_traceback
 
@@ -33,215 +32,106 @@ from logging_settings import format_traceback
 mlogger = logging.getLogger("babel")
 
 
-@lru_cache(maxsize=2)
-def get_shelfcode(session, shelfcode_id, audn_code):
+def get_shelfcode(shelfcode_id, audn_code):
     shelfcode = ""
     if shelfcode_id is not None:
-        stmn = text(
-            """
-            SELECT code, includes_audn FROM shelfcode
-            WHERE did=:shelfcode_id
-            """
-        )
-        stmn = stmn.bindparams(shelfcode_id=shelfcode_id)
-        instances = session.execute(stmn)
-        shelfcode = ""
-        for i in instances:
-            if i.includes_audn:
-                shelfcode = f"{audn_code}{i.code}"
+        rec = ref_data.record(ShelfCode, did=shelfcode_id)
+        if rec is not None:
+            if rec.includes_audn:
+                shelfcode = f"{audn_code}{rec.code}"
             else:
-                shelfcode = f"{i.code}"
-            break
+                shelfcode = f"{rec.code}"
     return shelfcode
 
 
-@lru_cache(maxsize=10)
-def get_fund_code(session, fund_id):
+def get_fund_code(fund_id):
     code = None
     if fund_id is not None:
-        stmn = text(
-            """
-            SELECT code FROM fund
-            WHERE did=:fund_id
-            """
-        )
-        stmn = stmn.bindparams(fund_id=fund_id)
-        instances = session.execute(stmn)
-        for i in instances:
-            code = i.code
-            break
+        rec = ref_data.record(Fund, did=fund_id)
+        if rec is not None:
+            code = rec.code
     return code
 
 
-@lru_cache(maxsize=20)
-def get_branch_code(session, branch_id):
+def get_branch_code(branch_id):
     code = None
     if branch_id is not None:
-        stmn = text(
-            """
-            SELECT code FROM branch
-            WHERE did=:branch_id
-            """
-        )
-        stmn = stmn.bindparams(branch_id=branch_id)
-        instances = session.execute(stmn)
-        for i in instances:
-            code = i.code
-            break
+        rec = ref_data.record(Branch, did=branch_id)
+        if rec is not None:
+            code = rec.code
     return code
 
 
-@lru_cache(maxsize=2)
-def get_vendor_code(session, vendor_id, system):
+def get_vendor_code(vendor_id, system):
     code = None
     if vendor_id is not None:
-        if system == "BPL":
-            stmn = text(
-                """
-                SELECT bpl_code FROM vendor
-                WHERE did=:vendor_id
-                """
-            )
-        elif system == "NYP":
-            stmn = text(
-                """
-                SELECT nyp_code FROM vendor
-                WHERE did=:vendor_id
-                """
-            )
-        stmn = stmn.bindparams(vendor_id=vendor_id)
-        instances = session.execute(stmn)
-        for i in instances:
+        rec = ref_data.record(Vendor, did=vendor_id)
+        if rec is not None:
             if system == "BPL":
-                code = i.bpl_code
+                code = rec.bpl_code
             elif system == "NYP":
-                code = i.nyp_code
-            break
-        return code
+                code = rec.nyp_code
+    return code
 
 
-@lru_cache(maxsize=2)
-def get_lang_name(session, lang_id):
+def get_lang_name(lang_id):
     name = None
     if lang_id is not None:
-        stmn = text(
-            """
-            SELECT name FROM lang
-            WHERE did=:lang_id
-            """
-        )
-        stmn = stmn.bindparams(lang_id=lang_id)
-        instances = session.execute(stmn)
-        for i in instances:
-            name = i.name
-            break
+        rec = ref_data.record(Lang, did=lang_id)
+        if rec is not None:
+            name = rec.name
     return name
 
 
-@lru_cache(maxsize=2)
-def get_audn_name_and_code(session, audn_id):
+def get_audn_name_and_code(audn_id):
     name = None
     code = None
     if audn_id is not None:
-        stmn = text(
-            """
-            SELECT name, code FROM audn
-            WHERE did=:audn_id
-            """
-        )
-        stmn = stmn.bindparams(audn_id=audn_id)
-        instances = session.execute(stmn)
-        for i in instances:
-            code = i.code
-            name = i.name
-            break
+        rec = ref_data.record(Audn, did=audn_id)
+        if rec is not None:
+            code = rec.code
+            name = rec.name
     return name, code
 
 
-@lru_cache(maxsize=2)
-def get_mattype_name(session, mattype_id):
+def get_mattype_name(mattype_id):
     name = None
     if mattype_id is not None:
-        stmn = text(
-            """
-            SELECT name FROM mattype
-            WHERE did=:mattype_id
-            """
-        )
-        stmn = stmn.bindparams(mattype_id=mattype_id)
-        instances = session.execute(stmn)
-        for i in instances:
-            name = i.name
-            break
+        rec = ref_data.record(MatType, did=mattype_id)
+        if rec is not None:
+            name = rec.name
     return name
 
 
-@lru_cache(maxsize=4)
-def get_status_name(session, status_id):
-    stmn = text(
-        """
-        SELECT name FROM status
-        WHERE did=:status_id
-        """
-    )
-    stmn = stmn.bindparams(status_id=status_id)
-    instances = session.execute(stmn)
-    for i in instances:
-        name = i.name
-        break
+def get_status_name(status_id):
+    name = None
+    rec = ref_data.record(Status, did=status_id)
+    if rec is not None:
+        name = rec.name
     return name
 
 
-@lru_cache(maxsize=2)
-def get_library_name(session, library_id):
-    stmn = text(
-        """
-        SELECT name FROM library
-        WHERE did=:library_id
-        """
-    )
-    stmn = stmn.bindparams(library_id=library_id)
-    instances = session.execute(stmn)
-
+def get_library_name(library_id):
     name = None
-    for i in instances:
-        name = i.name
-        break
-
+    rec = ref_data.record(Library, did=library_id)
+    if rec is not None:
+        name = rec.name
     return name
 
 
-@lru_cache(maxsize=2)
-def get_system_name(session, system_id):
+def get_system_name(system_id):
     name = None
-    stmn = text(
-        """
-        SELECT name FROM `system`
-        WHERE did=:system_id
-        """
-    )
-    stmn = stmn.bindparams(system_id=system_id)
-    instances = session.execute(stmn)
-    for i in instances:
-        name = i.name
-        break
+    rec = ref_data.record(System, did=system_id)
+    if rec is not None:
+        name = rec.name
     return name
 
 
-@lru_cache(maxsize=4)
-def get_owner(session, user_id):
+def get_owner(user_id):
     owner = None
-    stmn = text(
-        """
-        SELECT name FROM `user`
-        WHERE did=:user_id
-        """
-    )
-    stmn = stmn.bindparams(user_id=user_id)
-    instances = session.execute(stmn)
-    for i in instances:
-        owner = i.name
-        break
+    rec = ref_data.record(User, did=user_id)
+    if rec is not None:
+        owner = rec.name
     return owner
 
 
@@ -278,10 +168,10 @@ def get_data_by_identifier(keyword, keyword_type):
             for cart_rec, ord_rec, res_rec in recs:
                 # cart
                 cart = cart_rec.name
-                owner = get_owner(session, cart_rec.user_id)
-                system = get_system_name(session, cart_rec.system_id)
-                library = get_library_name(session, cart_rec.library_id)
-                status = get_status_name(session, cart_rec.status_id)
+                owner = get_owner(cart_rec.user_id)
+                system = get_system_name(cart_rec.system_id)
+                library = get_library_name(cart_rec.library_id)
+                status = get_status_name(cart_rec.status_id)
                 created = cart_rec.created
                 blanketPO = cart_rec.blanketPO
 
@@ -291,17 +181,17 @@ def get_data_by_identifier(keyword, keyword_type):
                 wlo = ord_rec.wlo
                 po = ord_rec.poPerLine
 
-                lang = get_lang_name(session, ord_rec.lang_id)
-                audn_name, audn_code = get_audn_name_and_code(session, ord_rec.audn_id)
-                vendor = get_vendor_code(session, ord_rec.vendor_id, system)
-                mattype = get_mattype_name(session, ord_rec.matType_id)
+                lang = get_lang_name(ord_rec.lang_id)
+                audn_name, audn_code = get_audn_name_and_code(ord_rec.audn_id)
+                vendor = get_vendor_code(ord_rec.vendor_id, system)
+                mattype = get_mattype_name(ord_rec.matType_id)
 
                 locs = []
                 for loc in ord_rec.locations:
-                    branch = get_branch_code(session, loc.branch_id)
-                    shelfcode = get_shelfcode(session, loc.shelfcode_id, audn_code)
+                    branch = get_branch_code(loc.branch_id)
+                    shelfcode = get_shelfcode(loc.shelfcode_id, audn_code)
                     qty = loc.qty
-                    fund = get_fund_code(session, loc.fund_id)
+                    fund = get_fund_code(loc.fund_id)
                     locs.append(f"{branch}{shelfcode}({qty})/{fund}")
 
                 # resouce
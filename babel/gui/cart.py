@@ -18,6 +18,7 @@ from data.transactions_cart import (
     determine_needs_validation,
     get_branch_idx,
     get_cart_resources,
+    get_catalog_bib_data,
     get_last_cart,
     get_orders_by_id,
     has_library_assigned,
@@ -66,7 +67,7 @@ from gui.edit_resource import EditResourceWidget
 from logging_settings import LogglyAdapter
 from paths import get_user_data_handle
 from reports.cart import tabulate_cart_data
-from sierra_adapters.comms import select_middleware, catalog_lookup
+from sierra_adapters.comms import select_middleware
 
 mlogger = LogglyAdapter(logging.getLogger("babel"), None)
 
@@ -1035,7 +1036,9 @@ class CartView(Frame):
         values = listbox.get(0, END)
         selected_funds = [values[s] for s in selected]
         try:
-            apply_fund_to_cart(self.system.get(), self.cart_id.get(), selected_funds)
+            updated, unmatched = apply_fund_to_cart(
+                self.system.get(), self.cart_id.get(), selected_funds
+            )
         except BabelError as e:
             self.cur_manager.notbusy()
             messagebox.showerror(
@@ -1044,6 +1047,12 @@ class CartView(Frame):
         else:
             self.update_funds_tally()
             self.cur_manager.notbusy()
+            if unmatched:
+                messagebox.showwarning(
+                    "Funds",
+                    f"Funds applied to {updated} locations.\n"
+                    f"{unmatched} locations did not match any of selected funds.",
+                )
 
         # update display
         # maybe it would be better to simply insert
@@ -1100,9 +1109,14 @@ class CartView(Frame):
         if self.discountChb_var.get():
             widgets["discEnt"] = self.discEnt
 
+        top = Toplevel(self)
+        top.title("Applying global values")
+        progbar = Progressbar(top, mode="determinate", orient=HORIZONTAL, length=300)
+        progbar.grid(row=0, column=0, sticky="snew", padx=10, pady=10)
+
         self.cur_manager.busy()
         try:
-            apply_globals_to_cart(self.cart_id.get(), widgets)
+            apply_globals_to_cart(self.cart_id.get(), widgets, progbar)
             self.cur_manager.notbusy()
         except BabelError as e:
             self.cur_manager.notbusy()
@@ -1110,6 +1124,8 @@ class CartView(Frame):
                 "Database error",
                 "Something went wrong when applying global values.\n" f"Error: {e}",
             )
+        finally:
+            top.destroy()
 
         self._redo_preview_frame()
         self.display_selected_orders(self.selected_order_ids)
@@ -1530,11 +1546,27 @@ class CartView(Frame):
         frm.columnconfigure(0, minsize=120)
         frm.columnconfigure(1, minsize=120)
 
+        staleBtn = Button(
+            frm,
+            text="recheck stale only",
+            command=lambda: self.run_duplicate_search(top, progbar, stale_only=True),
+        )
+        staleBtn.grid(row=0, column=0, sticky="snew", padx=5, pady=5)
+        self._createToolTip(
+            staleBtn, "search only titles not checked recently or with changed ISBN/UPC"
+        )
+
+        fullBtn = Button(
+            frm,
+            text="full recheck",
+            command=lambda: self.run_duplicate_search(top, progbar, stale_only=False),
+        )
+        fullBtn.grid(row=0, column=1, sticky="snew", padx=5, pady=5)
+        self._createToolTip(fullBtn, "search all titles in the cart")
+
         progbar = Progressbar(frm, mode="determinate", orient=HORIZONTAL)
         progbar.grid(row=1, column=0, columnspan=2, sticky="snew", pady=5)
 
-        self.run_duplicate_search(top, progbar)
-
     def help(self):
         # link to Github wiki with documentation here
         open_url("https://github.com/BookOps-CAT/babel/wiki/Cart")
@@ -2006,7 +2038,7 @@ class CartView(Frame):
         self.discountChb_var.set(0)
         self.funds_tally.set("")
 
-    def run_duplicate_search(self, top, progbar):
+    def run_duplicate_search(self, top, progbar, stale_only=False):
         self.cur_manager.busy()
 
         creds_fh = get_user_data_handle()
@@ -2024,7 +2056,13 @@ class CartView(Frame):
                 )
 
         try:
-            find_matches(self.cart_id.get(), creds_fh, self.middleware, progbar)
+            find_matches(
+                self.cart_id.get(),
+                creds_fh,
+                self.middleware,
+                progbar,
+                stale_only=stale_only,
+            )
             self.cur_manager.notbusy()
         except BabelError as e:
             self.cur_manager.notbusy()
@@ -2363,7 +2401,9 @@ class CartView(Frame):
             )
 
             for sierra_number in sierra_numbers_lst:
-                bib_data = catalog_lookup(self.middleware, sierra_number)
+                bib_data = get_catalog_bib_data(
+                    sierra_number, user_data, self.middleware, self.system.get()
+                )
                 dups_data.append(bib_data)
 
             CatalogDupWidget(self, dups_data)
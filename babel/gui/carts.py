@@ -12,10 +12,11 @@ from data.datastore import Cart, Library, Status
 from data.transactions_carts import (
     add_sierra_ids_to_orders,
     create_cart_copy,
+    export_carts_to_marc_files,
     export_orders_to_marc_file,
-    get_cart_data_for_order_sheet,
     get_carts_data,
     get_cart_id_ranges,
+    iter_cart_data_for_order_sheet,
 )
 from gui.data_retriever import get_record, delete_data_by_did
 from gui.fonts import RFONT
@@ -238,7 +239,7 @@ class CartsView(Frame):
         )
         # self.marcBtn.image = marcImg
         self.marcBtn.grid(row=3, column=0, sticky="sw", padx=10, pady=5)
-        self.createToolTip(self.marcBtn, "create MARC file")
+        self.createToolTip(self.marcBtn, "create MARC file(s)")
 
         self.sheetBtn = Button(
             self.actionFrm, image=sheetImg, command=self.create_order_sheet
@@ -482,7 +483,77 @@ class CartsView(Frame):
                 parent=top,
             )
 
+    def ask_for_destination_dir(self, title):
+        user_data = shelve.open(USER_DATA)
+        initialdir = user_data.get("marc_out", MY_DOCS)
+        dst_dir = filedialog.askdirectory(
+            parent=self, title=title, initialdir=initialdir
+        )
+        if dst_dir:
+            user_data["marc_out"] = dst_dir
+        user_data.close()
+        return dst_dir
+
+    def create_batch_marc_files(self, cart_ids):
+        combined = messagebox.askyesnocancel(
+            "Output to MARC files",
+            f"Exporting {len(cart_ids)} selected carts.\n"
+            "Save records of all carts in a single MARC file?\n"
+            "(No saves a file named after each cart.)",
+        )
+        if combined is None:
+            return
+        if combined:
+            dst = self.ask_for_destination("Saving to MARC File", "carts")
+        else:
+            dst = self.ask_for_destination_dir("Saving to MARC Files")
+        if not dst:
+            return
+
+        top = Toplevel()
+        top.title("Saving to MARC files")
+        frm = Frame(top)
+        frm.grid(row=0, column=0, sticky="snew", padx=20, pady=20)
+        Label(frm, text=f"Converting {len(cart_ids)} carts to MARC.").grid(
+            row=0, column=0, columnspan=4, sticky="snew"
+        )
+        progbar = Progressbar(frm, mode="determinate", orient=HORIZONTAL)
+        progbar.grid(row=1, column=0, columnspan=4, sticky="snew", pady=5)
+
+        try:
+            self.cur_manager.busy()
+            report = export_carts_to_marc_files(cart_ids, dst, combined, progbar)
+            self.cur_manager.notbusy()
+            top.destroy()
+        except BabelError as e:
+            self.cur_manager.notbusy()
+            messagebox.showerror(
+                "Saving Error", f"Unable to create MARC files.\nError: {e}", parent=top
+            )
+            return
+
+        lines = [
+            f"{e.name or e.cart_id}: {e.orders} orders in "
+            f"{e.fetch_seconds + e.build_seconds + e.write_seconds:.1f}s"
+            if e.error is None
+            else f"{e.name or e.cart_id}: FAILED - {e.error}"
+            for e in report
+        ]
+        failed = [e for e in report if e.error is not None]
+        msg = f"Exported {len(report) - len(failed)} of {len(report)} carts.\n\n"
+        msg += "\n".join(lines)
+        if failed:
+            messagebox.showwarning("Output to MARC files", msg)
+        else:
+            messagebox.showinfo("Output to MARC files", msg)
+
     def create_marc_file(self):
+        selection = self.cartTrv.selection()
+        if len(selection) > 1:
+            self.create_batch_marc_files(
+                [self.cartTrv.item(item)["values"][0] for item in selection]
+            )
+            return
         cart_rec = get_record(Cart, did=self.selected_cart_id.get())
         if cart_rec:
             status = get_record(Status, did=cart_rec.status_id)
@@ -510,22 +581,17 @@ class CartsView(Frame):
             if status.name == "finalized":
                 dst_fh = self.ask_for_destination("Export to spreasheet", cart_rec.name)
                 if dst_fh:
-                    cart_data = []
+                    # rows are written as they are retrieved from database
+                    cart_data = iter_cart_data_for_order_sheet(
+                        self.selected_cart_id.get()
+                    )
                     try:
-                        cart_data = get_cart_data_for_order_sheet(
-                            self.selected_cart_id.get()
-                        )
+                        self.cur_manager.busy()
+                        save2spreadsheet(dst_fh, systemLbl, cart_data)
+                        self.cur_manager.notbusy()
                     except BabelError as e:
-                        messagebox.showerror(
-                            "Retrieval Error",
-                            "Unable to retrieve records from database.\n" f"Error: {e}",
-                        )
-
-                    if cart_data:
-                        try:
-                            save2spreadsheet(dst_fh, systemLbl, cart_data)
-                        except BabelError as e:
-                            messagebox.showerror("Saving error", e)
+                        self.cur_manager.notbusy()
+                        messagebox.showerror("Saving error", e)
             else:
                 msg = (
                     f'Cart "{cart_rec.name}" is not finalized.\n'
@@ -12,6 +12,7 @@ from sqlalchemy.inspection import inspect
 
 
 from data.datastore import session_scope
+from data.reference_data import ref_data, CACHED_MODELS
 from data.datastore_worker import (get_column_values, retrieve_record,
                                    retrieve_records, retrieve_last_record,
                                    insert_or_ignore, delete_record,
@@ -41,18 +42,30 @@ def convert4datastore(kwargs):
     return kwargs
 
 
+def _column_sort_key(value):
+    # mimics datastore ordering: NULLs first, case insensitive
+    return (value is not None, '' if value is None else value.lower())
+
+
 def get_names(model, **kwargs):
     # mlogger.debug(f'get_names call with kwargs: {kwargs}')
+    if model in CACHED_MODELS:
+        values = [r.name for r in ref_data.records(model, **kwargs)]
+        return sorted(values, key=_column_sort_key)
+
     values = []
     with session_scope() as session:
         res = get_column_values(
             session, model, 'name', **kwargs)
-        for x in res:
-            values = sorted([x.name for x in res])
+        values = sorted([x.name for x in res], key=_column_sort_key)
     return values
 
 
 def get_codes(model, **kwargs):
+    if model in CACHED_MODELS:
+        values = [r.code for r in ref_data.records(model, **kwargs)]
+        return sorted(values, key=_column_sort_key)
+
     values = []
     with session_scope() as session:
         res = get_column_values(
@@ -108,6 +121,9 @@ def create_name_index(model, **kwargs):
     returns:
         idx: dict, {column value: datastore id}
     """
+    if model in CACHED_MODELS:
+        return ref_data.name_index(model, **kwargs)
+
     idx = {}
     with session_scope() as session:
         instances = retrieve_records(session, model, **kwargs)
@@ -128,6 +144,9 @@ def create_code_index(model, **kwargs):
     returns:
         idx: dict, {column value: datastore id}
     """
+    if model in CACHED_MODELS:
+        return ref_data.code_index(model, **kwargs)
+
     idx = {}
     with session_scope() as session:
         instances = retrieve_records(session, model, **kwargs)
@@ -33,6 +33,10 @@ from logging_settings import format_traceback, LogglyAdapter
 mlogger = LogglyAdapter(logging.getLogger("babel"), None)
 
 
+# sheet preview rows inserted per event loop iteration
+PREVIEW_BATCH_SIZE = 50
+
+
 class ImportView(Frame):
     """
     Sheet import window
@@ -57,6 +61,8 @@ class ImportView(Frame):
         self.sheet_name.trace("w", self.sheet_observer)
         self.record = None
         self.edit_mode = False
+        self.preview_job = None
+        self.bind("<Destroy>", self.cancel_preview)
         self.header_row = StringVar()
         self.title_col = StringVar()
         self.add_title_col = StringVar()
@@ -426,56 +432,87 @@ class ImportView(Frame):
         if self.fh:
             self.cur_manager.busy()
             # provide template layout
+            tmask = {}
             if self.record:
                 tmask = self.template_mask()
                 mlogger.debug("Applying template mask: {}".format(tmask))
             try:
                 sheet_reader = SheetReader(self.fh)
-                max_row = sheet_reader.max_row
-                max_column = sheet_reader.max_column
-                rowLst = Listbox(
-                    self.preview_frame, font=LFONT, width=3, height=max_row + 1
-                )
-                rowLst.grid(row=1, column=1, sticky="nsw")
-
-                if self.record:
-                    rowLst.insert(END, "")
-
-                for row in range(max_row + 1):
-                    rowLst.insert(END, row)
-                if self.record:
-                    rowLst.itemconfig(self.record.header_row + 1, {"bg": "SteelBlue1"})
-                c = 0
-                r = 0
-                for column in range(max_column):
-                    colLst = Listbox(
-                        self.preview_frame, font=LFONT, width=15, height=max_row + 1
-                    )
-                    colLst.grid(row=1, column=c + 2, sticky="nsw")
-                    if self.record:
-                        if column in tmask:
-                            colLst["bg"] = "SlateGray1"
-                            colLst.insert(END, tmask[column])
-                        else:
-                            colLst.insert(END, "")
-                    colLst.insert(END, str(c))
-                    for row in sheet_reader:
-                        if row[r] is None:
-                            colLst.insert(END, "")
-                        else:
-                            colLst.insert(END, row[r])
-                    if self.record:
-                        colLst.itemconfig(
-                            self.record.header_row + 1, {"bg": "SteelBlue1"}
-                        )
-                    r += 1
-                    c += 1
             except BabelError as e:
                 self.cur_manager.notbusy()
                 mlogger.error(f"Sheet load error: {e}")
                 messagebox.showerror("Loading sheet error", f"Error: {e}")
-            else:
-                self.cur_manager.notbusy()
+                return
+
+            max_row = sheet_reader.max_row + int(sheet_reader.truncated)
+            rowLst = Listbox(
+                self.preview_frame, font=LFONT, width=3, height=max_row + 1
+            )
+            rowLst.grid(row=1, column=1, sticky="nsw")
+
+            if self.record:
+                rowLst.insert(END, "")
+            rowLst.insert(END, 0)
+
+            colLsts = []
+            for column in range(sheet_reader.max_column):
+                colLst = Listbox(
+                    self.preview_frame, font=LFONT, width=15, height=max_row + 1
+                )
+                colLst.grid(row=1, column=column + 2, sticky="nsw")
+                if self.record:
+                    if column in tmask:
+                        colLst["bg"] = "SlateGray1"
+                        colLst.insert(END, tmask[column])
+                    else:
+                        colLst.insert(END, "")
+                colLst.insert(END, str(column))
+                colLsts.append(colLst)
+
+            # rows are rendered in batches to keep the window responsive
+            self.preview_job = self.after_idle(
+                self.render_preview_rows,
+                iter(sheet_reader),
+                rowLst,
+                colLsts,
+                1,
+                sheet_reader.truncated,
+            )
+
+    def render_preview_rows(self, rows, rowLst, colLsts, row_no, truncated):
+        if not rowLst.winfo_exists():
+            # preview was destroyed while batches were queued
+            self.preview_job = None
+            return
+        for row in rows:
+            rowLst.insert(END, row_no)
+            for colLst, value in zip(colLsts, row):
+                if value is None:
+                    colLst.insert(END, "")
+                else:
+                    colLst.insert(END, value)
+            row_no += 1
+            if row_no % PREVIEW_BATCH_SIZE == 0:
+                self.preview_job = self.after(
+                    1,
+                    self.render_preview_rows,
+                    rows,
+                    rowLst,
+                    colLsts,
+                    row_no,
+                    truncated,
+                )
+                return
+
+        self.preview_job = None
+        if truncated:
+            rowLst.insert(END, "...")
+            for colLst in colLsts:
+                colLst.insert(END, "...")
+        if self.record and self.record.header_row + 1 < rowLst.size():
+            for lst in [rowLst] + colLsts:
+                lst.itemconfig(self.record.header_row + 1, {"bg": "SteelBlue1"})
+        self.cur_manager.notbusy()
 
     def template_mask(self):
         tmask = {}
@@ -527,7 +564,16 @@ class ImportView(Frame):
     def onFrameConfigure(self, event):
         self.preview_base.config(scrollregion=self.preview_base.bbox("all"))
 
+    def cancel_preview(self, *args):
+        if self.preview_job is None:
+            return False
+        self.after_cancel(self.preview_job)
+        self.preview_job = None
+        return True
+
     def reset_preview(self):
+        if self.cancel_preview():
+            self.cur_manager.notbusy()
         self.preview_frame.grid_forget()
         self.preview_frame.destroy()
         self.preview()
@@ -6,12 +6,21 @@ from tkinter import messagebox
 
 
 from credentials import get_from_vault, store_in_vault
-from data.datastore import DB_DIALECT, DB_DRIVER, DB_CHARSET
+from data.catalog_cache import catalog_cache_options, save_catalog_cache_options
+from data.datastore import (
+    DB_DIALECT,
+    DB_DRIVER,
+    DB_CHARSET,
+    apply_profiling_options,
+    dispose_data_access_layer,
+)
+from data.query_profiler import profiling_options, save_profiling_options
+from data.reference_data import ref_data
 from errors import BabelError
 from gui.fonts import RFONT
 from gui.utils import ToolTip, disable_widgets, open_url
 from logging_settings import LogglyAdapter
-from paths import USER_DATA
+from paths import PROFILE_LOG_PATH, USER_DATA
 
 
 mlogger = LogglyAdapter(logging.getLogger("babel"), None)
@@ -44,6 +53,11 @@ class SettingsView(Frame):
         self.plat_secret = StringVar()
         self.solr_endpoint = StringVar()
         self.solr_secret = StringVar()
+        self.profiling = BooleanVar()
+        self.profiling_threshold = IntVar()
+        self.cache_ttl = IntVar()
+        self.cache_refresh = BooleanVar()
+        self.recheck_days = IntVar()
 
         # icons
         # getImg = self.app_data['img']['view']
@@ -190,6 +204,98 @@ class SettingsView(Frame):
         )
         self.solr_secretEnt.grid(row=1, column=1, sticky="snew", padx=10, pady=4)
 
+        # datastore query profiling
+        self.profFrm = LabelFrame(self, text="Diagnostics")
+        self.profFrm.columnconfigure(0, minsize=120)
+        self.profFrm.columnconfigure(1, minsize=400)
+        self.profFrm.grid(row=3, column=1, sticky="snew", padx=20, pady=10)
+
+        self.profilingChk = Checkbutton(
+            self.profFrm,
+            text="profile database queries",
+            variable=self.profiling,
+            command=self.save_profiling,
+        )
+        self.profilingChk.grid(
+            row=0, column=0, columnspan=2, sticky="snw", padx=10, pady=4
+        )
+
+        Label(self.profFrm, text="N+1 threshold:").grid(
+            row=1, column=0, sticky="snw", padx=10, pady=4
+        )
+        self.profiling_thresholdSpb = Spinbox(
+            self.profFrm,
+            font=RFONT,
+            from_=2,
+            to=1000,
+            width=6,
+            textvariable=self.profiling_threshold,
+        )
+        self.profiling_thresholdSpb.grid(row=1, column=1, sticky="snw", padx=10, pady=4)
+        # threshold is applied once editing is done, not on every spinbox click
+        self.profiling_thresholdSpb.bind("<FocusOut>", self.save_profiling)
+        self.profiling_thresholdSpb.bind("<Return>", self.save_profiling)
+        self.createToolTip(
+            self.profiling_thresholdSpb,
+            "report statements executed more times in one transaction",
+        )
+
+        Label(self.profFrm, text=f"profiles are saved to {PROFILE_LOG_PATH}").grid(
+            row=2, column=0, columnspan=2, sticky="snw", padx=10, pady=4
+        )
+
+        # catalog lookups cache & duplicates recheck
+        self.cacheFrm = LabelFrame(self, text="Catalog searches")
+        self.cacheFrm.columnconfigure(0, minsize=120)
+        self.cacheFrm.columnconfigure(1, minsize=400)
+        self.cacheFrm.grid(row=4, column=1, sticky="snew", padx=20, pady=10)
+
+        Label(self.cacheFrm, text="keep for hours:").grid(
+            row=0, column=0, sticky="snw", padx=10, pady=4
+        )
+        self.cache_ttlSpb = Spinbox(
+            self.cacheFrm,
+            font=RFONT,
+            from_=0,
+            to=720,
+            width=6,
+            textvariable=self.cache_ttl,
+            command=self.save_catalog_cache,
+        )
+        self.cache_ttlSpb.grid(row=0, column=1, sticky="snw", padx=10, pady=4)
+        self.createToolTip(
+            self.cache_ttlSpb,
+            "search the catalog again for results older than this, 0 disables cache",
+        )
+
+        self.cache_refreshChk = Checkbutton(
+            self.cacheFrm,
+            text="always refresh cached results",
+            variable=self.cache_refresh,
+            command=self.save_catalog_cache,
+        )
+        self.cache_refreshChk.grid(
+            row=1, column=0, columnspan=2, sticky="snw", padx=10, pady=4
+        )
+
+        Label(self.cacheFrm, text="recheck after days:").grid(
+            row=2, column=0, sticky="snw", padx=10, pady=4
+        )
+        self.recheck_daysSpb = Spinbox(
+            self.cacheFrm,
+            font=RFONT,
+            from_=0,
+            to=365,
+            width=6,
+            textvariable=self.recheck_days,
+            command=self.save_catalog_cache,
+        )
+        self.recheck_daysSpb.grid(row=2, column=1, sticky="snw", padx=10, pady=4)
+        self.createToolTip(
+            self.recheck_daysSpb,
+            "titles checked earlier are searched again by stale only recheck",
+        )
+
     def edit_access(self):
         self.db_hostEnt["state"] = "!disable"
         self.db_portEnt["state"] = "!disable"
@@ -254,6 +360,11 @@ class SettingsView(Frame):
                 store_in_vault("babel_solr", "babel", self.solr_secret.get().strip())
             except BabelError as e:
                 mlogger.error(f"DB store_in_vault error. Error: {e}")
+
+            # drop pooled connections opened with previous settings
+            dispose_data_access_layer()
+            ref_data.invalidate()
+
             disable_widgets(self.dbFrm.winfo_children())
             disable_widgets(self.platFrm.winfo_children())
             disable_widgets(self.solrFrm.winfo_children())
@@ -263,6 +374,37 @@ class SettingsView(Frame):
                 "Missing element(s): \n  -{}".format("\n  -".join(missing)),
             )
 
+    def save_profiling(self, event=None):
+        try:
+            threshold = self.profiling_threshold.get()
+        except TclError:
+            messagebox.showwarning("Input Error", "N+1 threshold must be a number.")
+            return
+        save_profiling_options(USER_DATA, self.profiling.get(), threshold)
+        mlogger.info(
+            f"Query profiling {'enabled' if self.profiling.get() else 'disabled'}."
+        )
+
+        # new sessions pick up changed settings, pooled connections are kept
+        apply_profiling_options()
+
+    def save_catalog_cache(self):
+        try:
+            ttl_hours = self.cache_ttl.get()
+            recheck_days = self.recheck_days.get()
+        except TclError:
+            messagebox.showwarning(
+                "Input Error", "Cache hours and recheck days must be numbers."
+            )
+            return
+        save_catalog_cache_options(
+            USER_DATA, ttl_hours, self.cache_refresh.get(), recheck_days
+        )
+        mlogger.info(
+            f"Catalog cache kept for {ttl_hours} hours, "
+            f"refresh {'forced' if self.cache_refresh.get() else 'not forced'}."
+        )
+
     def help(self):
         open_url("https://github.com/BookOps-CAT/babel/wiki/Settings")
 
@@ -295,6 +437,15 @@ class SettingsView(Frame):
 
             user_data.close()
 
+            profiling = profiling_options(USER_DATA)
+            self.profiling.set(profiling["ENABLED"])
+            self.profiling_threshold.set(profiling["N_PLUS_ONE_THRESHOLD"])
+
+            cache = catalog_cache_options(USER_DATA)
+            self.cache_ttl.set(cache["TTL_HOURS"])
+            self.cache_refresh.set(cache["FORCE_REFRESH"])
+            self.recheck_days.set(cache["RECHECK_DAYS"])
+
             disable_widgets(self.dbFrm.winfo_children())
             disable_widgets(self.platFrm.winfo_children())
             disable_widgets(self.solrFrm.winfo_children())
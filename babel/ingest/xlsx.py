@@ -6,21 +6,36 @@ import os
 import sys
 
 from openpyxl import load_workbook, Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, PatternFill
 
 
-from errors import BabelError
-from data.data_objs import VenData
-from data.validators import (
-    shorten4datastore,
-    value2string,
-    normalize_date,
-    normalize_isbn,
-    normalize_price,
-    normalize_whitespaces,
-)
-from logging_settings import format_traceback
+try:
+    from errors import BabelError
+    from data.data_objs import VenData
+    from data.validators import (
+        shorten4datastore,
+        value2string,
+        normalize_date,
+        normalize_isbn,
+        normalize_price,
+        normalize_whitespaces,
+    )
+    from logging_settings import format_traceback
+except ImportError:
+    # tests
+    from babel.errors import BabelError
+    from babel.data.data_objs import VenData
+    from babel.data.validators import (
+        shorten4datastore,
+        value2string,
+        normalize_date,
+        normalize_isbn,
+        normalize_price,
+        normalize_whitespaces,
+    )
+    from babel.logging_settings import format_traceback
 
 
 mlogger = logging.getLogger("babel")
@@ -28,29 +43,75 @@ mlogger = logging.getLogger("babel")
 
 FONT_BOLD = Font(bold=True)
 FILL_GRAY = PatternFill(fill_type="solid", start_color="C4C5C6", end_color="C4C5C6")
+FONT_RED = Font(color="CC0000")
+
+# rows of vendor sheet read for preview
+PREVIEW_MAX_ROWS = 500
+
+ORDER_SHEET_HEADERS = [
+    "#",
+    "SKU",
+    "ISBN",
+    "Title",
+    "Author",
+    "Unit Price",
+    "Copies",
+    "Total Price",
+    "o Number",
+    "blanket PO",
+]
+ORDER_SHEET_WIDTHS = dict(A=4, C=16, D=25, E=20, F=9, G=8, H=10, I=12, J=18)
 
 
 class SheetReader:
-    def __init__(self, file):
-        self.wb = load_workbook(filename=file, data_only=True)
-        self.ws = self.wb.active
-        self.max_row = 0
-        self.max_column = 1
-        for row in self.ws.rows:
-            self.max_row += 1
-            stripped_row = [x for x in row if x.value is not None]
-            max_column = len(stripped_row)
-            if max_column > self.max_column:
-                self.max_column = max_column
+    """
+    Reads the first rows of the active sheet for preview in read-only
+    mode, so the time it takes does not depend on the size of the file.
+    Number of columns is inferred from the rows read; trailing empty
+    rows are dropped.
+
+    Arguments:
+    ----------
+    file: str
+        path to xlsx spreadsheet
+    max_rows: int
+        maximum number of rows read
+    """
+
+    def __init__(self, file, max_rows=PREVIEW_MAX_ROWS):
+        wb = load_workbook(filename=file, read_only=True, data_only=True)
+        try:
+            ws = wb.active
+            self.rows = []
+            self.truncated = False
+            last_row = 0
+            self.max_column = 1
+            for row in ws.iter_rows(values_only=True):
+                if len(self.rows) == max_rows:
+                    self.truncated = True
+                    break
+                self.rows.append(row)
+                filled = [n for n, value in enumerate(row) if value is not None]
+                if filled:
+                    last_row = len(self.rows)
+                    self.max_column = max(self.max_column, filled[-1] + 1)
+            if not self.truncated:
+                del self.rows[last_row:]
+        finally:
+            wb.close()
+
+        self.max_row = len(self.rows)
         self.range = "A1:" + str(get_column_letter(self.max_column)) + str(self.max_row)
 
-        mlogger.debug(f"Loaded sheet {file}: data range detected: {self.range}")
+        mlogger.debug(
+            f"Loaded sheet {file}: data range detected: {self.range}"
+            f"{' (truncated)' if self.truncated else ''}"
+        )
 
     def __iter__(self):
-        for row in self.ws[self.range]:
-            data = []
-            for cell in row:
-                data.append(cell.value)
+        for row in self.rows:
+            data = list(row[: self.max_column])
+            data.extend([None] * (self.max_column - len(data)))
             yield data
 
 
@@ -227,79 +288,85 @@ class ResourceDataReader:
 
 
 def save2spreadsheet(fh, system, data):
+    """
+    Writes order sheet in write-only mode, rows are streamed to the file
+    as they are consumed from data, so memory use does not depend on the
+    number of orders
+
+    args:
+        fh: str, path to xlsx file
+        system: str, system name printed in the address
+        data: iterable of order rows (SKU, ISBN, title, author,
+              unit price, copies, total price, o number, blanket PO)
+    returns:
+        count: int, number of order rows written
+    """
     try:
         if os.path.isfile(fh):
             os.remove(fh)
 
-        red_font = Font(color="CC0000")
-        order_wb = Workbook()
-        order_ws = order_wb.active
-        address_line1 = f"BookOps {system}"
-        address_line2 = "31-11 Thomson Avenue"
-        address_line3 = "Long Island City, NY 11101"
+        order_wb = Workbook(write_only=True)
+        order_ws = order_wb.create_sheet()
+
+        def cell(value, font=None, fill=None):
+            c = WriteOnlyCell(order_ws, value=value)
+            if font is not None:
+                c.font = font
+            if fill is not None:
+                c.fill = fill
+            return c
 
         # set columns width
-        order_ws.column_dimensions["A"].width = 4
-        order_ws.column_dimensions["C"].width = 16
-        order_ws.column_dimensions["D"].width = 25
-        order_ws.column_dimensions["E"].width = 20
-        order_ws.column_dimensions["F"].width = 9
-        order_ws.column_dimensions["G"].width = 8
-        order_ws.column_dimensions["H"].width = 10
-        order_ws.column_dimensions["I"].width = 12
-        order_ws.column_dimensions["J"].width = 18
-
-        order_ws.cell(row=2, column=1).value = address_line1
-        order_ws.cell(row=2, column=1).font = FONT_BOLD
-        order_ws.cell(row=3, column=1).value = address_line2
-        order_ws.cell(row=3, column=1).font = FONT_BOLD
-        order_ws.cell(row=4, column=1).value = address_line3
-        order_ws.cell(row=4, column=1).font = FONT_BOLD
+        for column, width in ORDER_SHEET_WIDTHS.items():
+            order_ws.column_dimensions[column].width = width
+
+        order_ws.append([])
+        for address_line in (
+            f"BookOps {system}",
+            "31-11 Thomson Avenue",
+            "Long Island City, NY 11101",
+        ):
+            order_ws.append([cell(address_line, font=FONT_BOLD)])
+        order_ws.append([])
 
         # headers
-        order_ws.cell(row=6, column=1).value = "#"
-        order_ws.cell(row=6, column=1).fill = FILL_GRAY
-        order_ws.cell(row=6, column=2).value = "SKU"
-        order_ws.cell(row=6, column=2).fill = FILL_GRAY
-        order_ws.cell(row=6, column=3).value = "ISBN"
-        order_ws.cell(row=6, column=3).fill = FILL_GRAY
-        order_ws.cell(row=6, column=4).value = "Title"
-        order_ws.cell(row=6, column=4).fill = FILL_GRAY
-        order_ws.cell(row=6, column=5).value = "Author"
-        order_ws.cell(row=6, column=5).fill = FILL_GRAY
-        order_ws.cell(row=6, column=6).value = "Unit Price"
-        order_ws.cell(row=6, column=6).fill = FILL_GRAY
-        order_ws.cell(row=6, column=7).value = "Copies"
-        order_ws.cell(row=6, column=7).fill = FILL_GRAY
-        order_ws.cell(row=6, column=8).value = "Total Price"
-        order_ws.cell(row=6, column=8).fill = FILL_GRAY
-        order_ws.cell(row=6, column=9).value = "o Number"
-        order_ws.cell(row=6, column=9).fill = FILL_GRAY
-        order_ws.cell(row=6, column=10).value = "blanket PO"
-        order_ws.cell(row=6, column=10).fill = FILL_GRAY
-
-        r = 1
-        for title in data:
-            row = []
-            row.append(r)
-            row.extend(title)
+        order_ws.append([cell(h, fill=FILL_GRAY) for h in ORDER_SHEET_HEADERS])
+
+        r = 0
+        for r, title in enumerate(data, start=1):
+            row = [r]
+            row.extend(title[:7])
+            row.append(cell(title[7], font=FONT_RED))
+            row.append(cell(title[8], font=FONT_RED))
             order_ws.append(row)
-            order_ws.cell(row=6 + r, column=9).font = red_font
-            order_ws.cell(row=6 + r, column=10).font = red_font
-            r += 1
-        last_r = 6 + r
-        order_ws.cell(row=last_r + 2, column=3).value = "total copies="
-        order_ws.cell(row=last_r + 2, column=3).fill = FILL_GRAY
-        order_ws.cell(row=last_r + 2, column=4).value = "=SUM(G7:G" + str(last_r) + ")"
-        order_ws.cell(row=last_r + 2, column=4).fill = FILL_GRAY
-        order_ws.cell(row=last_r + 3, column=3).value = "total cost="
-        order_ws.cell(row=last_r + 3, column=3).fill = FILL_GRAY
-        order_ws.cell(row=last_r + 3, column=4).value = "=SUM(H7:H" + str(last_r) + ")"
-        order_ws.cell(row=last_r + 3, column=4).fill = FILL_GRAY
+
+        last_r = 7 + r
+        order_ws.append([])
+        order_ws.append([])
+        order_ws.append(
+            [
+                None,
+                None,
+                cell("total copies=", fill=FILL_GRAY),
+                cell(f"=SUM(G7:G{last_r})", fill=FILL_GRAY),
+            ]
+        )
+        order_ws.append(
+            [
+                None,
+                None,
+                cell("total cost=", fill=FILL_GRAY),
+                cell(f"=SUM(H7:H{last_r})", fill=FILL_GRAY),
+            ]
+        )
 
         order_wb.save(filename=fh)
+        return r
+
+    except BabelError:
+        raise
 
-    except WindowsError as e:
+    except OSError as e:
         raise BabelError(e)
 
     except Exception as exc:
@@ -74,9 +74,13 @@ def is_configured():
         has_db_config = has_creds_config_in_user_data(user_data)
         ilogger.debug(f"Init: found database config data: {has_db_config}")
         try:
-            has_creds = has_creds_in_vault(
-                "babel_db", user_data["db_config"]["DB_USER"]
-            )
+            if has_db_config and user_data["db_config"].get("DB_DIALECT") == "sqlite":
+                # local datastore does not require credentials
+                has_creds = True
+            else:
+                has_creds = has_creds_in_vault(
+                    "babel_db", user_data["db_config"]["DB_USER"]
+                )
             ilogger.debug(f"Init: has credential stored in vault: {has_creds}")
         except KeyError:
             has_creds = False
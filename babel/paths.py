@@ -6,6 +6,7 @@ APP_DIR = "C:\\Program Files\\Babel"
 APP_DATA_DIR = os.path.join(os.environ["LOCALAPPDATA"], "Babel")
 DEV_LOG_PATH = os.path.join(APP_DATA_DIR, "log/dev_babellog.out")
 PROD_LOG_PATH = os.path.join(APP_DATA_DIR, "log/babellog.out")
+PROFILE_LOG_PATH = os.path.join(APP_DATA_DIR, "log/query_profile.jsonl")
 MY_DOCS = os.path.expanduser(os.sep.join(["~", "Documents"]))
 USER_DATA = os.path.join(APP_DATA_DIR, "user_data")
 
@@ -1,16 +1,30 @@
 """
 Higher level, unified methods to communicate with NYPL Platform & BPL Solr
 """
-from typing import Union
+from typing import Iterable, Iterator, Optional, Union
 
 from bookops_nypl_platform import PlatformSession
+from bookops_nypl_platform.errors import BookopsPlatformError
 from bookops_bpl_solr import SolrSession
+from bookops_bpl_solr.session import BookopsSolrError
 
 try:
+    from sierra_adapters.concurrent_search import (
+        BATCH_SIZE,
+        ConcurrentSearch,
+        MAX_IN_FLIGHT,
+        REQUESTS_PER_SECOND,
+    )
     from sierra_adapters.platform import NypPlatform
     from sierra_adapters.solr import BplSolr
 except ImportError:
     # tests
+    from babel.sierra_adapters.concurrent_search import (
+        BATCH_SIZE,
+        ConcurrentSearch,
+        MAX_IN_FLIGHT,
+        REQUESTS_PER_SECOND,
+    )
     from babel.sierra_adapters.platform import NypPlatform
     from babel.sierra_adapters.solr import BplSolr
 
@@ -33,6 +47,37 @@ def catalog_dup_search(
     return catalog_dup, dup_bibs
 
 
+def catalog_dup_search_many(
+    middleware: Union[PlatformSession, SolrSession],
+    queries: Iterable[tuple],
+    max_in_flight: int = MAX_IN_FLIGHT,
+    rate_limit: Optional[float] = REQUESTS_PER_SECOND,
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[tuple]:
+    """
+    Performs concurrent searches in new sessions of given middleware
+    retrying failed requests
+
+    Args:
+        middleware:                 `NypPlatform` or `BplSolr` instance
+        queries:                    iterable of (key, keywords, keyword_type)
+                                    where keyword_type is 'isbn' or 'upc'
+        max_in_flight:              maximum number of concurrent requests
+        rate_limit:                 maximum number of requests per second
+        batch_size:                 number of ISBNs or UPCs per request
+
+    Yields:
+        (key, catalog_dup, dup_bibs) in order of completion
+    """
+    search = ConcurrentSearch(
+        middleware.new_session,
+        max_in_flight=max_in_flight,
+        rate_limit=rate_limit,
+        retry_errors=(BookopsPlatformError, BookopsSolrError),
+    )
+    yield from search.search_all(queries, batch_size)
+
+
 def catalog_lookup(middleware: Union[PlatformSession, SolrSession], sierra_number: str):
     """
     Looks up bibliographic and item data in Sierra.
@@ -0,0 +1,264 @@
+"""
+Concurrent duplicate searches in Sierra middleware (NYPL Platform, BPL Solr).
+
+Searches run in a pool of worker threads, each using its own middleware
+session created on first use, because sessions (token refresh, headers,
+connection pool) are not safe to share between threads. The number
+of workers caps requests in flight, and a shared rate limiter spaces
+starts of requests. Failed requests are retried with exponential backoff.
+Identifiers of several titles can be searched in one request. Results are
+yielded to the calling thread as they arrive.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+import threading
+import time
+from typing import Callable, Iterable, Iterator, Optional
+
+try:
+    from logging_settings import LogglyAdapter
+except ImportError:
+    # tests
+    from babel.logging_settings import LogglyAdapter
+
+
+mlogger = LogglyAdapter(logging.getLogger("babel"), None)
+
+
+MAX_IN_FLIGHT = 8
+BATCH_SIZE = 20
+REQUESTS_PER_SECOND = 10.0
+RETRIES = 3
+BACKOFF = 0.5
+
+
+class RateLimiter:
+    """
+    Spaces calls of `wait` from any number of threads evenly
+    to at most `rate` per second; rate None means no limit
+    """
+
+    def __init__(self, rate: Optional[float]) -> None:
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class ConcurrentSearch:
+    def __init__(
+        self,
+        middleware_factory: Callable,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        rate_limit: Optional[float] = REQUESTS_PER_SECOND,
+        retries: int = RETRIES,
+        backoff: float = BACKOFF,
+        retry_errors: tuple = (),
+    ) -> None:
+        """
+        Args:
+            middleware_factory:     callable opening new `NypPlatform` or
+                                    `BplSolr` session
+            max_in_flight:          maximum number of concurrent requests
+            rate_limit:             maximum number of requests per second,
+                                    None for no limit
+            retries:                number of retries of a failed request
+            backoff:                delay before first retry in seconds,
+                                    doubled on each next retry
+            retry_errors:           exception classes of failed requests
+        """
+        if max_in_flight < 1:
+            raise ValueError("Number of requests in flight must be positive.")
+
+        self.middleware_factory = middleware_factory
+        self.max_in_flight = max_in_flight
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.retries = retries
+        self.backoff = backoff
+        self.retry_errors = retry_errors
+
+        self.local = threading.local()
+        self.sessions = []
+        self.sessions_lock = threading.Lock()
+
+    @property
+    def middleware(self):
+        """Middleware session of the calling thread"""
+        session = getattr(self.local, "session", None)
+        if session is None:
+            # opening sessions reads user_data, one at a time
+            with self.sessions_lock:
+                session = self.middleware_factory()
+                self.sessions.append(session)
+            self.local.session = session
+        return session
+
+    def close(self) -> None:
+        """Closes middleware sessions opened by the search"""
+        with self.sessions_lock:
+            sessions, self.sessions = self.sessions, []
+            self.local = threading.local()
+        for session in sessions:
+            session.close()
+
+    def _request(self, method: str, keywords: list[str], keyword_type: str, failed):
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.wait()
+            try:
+                return getattr(self.middleware, method)(
+                    keywords, keyword_type=keyword_type, raise_errors=True
+                )
+            except self.retry_errors as exc:
+                if attempt == self.retries:
+                    mlogger.warning(
+                        f"Catalog search for {keywords} failed after "
+                        f"{attempt + 1} attempts: {exc}"
+                    )
+                else:
+                    time.sleep(self.backoff * 2**attempt)
+        return failed
+
+    def search(
+        self, keywords: list[str], keyword_type: str
+    ) -> tuple[Optional[bool], Optional[str]]:
+        """
+        Searches middleware for keywords retrying failed requests.
+
+        Args:
+            keywords:               list of ISBNs or UPCs
+            keyword_type:           'isbn' or 'upc'
+
+        Returns:
+            catalog_dup & dup_bibs, (None, None) if all attempts failed
+        """
+        return self._request("search", keywords, keyword_type, (None, None))
+
+    def search_batch(self, keywords: list[str], keyword_type: str) -> dict:
+        """
+        Searches middleware for a batch of keywords with one request
+        retrying failed requests.
+
+        Args:
+            keywords:               list of ISBNs or UPCs
+            keyword_type:           'isbn' or 'upc'
+
+        Returns:
+            dict of {keyword: (catalog_dup, dup_bibs)}, values are
+            (None, None) if all attempts failed
+        """
+        return self._request(
+            "search_many",
+            keywords,
+            keyword_type,
+            {keyword: (None, None) for keyword in keywords},
+        )
+
+    def _search_title(self, key, keywords: list[str], keyword_type: str) -> list:
+        return [(key, *self.search(keywords, keyword_type))]
+
+    def _search_titles(self, titles: list, keywords: list[str], keyword_type: str):
+        results = self.search_batch(keywords, keyword_type)
+        return [
+            (key, *combine_results([results.get(k, (None, None)) for k in title_kws]))
+            for key, title_kws in titles
+        ]
+
+    def search_all(
+        self, queries: Iterable[tuple], batch_size: int = 1
+    ) -> Iterator[tuple[object, Optional[bool], Optional[str]]]:
+        """
+        Runs searches concurrently; middleware sessions of workers are
+        closed when searches are finished.
+
+        Args:
+            queries:                iterable of (key, keywords, keyword_type)
+            batch_size:             number of keywords searched per request;
+                                    batches require middleware's `search_many`
+
+        Yields:
+            (key, catalog_dup, dup_bibs) in order of completion
+        """
+        try:
+            with ThreadPoolExecutor(
+                max_workers=self.max_in_flight, thread_name_prefix="catalog-search"
+            ) as executor:
+                if batch_size > 1:
+                    futures = [
+                        executor.submit(
+                            self._search_titles, titles, keywords, keyword_type
+                        )
+                        for titles, keywords, keyword_type in batch_queries(
+                            queries, batch_size
+                        )
+                    ]
+                else:
+                    futures = [
+                        executor.submit(self._search_title, key, keywords, keyword_type)
+                        for key, keywords, keyword_type in queries
+                    ]
+                try:
+                    for future in as_completed(futures):
+                        yield from future.result()
+                finally:
+                    # abandoned iteration does not wait for all queued searches
+                    for future in futures:
+                        future.cancel()
+        finally:
+            # workers are done, executor waits for running searches on exit
+            self.close()
+
+
+def batch_queries(queries: Iterable[tuple], batch_size: int) -> Iterator[tuple]:
+    """
+    Groups title queries of the same keyword type into batches
+
+    Args:
+        queries:                    iterable of (key, keywords, keyword_type)
+        batch_size:                 number of distinct keywords per batch
+
+    Yields:
+        (titles, keywords, keyword_type) where titles is a list of
+        (key, keywords) of titles which keywords are all in the batch
+    """
+    pending = {}
+    for key, keywords, keyword_type in queries:
+        batch_keywords, titles = pending.setdefault(keyword_type, ({}, []))
+        batch_keywords.update(dict.fromkeys(keywords))
+        titles.append((key, keywords))
+        if len(batch_keywords) >= batch_size:
+            yield titles, list(batch_keywords), keyword_type
+            del pending[keyword_type]
+    for keyword_type, (batch_keywords, titles) in pending.items():
+        yield titles, list(batch_keywords), keyword_type
+
+
+def combine_results(results: list[tuple]) -> tuple[Optional[bool], Optional[str]]:
+    """
+    Combines search results of keywords of one title
+
+    Args:
+        results:                    list of (catalog_dup, dup_bibs)
+
+    Returns:
+        catalog_dup & dup_bibs of the title
+    """
+    bib_nos = []
+    for _, dup_bibs in results:
+        for bib_no in (dup_bibs or "").split(","):
+            if bib_no and bib_no not in bib_nos:
+                bib_nos.append(bib_no)
+    if bib_nos:
+        return True, ",".join(bib_nos)
+    if any(catalog_dup is None for catalog_dup, _ in results):
+        return None, None
+    return False, None
@@ -4,6 +4,7 @@ This modules handles calls to NYPL Sierra middleware called Platform.
 Retireved and passed along data to other modules should be already sanitized
 on this stage.
 """
+from copy import copy
 import os
 import logging
 from requests import Response
@@ -19,17 +20,25 @@ try:
     from credentials import get_from_vault
     from logging_settings import LogglyAdapter
     from errors import BabelError
+    from sierra_adapters.standard_numbers import batched_matches
 except ImportError:
     # tests
     from babel.credentials import get_from_vault
     from babel.errors import BabelError
     from babel.logging_settings import LogglyAdapter
+    from babel.sierra_adapters.standard_numbers import batched_matches
 
 mlogger = LogglyAdapter(logging.getLogger("babel"), None)
 
 
 class NypPlatform(PlatformSession):
-    def __init__(self, library: str, creds_fh: str, branch_idx: dict = None) -> None:
+    def __init__(
+        self,
+        library: str,
+        creds_fh: str,
+        branch_idx: dict = None,
+        token: PlatformToken = None,
+    ) -> None:
         """
         Authenticates and opens a session with NYPL Platform.
         Relies on credentials stores in Windows Credential Manager.
@@ -39,6 +48,8 @@ class NypPlatform(PlatformSession):
                 creds_fh:           path to user_data `shelve.BsdDbShelf` instance
                 branch_idx:         dict of location codes and branch or research
                                     designation (required to determine match)
+                token:              access token to use instead of stored
+                                    or newly requested one
         """
         mlogger.info(f"Initiating session with Platform for {library}.")
 
@@ -60,7 +71,8 @@ class NypPlatform(PlatformSession):
 
         self.agent = "BookOps/Babel"
 
-        token = self._get_token()
+        if token is None:
+            token = self._get_token()
 
         super().__init__(authorization=token, agent=self.agent)
 
@@ -246,6 +258,30 @@ class NypPlatform(PlatformSession):
             )
         return items
 
+    def _search_bibs(self, keywords: list[str]) -> tuple[list, bool]:
+        """
+        Makes a single request for bibs of given standard numbers.
+
+        Args:
+            keywords:               list of ISBNs or UPCs
+
+        Returns:
+            list of (bib number, standard numbers) of bibs matching library
+            and whether the response was truncated
+        """
+        response = self.search_standardNos(keywords=keywords, deleted=False)
+        if response.status_code != 200:
+            return [], False
+
+        data = response.json()
+        bibs = [
+            (bib["id"], bib.get("standardNumbers"))
+            for bib in data["data"]
+            if self._has_matching_location(self._order_locations(bib))
+        ]
+        truncated = data.get("totalCount", 0) > len(data["data"])
+        return bibs, truncated
+
     def _store_token(self):
         if isinstance(self.authorization, PlatformToken):
             user_data = shelve.open(self.creds_fh)
@@ -279,7 +315,10 @@ class NypPlatform(PlatformSession):
         return bib_data, item_data
 
     def search(
-        self, keywords: list[str], keyword_type: Optional[str] = None
+        self,
+        keywords: list[str],
+        keyword_type: Optional[str] = None,
+        raise_errors: bool = False,
     ) -> tuple[bool, str]:
         """
         Searches NYPL Platform for given ISBNs or UPCs.
@@ -290,6 +329,8 @@ class NypPlatform(PlatformSession):
             keyword_type:           "isbn" or "upc", not used for NYPL since
                                     standardNumber index used for searching
                                     combines both.
+            raise_errors:           raise `BookopsPlatformError` instead of
+                                    skipping failed request (for retries)
 
         Returns:
             catalog_dup & dup_bibs
@@ -308,12 +349,50 @@ class NypPlatform(PlatformSession):
                 catalog_dup = False
                 dup_bibs = None
         except BookopsPlatformError:
+            if raise_errors:
+                raise
             mlogger.warning("Encountered problem with Platform request. Skipping.")
             catalog_dup = None
             dup_bibs = None
 
         return catalog_dup, dup_bibs
 
+    def search_many(
+        self,
+        keywords: list[str],
+        keyword_type: Optional[str] = None,
+        raise_errors: bool = False,
+    ) -> dict[str, tuple[Optional[bool], Optional[str]]]:
+        """
+        Searches NYPL Platform for a batch of ISBNs or UPCs with one request
+        and determines matching bibs of each of them.
+
+        Args:
+            keywords:               list of ISBNs or UPCs
+            keyword_type:           "isbn" or "upc", not used for NYPL
+            raise_errors:           raise `BookopsPlatformError` instead of
+                                    skipping failed request (for retries)
+
+        Returns:
+            dict of {keyword: (catalog_dup, dup_bibs)}
+        """
+        try:
+            return batched_matches(self._search_bibs, keywords)
+        except BookopsPlatformError:
+            if raise_errors:
+                raise
+            mlogger.warning("Encountered problem with Platform request. Skipping.")
+            return {keyword: (None, None) for keyword in keywords}
+
+    def new_session(self) -> "NypPlatform":
+        """
+        Opens another session of the same library with a copy of this
+        session's access token; sessions must not be shared between threads
+        """
+        return NypPlatform(
+            self.library, self.creds_fh, self.branch_idx, copy(self.authorization)
+        )
+
     def close(self):
         # store token for future use before closing the session
         mlogger.info("Closing Platform session.")
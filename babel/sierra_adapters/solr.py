@@ -15,11 +15,13 @@ try:
     from credentials import get_from_vault
     from logging_settings import LogglyAdapter
     from errors import BabelError
+    from sierra_adapters.standard_numbers import batched_matches
 except ImportError:
     # tests
     from babel.credentials import get_from_vault
     from babel.errors import BabelError
     from babel.logging_settings import LogglyAdapter
+    from babel.sierra_adapters.standard_numbers import batched_matches
 
 
 mlogger = LogglyAdapter(logging.getLogger("babel"), None)
@@ -183,6 +185,41 @@ class BplSolr(SolrSession):
 
         return items
 
+    def _search_bibs(self, keywords: list[str], keyword_type: str) -> tuple[list, bool]:
+        """
+        Makes a single Solr request for bibs of given ISBNs or UPCs.
+
+        Args:
+            keywords:               list of ISBNs or UPCs
+            keyword_type:           'isbn' or 'upc'
+
+        Returns:
+            list of (bib number, standard numbers) of found bibs
+            and whether the response was truncated
+        """
+        if keyword_type == "isbn":
+            response = self.search_isbns(
+                keywords,
+                default_response_fields=False,
+                response_fields="id,isbn",
+            )
+            field = "isbn"
+        else:
+            response = self.search_upc(
+                keywords,
+                default_response_fields=False,
+                response_fields="id,sm_marc_tag_024_a",
+            )
+            field = "sm_marc_tag_024_a"
+
+        if response.status_code != 200:
+            return [], False
+
+        data = response.json()["response"]
+        bibs = [(bib["id"], bib.get(field)) for bib in data["docs"]]
+        truncated = data.get("numFound", 0) > len(data["docs"])
+        return bibs, truncated
+
     def get_bib_and_item_data(
         self, sierra_number: str
     ) -> tuple[Optional[dict], Optional[dict]]:
@@ -208,13 +245,20 @@ class BplSolr(SolrSession):
 
         return bib_data, item_data
 
-    def search(self, keywords: list[str], keyword_type: Optional[str] = "isbn"):
+    def search(
+        self,
+        keywords: list[str],
+        keyword_type: Optional[str] = "isbn",
+        raise_errors: bool = False,
+    ):
         """
         Searches BPL Solr for given ISBN or UPC.
 
         Args:
             keywords:               list of ISBNs or UPCs
             keyword_type:           'isbn' or "upc"
+            raise_errors:           raise `BookopsSolrError` instead of
+                                    skipping failed request (for retries)
 
         Returns:
             catalog_dup & dup_bibs
@@ -250,8 +294,52 @@ class BplSolr(SolrSession):
                 catalog_dup = False
                 dup_bibs = None
         except BookopsSolrError:
+            if raise_errors:
+                raise
             mlogger.warning("Encountered problem with Solr request. Skipping.")
             catalog_dup = False
             dup_bibs = None
 
         return catalog_dup, dup_bibs
+
+    def search_many(
+        self,
+        keywords: list[str],
+        keyword_type: Optional[str] = "isbn",
+        raise_errors: bool = False,
+    ) -> dict[str, tuple[bool, Optional[str]]]:
+        """
+        Searches BPL Solr for a batch of ISBNs or UPCs with one request
+        and determines matching bibs of each of them.
+
+        Args:
+            keywords:               list of ISBNs or UPCs
+            keyword_type:           'isbn' or "upc"
+            raise_errors:           raise `BookopsSolrError` instead of
+                                    skipping failed request (for retries)
+
+        Returns:
+            dict of {keyword: (catalog_dup, dup_bibs)}
+        """
+        if keyword_type not in ("isbn", "upc"):
+            mlogger.warning(
+                "Attempting unsupported search in BPL Solr. Only ISBN and UPC searches are permitted."
+            )
+            return {keyword: (False, None) for keyword in keywords}
+
+        try:
+            return batched_matches(
+                lambda batch: self._search_bibs(batch, keyword_type), keywords
+            )
+        except BookopsSolrError:
+            if raise_errors:
+                raise
+            mlogger.warning("Encountered problem with Solr request. Skipping.")
+            return {keyword: (False, None) for keyword in keywords}
+
+    def new_session(self) -> "BplSolr":
+        """
+        Opens another session with the same credentials; sessions must not
+        be shared between threads
+        """
+        return BplSolr(self.creds_fh)
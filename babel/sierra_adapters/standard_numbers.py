@@ -0,0 +1,119 @@
+"""
+Maps bibs returned by batched middleware searches back to searched
+ISBNs & UPCs.
+"""
+import re
+from typing import Callable, Iterable, Optional
+
+
+# leading digits of a standard number (and ISBN-10 check character),
+# qualifiers like "(pbk.)" that follow are ignored
+STANDARD_NUMBER = re.compile(r"\d+X?")
+
+
+def _isbn10_check_digit(digits: str) -> str:
+    total = sum((10 - n) * int(d) for n, d in enumerate(digits))
+    check = (11 - total % 11) % 11
+    return "X" if check == 10 else str(check)
+
+
+def _isbn13_check_digit(digits: str) -> str:
+    total = sum((3 if n % 2 else 1) * int(d) for n, d in enumerate(digits))
+    return str((10 - total % 10) % 10)
+
+
+def standard_number_forms(value: str) -> set[str]:
+    """
+    Returns normalized forms of a standard number under which it may be
+    listed in a bib; ISBNs are represented in both 10 and 13 digit forms,
+    UPCs with and without the leading zero of their EAN-13 form
+
+    Args:
+        value:                      ISBN or UPC, optionally qualified
+
+    Returns:
+        set of normalized forms
+    """
+    norm = value.replace("-", "").replace(" ", "").upper()
+    match = STANDARD_NUMBER.match(norm)
+    if match:
+        norm = match.group()
+    forms = {norm}
+    if len(norm) == 10 and norm[:9].isdigit():
+        forms.add(f"978{norm[:9]}{_isbn13_check_digit(f'978{norm[:9]}')}")
+    elif len(norm) == 13 and norm.isdigit() and norm.startswith("978"):
+        forms.add(f"{norm[3:12]}{_isbn10_check_digit(norm[3:12])}")
+    elif len(norm) == 12 and norm.isdigit():
+        forms.add(f"0{norm}")
+    elif len(norm) == 13 and norm.isdigit() and norm.startswith("0"):
+        forms.add(norm[1:])
+    return forms
+
+
+def match_keywords(
+    keywords: list[str], bibs: Iterable[tuple[str, list[str]]]
+) -> dict[str, tuple[bool, Optional[str]]]:
+    """
+    Determines which bibs match each searched keyword; all bibs found
+    by a search of a single keyword are its matches, as in unbatched
+    searches
+
+    Args:
+        keywords:                   list of searched ISBNs or UPCs
+        bibs:                       iterable of (bib number, list of standard
+                                    numbers of the bib) of bibs matching
+                                    the library
+
+    Returns:
+        dict of {keyword: (catalog_dup, dup_bibs)}
+    """
+    keyword_forms = {}
+    for keyword in keywords:
+        for form in standard_number_forms(keyword):
+            keyword_forms.setdefault(form, []).append(keyword)
+
+    matches = {keyword: [] for keyword in keywords}
+    for bib_no, standard_numbers in bibs:
+        if len(keywords) == 1:
+            matched = set(keywords)
+        else:
+            matched = set()
+            for number in standard_numbers or []:
+                for form in standard_number_forms(number):
+                    matched.update(keyword_forms.get(form, []))
+        for keyword in matched:
+            if bib_no not in matches[keyword]:
+                matches[keyword].append(bib_no)
+
+    return {
+        keyword: (True, ",".join(bib_nos)) if bib_nos else (False, None)
+        for keyword, bib_nos in matches.items()
+    }
+
+
+def batched_matches(
+    search: Callable[[list[str]], tuple[list, bool]], keywords: list[str]
+) -> dict[str, tuple[bool, Optional[str]]]:
+    """
+    Searches for a batch of keywords with one request. Batches which
+    response was truncated by the middleware's page size are split
+    in halves and searched again.
+
+    Args:
+        search:                     function making one request for given
+                                    keywords and returning a list of (bib
+                                    number, standard numbers) of bibs matching
+                                    the library and whether the response was
+                                    truncated
+        keywords:                   list of ISBNs or UPCs
+
+    Returns:
+        dict of {keyword: (catalog_dup, dup_bibs)}
+    """
+    bibs, truncated = search(keywords)
+    if truncated and len(keywords) > 1:
+        half = len(keywords) // 2
+        results = batched_matches(search, keywords[:half])
+        results.update(batched_matches(search, keywords[half:]))
+        return results
+    return match_keywords(keywords, bibs)
@@ -0,0 +1,27 @@
+"""
+Babel performance benchmarks.
+
+Benchmarks run Babel transaction functions the same way the application
+does - with the babel directory on sys.path - against a scratch SQLite
+datastore filled with a synthetic workload. Babel's user_data is
+redirected to a scratch directory, so benchmarks never touch a real
+workstation configuration or the production datastore.
+"""
+
+import os
+import sys
+
+
+BABEL_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "babel")
+
+
+def prepare_environment(work_dir: str) -> None:
+    """
+    Points Babel's user data to work_dir and makes Babel modules
+    importable. Must be called before any Babel module is imported.
+    """
+    os.environ.setdefault("USERNAME", "benchmark")
+    os.environ["LOCALAPPDATA"] = work_dir
+    os.makedirs(os.path.join(work_dir, "Babel"), exist_ok=True)
+    if BABEL_DIR not in sys.path:
+        sys.path.insert(0, os.path.abspath(BABEL_DIR))
@@ -0,0 +1,197 @@
+"""
+Runs Babel benchmarks and compares their results.
+
+usage (from the repository root):
+    python -m benchmarks run --profile medium --output results.json
+    python -m benchmarks run --only validate_cart_data --only find_matches
+    python -m benchmarks compare baseline.json results.json --threshold 0.2
+"""
+
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import re
+import shelve
+import subprocess
+import sys
+import tempfile
+import warnings
+
+from benchmarks import BABEL_DIR, prepare_environment
+
+
+def babel_version() -> str:
+    with open(os.path.join(BABEL_DIR, "babel.py")) as file:
+        match = re.search(r'^VERSION = "(.+)"', file.read(), re.MULTILINE)
+    return match.group(1) if match else None
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BABEL_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> int:
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="babel-bench-")
+    prepare_environment(work_dir)
+
+    # imported only after user data is redirected
+    import sqlalchemy
+    from paths import get_user_data_handle
+    from data.datastore import dispose_data_access_layer, get_data_access_layer
+    from data.reference_data import ref_data
+    from benchmarks.generator import PROFILES, generate_workload
+    from benchmarks.suite import BENCHMARKS, BenchmarkContext, run_benchmark
+
+    db_path = os.path.join(work_dir, "benchmark.db")
+    if os.path.isfile(db_path):
+        os.remove(db_path)
+    creds_fh = get_user_data_handle()
+    user_data = shelve.open(creds_fh)
+    user_data["db_config"] = dict(DB_DIALECT="sqlite", DB_PATH=db_path)
+    user_data["profiling"] = dict(
+        ENABLED=args.profile_queries, N_PLUS_ONE_THRESHOLD=args.n_plus_one_threshold
+    )
+    user_data.close()
+
+    params = dict(PROFILES[args.profile])
+    if args.target_orders:
+        params["target_orders"] = args.target_orders
+    params["seed"] = args.seed
+
+    print(f"Generating {args.profile} workload in {db_path}...")
+    workload = generate_workload(get_data_access_layer().engine, **params)
+    ref_data.invalidate()
+    print(f"Workload: {workload.summary()}")
+
+    # deprecation notices of libraries repeated on each run clutter the output
+    warnings.simplefilter("ignore", FutureWarning)
+
+    ctx = BenchmarkContext(workload, work_dir, creds_fh, args.middleware_latency)
+    names = args.only or list(BENCHMARKS)
+    results = []
+    for name in names:
+        result = run_benchmark(ctx, name, args.repeat)
+        results.append(result)
+        if result["status"] == "ok":
+            print(f"{name:<40} median {result['median']:9.3f}s")
+        else:
+            print(f"{name:<40} {result['status']}: {result['error']}")
+    dispose_data_access_layer()
+    if args.profile_queries:
+        from paths import PROFILE_LOG_PATH
+
+        print(f"Query profiles saved to {PROFILE_LOG_PATH}")
+
+    report = dict(
+        meta=dict(
+            babel_version=babel_version(),
+            git_revision=git_revision(),
+            created=datetime.now().isoformat(timespec="seconds"),
+            python=sys.version.split()[0],
+            sqlalchemy=sqlalchemy.__version__,
+            platform=platform.platform(),
+            profile=args.profile,
+            params=params,
+            repeat=args.repeat,
+            middleware_latency=args.middleware_latency,
+            workload=workload.summary(),
+        ),
+        results=results,
+    )
+    output = args.output or f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results saved to {output}")
+    return 0
+
+
+def compare(args) -> int:
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+
+    base_results = {r["name"]: r for r in baseline["results"]}
+    regressions = 0
+    print(f"{'benchmark':<40} {'baseline':>10} {'current':>10} {'change':>8}")
+    for result in current["results"]:
+        base = base_results.get(result["name"])
+        if not base or "median" not in base or "median" not in result:
+            print(f"{result['name']:<40} {'n/a':>10} {'n/a':>10}")
+            continue
+        change = (result["median"] - base["median"]) / base["median"]
+        flag = ""
+        if change > args.threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(
+            f"{result['name']:<40} {base['median']:10.3f} {result['median']:10.3f} "
+            f"{change:+8.1%}{flag}"
+        )
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="generate workload & run benchmarks")
+    run_parser.add_argument(
+        "--profile", choices=["small", "medium", "large"], default="small"
+    )
+    run_parser.add_argument(
+        "--target-orders", type=int, help="size of the benchmarked cart"
+    )
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument(
+        "--middleware-latency",
+        type=float,
+        default=0.0,
+        help="simulated catalog request latency in seconds",
+    )
+    run_parser.add_argument(
+        "--only", action="append", help="benchmark to run (repeatable)"
+    )
+    run_parser.add_argument(
+        "--profile-queries",
+        action="store_true",
+        help="record query profiles of benchmarked transactions",
+    )
+    run_parser.add_argument("--n-plus-one-threshold", type=int, default=20)
+    run_parser.add_argument("--output", help="results JSON file")
+    run_parser.add_argument(
+        "--work-dir", help="scratch directory (default: new temporary directory)"
+    )
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser(
+        "compare", help="compare median times of two result files"
+    )
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative slowdown reported as regression (default: 0.1)",
+    )
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Measures throughput of concurrent catalog duplicate searches at several
+concurrency levels and batch sizes against a local stub of the middleware
+HTTP API.
+
+The stub answers each request after a fixed latency, so the results show
+how much of the network wait is overlapped by requests in flight.
+
+usage (from the repository root):
+    python -m benchmarks.catalog_search --titles 400 --latency 0.1
+    python -m benchmarks.catalog_search --concurrency 1 4 16 --rate-limit 10
+    python -m benchmarks.catalog_search --batch-size 1 10 50
+"""
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from babel.sierra_adapters.concurrent_search import ConcurrentSearch
+
+
+class StubCatalogHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        keywords = parse_qs(urlparse(self.path).query)["keyword"]
+        time.sleep(self.server.latency)
+        body = "\n".join(
+            f"{keyword} b{keyword[-8:]}"
+            for keyword in keywords
+            if keyword.endswith("0")
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubMiddleware(requests.Session):
+    def __init__(self, endpoint):
+        super().__init__()
+        self.endpoint = endpoint
+
+    def search_many(self, keywords, keyword_type=None, raise_errors=False):
+        response = self.get(f"{self.endpoint}/search", params={"keyword": keywords})
+        results = {keyword: (False, None) for keyword in keywords}
+        for line in response.text.splitlines():
+            keyword, bib_no = line.split()
+            results[keyword] = (True, bib_no)
+        return results
+
+    def search(self, keywords, keyword_type=None, raise_errors=False):
+        return self.search_many(keywords, keyword_type)[keywords[0]]
+
+
+def run(endpoint, titles, concurrency, rate_limit, batch_size):
+    search = ConcurrentSearch(
+        lambda: StubMiddleware(endpoint),
+        max_in_flight=concurrency,
+        rate_limit=rate_limit,
+    )
+    queries = [(n, [f"9780000{n:06}"], "isbn") for n in range(titles)]
+    start = time.perf_counter()
+    results = list(search.search_all(queries, batch_size))
+    elapsed = time.perf_counter() - start
+    assert len(results) == titles
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--titles", type=int, default=400)
+    parser.add_argument(
+        "--latency", type=float, default=0.1, help="request latency in seconds"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32]
+    )
+    parser.add_argument(
+        "--rate-limit", type=float, help="requests per second (default: no limit)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        nargs="+",
+        default=[1, 20],
+        help="identifiers per request",
+    )
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubCatalogHandler)
+    server.daemon_threads = True
+    server.latency = args.latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_port}"
+
+    try:
+        for batch_size in args.batch_size:
+            for concurrency in args.concurrency:
+                elapsed = run(
+                    endpoint, args.titles, concurrency, args.rate_limit, batch_size
+                )
+                print(
+                    f"batch {batch_size:>3}, {concurrency:>3} in flight: "
+                    f"{args.titles} titles in {elapsed:.2f}s "
+                    f"({args.titles / elapsed:.1f} titles/s)"
+                )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+Synthetic workload generator.
+
+Fills a datastore with realistic volumes of Babel data: selectors with
+their distribution templates, funds with audience/material/branch rules
+and years of carts holding from tens to tens of thousands of orders with
+several locations each. Rows are written with bulk Core inserts, so even
+large workloads are generated in reasonable time.
+"""
+
+from datetime import datetime, timedelta
+import math
+import random
+
+from sqlalchemy import func, select
+
+from data.datastore import (
+    Audn,
+    Branch,
+    Cart,
+    DistGrid,
+    DistSet,
+    Fund,
+    FundAudnJoiner,
+    FundBranchJoiner,
+    FundLibraryJoiner,
+    FundMatTypeJoiner,
+    GridLocation,
+    Lang,
+    MatType,
+    Order,
+    OrderLocation,
+    Resource,
+    ShelfCode,
+    User,
+    Vendor,
+)
+
+
+BATCH_SIZE = 5000
+
+PROFILES = {
+    "small": dict(
+        users=3, carts=12, min_orders=50, max_orders=500, target_orders=500, years=3
+    ),
+    "medium": dict(
+        users=10,
+        carts=60,
+        min_orders=50,
+        max_orders=5000,
+        target_orders=2000,
+        years=5,
+    ),
+    "large": dict(
+        users=30,
+        carts=300,
+        min_orders=50,
+        max_orders=20000,
+        target_orders=20000,
+        years=8,
+    ),
+}
+
+SHELF_CODES = [
+    ("fc", "fiction", True),
+    ("nf", "non-fiction", True),
+    ("bi", "biography", True),
+    ("mu", "music", False),
+    ("dv", "dvd", False),
+]
+
+
+class Workload:
+    """
+    Identifiers of generated data needed to drive benchmarks
+    """
+
+    def __init__(self, system_id, library_id, years):
+        self.system_id = system_id
+        self.library_id = library_id
+        self.user_ids = []
+        self.vendor_names = []
+        self.fund_codes = []
+        self.distset_id = None
+        self.grid_id = None
+        self.grid_name = None
+        self.cart_ids = []
+        self.target_cart_id = None
+        self.target_order_ids = []
+        self.orders = 0
+        self.locations = 0
+        end = datetime.now()
+        self.start_date = (end - timedelta(days=365 * years)).date()
+        self.end_date = end.date()
+
+    def summary(self) -> dict:
+        return dict(
+            users=len(self.user_ids),
+            carts=len(self.cart_ids),
+            orders=self.orders,
+            locations=self.locations,
+            target_cart_orders=len(self.target_order_ids),
+            start_date=self.start_date.isoformat(),
+            end_date=self.end_date.isoformat(),
+        )
+
+
+class _Ids:
+    """Hands out consecutive primary keys for bulk inserted rows"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.next = {}
+
+    def __call__(self, model) -> int:
+        if model not in self.next:
+            last = self.conn.execute(select(func.max(model.did))).scalar()
+            self.next[model] = (last or 0) + 1
+        did = self.next[model]
+        self.next[model] += 1
+        return did
+
+
+def _insert(conn, model, rows) -> None:
+    for n in range(0, len(rows), BATCH_SIZE):
+        conn.execute(model.__table__.insert(), rows[n : n + BATCH_SIZE])
+
+
+def _ids(conn, model, **kwargs) -> list:
+    stmn = select(model.did).filter_by(**kwargs).order_by(model.did)
+    return [r.did for r in conn.execute(stmn)]
+
+
+def _cart_size(rnd, min_orders, max_orders) -> int:
+    # most carts are small, few are very large
+    return int(
+        math.exp(
+            rnd.uniform(math.log(min_orders), math.log(max(min_orders, max_orders)))
+        )
+    )
+
+
+def generate_workload(
+    engine,
+    users=3,
+    carts=12,
+    min_orders=50,
+    max_orders=500,
+    target_orders=500,
+    max_locations=4,
+    years=3,
+    system_id=2,
+    library_id=1,
+    seed=0,
+) -> Workload:
+    """
+    Populates datastore with synthetic data
+
+    args:
+        engine: sqlalchemy engine of initialized datastore
+        users: int, number of selectors
+        carts: int, number of historical carts
+        min_orders: int, minimum number of orders in a cart
+        max_orders: int, maximum number of orders in a cart
+        target_orders: int, size of the cart benchmarks operate on
+        max_locations: int, maximum number of locations per order
+        years: int, time span of historical carts
+        system_id: int, datastore System.did
+        library_id: int, datastore Library.did
+        seed: int, random generator seed
+    returns:
+        workload: Workload instance
+    """
+    rnd = random.Random(seed)
+    workload = Workload(system_id, library_id, years)
+
+    with engine.begin() as conn:
+        next_id = _Ids(conn)
+        lang_ids = _ids(conn, Lang)
+        audn_ids = _ids(conn, Audn)
+        # material types with plain MARC output
+        mat_ids = _ids(conn, MatType, nyp_bib_code="a")
+        branch_ids = _ids(conn, Branch, system_id=system_id)
+
+        # vendors
+        vendors = []
+        for n in range(20):
+            vendors.append(
+                dict(
+                    did=next_id(Vendor),
+                    name=f"Benchmark Vendor {n}",
+                    bpl_code=f"bv{n}",
+                    nyp_code=f"nv{n}",
+                )
+            )
+        _insert(conn, Vendor, vendors)
+        vendor_ids = [v["did"] for v in vendors]
+        workload.vendor_names = [v["name"] for v in vendors]
+
+        # shelf codes
+        shelves = []
+        for code, name, includes_audn in SHELF_CODES:
+            shelves.append(
+                dict(
+                    did=next_id(ShelfCode),
+                    system_id=system_id,
+                    code=code,
+                    name=name,
+                    includes_audn=includes_audn,
+                )
+            )
+        _insert(conn, ShelfCode, shelves)
+        shelf_ids = [s["did"] for s in shelves]
+
+        # funds with audience, material type & branch rules
+        funds, fund_audns, fund_mats, fund_branches, fund_libs = [], [], [], [], []
+        for n in range(30):
+            fund_id = next_id(Fund)
+            code = f"{n:02}bench"
+            funds.append(dict(did=fund_id, code=code, system_id=system_id))
+            workload.fund_codes.append(code)
+            for audn_id in rnd.sample(audn_ids, rnd.randint(1, len(audn_ids))):
+                fund_audns.append(dict(fund_id=fund_id, audn_id=audn_id))
+            for mat_id in rnd.sample(mat_ids, rnd.randint(1, len(mat_ids))):
+                fund_mats.append(dict(fund_id=fund_id, matType_id=mat_id))
+            for branch_id in rnd.sample(
+                branch_ids, rnd.randint(1, len(branch_ids) // 2 or 1)
+            ):
+                fund_branches.append(dict(fund_id=fund_id, branch_id=branch_id))
+            fund_libs.append(dict(fund_id=fund_id, library_id=library_id))
+        _insert(conn, Fund, funds)
+        _insert(conn, FundAudnJoiner, fund_audns)
+        _insert(conn, FundMatTypeJoiner, fund_mats)
+        _insert(conn, FundBranchJoiner, fund_branches)
+        _insert(conn, FundLibraryJoiner, fund_libs)
+        fund_ids = [f["did"] for f in funds]
+
+        # selectors with distribution templates
+        user_rows, distsets, grids, gridlocs = [], [], [], []
+        for n in range(users):
+            user_id = next_id(User)
+            user_rows.append(
+                dict(did=user_id, name=f"bench-user-{n}", nyp_code="b", bpl_code="b")
+            )
+            distset_id = next_id(DistSet)
+            distsets.append(
+                dict(
+                    did=distset_id, name="default", system_id=system_id, user_id=user_id
+                )
+            )
+            for g in range(3):
+                grid_id = next_id(DistGrid)
+                grids.append(dict(did=grid_id, name=f"grid-{g}", distset_id=distset_id))
+                for branch_id in rnd.sample(branch_ids, rnd.randint(2, 6)):
+                    gridlocs.append(
+                        dict(
+                            did=next_id(GridLocation),
+                            distgrid_id=grid_id,
+                            branch_id=branch_id,
+                            shelfcode_id=rnd.choice(shelf_ids),
+                            qty=rnd.randint(1, 4),
+                        )
+                    )
+        _insert(conn, User, user_rows)
+        _insert(conn, DistSet, distsets)
+        _insert(conn, DistGrid, grids)
+        _insert(conn, GridLocation, gridlocs)
+        workload.user_ids = [u["did"] for u in user_rows]
+        workload.distset_id = distsets[0]["did"]
+        workload.grid_id = grids[0]["did"]
+        workload.grid_name = grids[0]["name"]
+
+        # identifiers repeat between carts to produce duplicates
+        isbn_pool = max(target_orders, carts * min_orders)
+
+        def add_cart(name, user_id, created, size, status_id, linked):
+            cart_id = next_id(Cart)
+            conn.execute(
+                Cart.__table__.insert(),
+                dict(
+                    did=cart_id,
+                    name=name,
+                    created=created,
+                    updated=created,
+                    status_id=status_id,
+                    linked=linked,
+                    user_id=user_id,
+                    system_id=system_id,
+                    library_id=library_id,
+                ),
+            )
+            order_ids = []
+            for first in range(0, size, BATCH_SIZE):
+                orders, resources, locations = [], [], []
+                for _ in range(first, min(first + BATCH_SIZE, size)):
+                    order_id = next_id(Order)
+                    order_ids.append(order_id)
+                    orders.append(
+                        dict(
+                            did=order_id,
+                            cart_id=cart_id,
+                            lang_id=rnd.choice(lang_ids),
+                            audn_id=rnd.choice(audn_ids),
+                            vendor_id=rnd.choice(vendor_ids),
+                            matType_id=rnd.choice(mat_ids),
+                            wlo=f"wlo{order_id:010}",
+                            oid=f"o{order_id:08}" if linked else None,
+                            bid=f"b{order_id:08}" if linked else None,
+                        )
+                    )
+                    price = round(rnd.uniform(5, 60), 2)
+                    resources.append(
+                        dict(
+                            did=next_id(Resource),
+                            order_id=order_id,
+                            title=f"Benchmark title {order_id}",
+                            author=f"Author {rnd.randint(1, 5000)}",
+                            publisher="Benchmark Press",
+                            pub_date=str(rnd.randint(1990, 2022)),
+                            pub_place="New York",
+                            isbn=f"978{rnd.randint(1, isbn_pool):010}",
+                            price_list=price,
+                            price_disc=round(price * 0.6, 2),
+                        )
+                    )
+                    for _ in range(rnd.randint(1, max_locations)):
+                        locations.append(
+                            dict(
+                                did=next_id(OrderLocation),
+                                order_id=order_id,
+                                branch_id=rnd.choice(branch_ids),
+                                shelfcode_id=rnd.choice(shelf_ids),
+                                qty=rnd.randint(1, 5),
+                                fund_id=rnd.choice(fund_ids),
+                            )
+                        )
+                _insert(conn, Order, orders)
+                _insert(conn, Resource, resources)
+                _insert(conn, OrderLocation, locations)
+                workload.orders += len(orders)
+                workload.locations += len(locations)
+            workload.cart_ids.append(cart_id)
+            return cart_id, order_ids
+
+        # historical carts spread over years
+        span = (workload.end_date - workload.start_date).days
+        for n in range(carts):
+            created = datetime.combine(workload.start_date, datetime.min.time()) + (
+                timedelta(days=rnd.uniform(0, span))
+            )
+            add_cart(
+                f"bench-cart-{n}",
+                rnd.choice(workload.user_ids),
+                created,
+                _cart_size(rnd, min_orders, max_orders),
+                status_id=2,
+                linked=rnd.random() < 0.8,
+            )
+
+        # cart benchmarks operate on
+        workload.target_cart_id, workload.target_order_ids = add_cart(
+            "bench-target",
+            workload.user_ids[0],
+            datetime.now(),
+            target_orders,
+            status_id=2,
+            linked=False,
+        )
+
+    return workload
@@ -0,0 +1,459 @@
+"""
+Benchmarks of Babel entry points.
+
+Each benchmark receives a BenchmarkContext, prepares its arguments and
+returns a callable that is timed. Babel modules are imported inside
+benchmarks, so one with an unavailable dependency is reported as skipped
+instead of stopping the whole run.
+"""
+
+import csv
+from decimal import Decimal
+from itertools import count
+import os
+import statistics
+import threading
+import time
+import traceback
+
+
+class NullProgbar(dict):
+    """Stands in for tkinter Progressbar"""
+
+    def __init__(self):
+        super().__init__(value=0, maximum=0)
+
+    def update(self):
+        pass
+
+
+class Value:
+    """Stands in for tkinter variables & entry widgets"""
+
+    def __init__(self, value=""):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class StubMiddleware:
+    """
+    Stands in for NypPlatform/BplSolr. Reports keywords ending with 0
+    as catalog duplicates after an optional simulated network latency
+    per request.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def search_many(self, keywords, keyword_type="isbn", raise_errors=False):
+        with self.lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return {
+            keyword: (True, f"b{keyword[-8:]}") if keyword[-1] == "0" else (False, None)
+            for keyword in keywords
+        }
+
+    def search(self, keywords, keyword_type="isbn", raise_errors=False):
+        return self.search_many(keywords[:1], keyword_type)[keywords[0]]
+
+    def new_session(self):
+        # thread-safe, workers share the stub & its request counter
+        return self
+
+    def close(self):
+        pass
+
+
+class BenchmarkContext:
+    def __init__(self, workload, work_dir, creds_fh, middleware_latency=0.0):
+        self.workload = workload
+        self.work_dir = work_dir
+        self.creds_fh = creds_fh
+        self.middleware_latency = middleware_latency
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.work_dir, name)
+
+    def target_cart(self):
+        from data.datastore import session_scope, Cart
+
+        with session_scope() as session:
+            cart_rec = session.query(Cart).filter_by(did=self.workload.target_cart_id)
+            cart_rec = cart_rec.one()
+            session.expunge_all()
+        return cart_rec
+
+
+# benchmark name: function preparing the timed callable
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return register
+
+
+def _report_args(ctx):
+    w = ctx.workload
+    return (
+        w.system_id,
+        w.library_id,
+        w.user_ids,
+        w.start_date.isoformat(),
+        w.end_date.isoformat(),
+    )
+
+
+@benchmark("reports.get_basic_stats")
+def bench_basic_stats(ctx):
+    from data.transactions_reports import get_basic_stats
+
+    _, _, _, start_date, end_date = _report_args(ctx)
+    return lambda: get_basic_stats(start_date, end_date)
+
+
+@benchmark("reports.get_branch_breakdown")
+def bench_branch_breakdown(ctx):
+    from data.transactions_reports import get_branch_breakdown
+
+    return lambda: get_branch_breakdown(*_report_args(ctx))
+
+
+@benchmark("reports.get_branch_lang")
+def bench_branch_lang(ctx):
+    from data.transactions_reports import get_branch_lang
+
+    return lambda: get_branch_lang(*_report_args(ctx))
+
+
+@benchmark("reports.get_categories_breakdown")
+def bench_categories_breakdown(ctx):
+    from data.transactions_reports import get_categories_breakdown
+
+    return lambda: get_categories_breakdown(*_report_args(ctx))
+
+
+@benchmark("reports.get_fy_summary")
+def bench_fy_summary(ctx):
+    from data.transactions_reports import get_fy_summary
+
+    system_id, library_id, user_ids, _, _ = _report_args(ctx)
+    return lambda: get_fy_summary(system_id, library_id, user_ids)
+
+
+@benchmark("reports.get_lang_branch")
+def bench_lang_branch(ctx):
+    from data.transactions_reports import get_lang_branch
+
+    return lambda: get_lang_branch(*_report_args(ctx))
+
+
+@benchmark("reports.get_lang_breakdown")
+def bench_lang_breakdown(ctx):
+    from data.transactions_reports import get_lang_breakdown
+
+    return lambda: get_lang_breakdown(*_report_args(ctx))
+
+
+@benchmark("validate_cart_data")
+def bench_validate_cart_data(ctx):
+    from data.transactions_cart import validate_cart_data
+
+    return lambda: validate_cart_data(ctx.workload.target_cart_id)
+
+
+@benchmark("export_orders_to_marc_file")
+def bench_export_orders_to_marc_file(ctx):
+    from data.transactions_carts import export_orders_to_marc_file
+
+    cart_rec = ctx.target_cart()
+    fh = ctx.path("orders.mrc")
+    return lambda: export_orders_to_marc_file(fh, cart_rec, NullProgbar())
+
+
+@benchmark("export_orders_to_marc_file_pymarc")
+def bench_export_orders_to_marc_file_pymarc(ctx):
+    from data.transactions_carts import export_orders_to_marc_file
+
+    cart_rec = ctx.target_cart()
+    fh = ctx.path("orders.mrc")
+    return lambda: export_orders_to_marc_file(
+        fh, cart_rec, NullProgbar(), fast_serializer=False
+    )
+
+
+@benchmark("export_carts_to_marc_sequential")
+def bench_export_carts_to_marc_sequential(ctx):
+    from data.datastore import session_scope, Cart
+    from data.transactions_carts import export_orders_to_marc_file
+
+    with session_scope() as session:
+        carts = session.query(Cart).filter(Cart.did.in_(ctx.workload.cart_ids)).all()
+        session.expunge_all()
+
+    def export():
+        for cart_rec in carts:
+            fh = ctx.path(f"cart-{cart_rec.did}.mrc")
+            export_orders_to_marc_file(fh, cart_rec, NullProgbar())
+
+    return export
+
+
+@benchmark("export_carts_to_marc_batch")
+def bench_export_carts_to_marc_batch(ctx):
+    from data.transactions_carts import export_carts_to_marc_files
+
+    fh = ctx.path("carts.mrc")
+    return lambda: export_carts_to_marc_files(
+        ctx.workload.cart_ids, fh, True, NullProgbar()
+    )
+
+
+@benchmark("get_cart_data_for_order_sheet")
+def bench_get_cart_data_for_order_sheet(ctx):
+    from data.transactions_carts import get_cart_data_for_order_sheet
+
+    return lambda: get_cart_data_for_order_sheet(ctx.workload.target_cart_id)
+
+
+@benchmark("save2spreadsheet")
+def bench_save2spreadsheet(ctx):
+    from data.transactions_carts import get_cart_data_for_order_sheet
+    from ingest.xlsx import save2spreadsheet
+
+    data = get_cart_data_for_order_sheet(ctx.workload.target_cart_id)
+    fh = ctx.path("orders.xlsx")
+    return lambda: save2spreadsheet(fh, "New York Public Library", data)
+
+
+@benchmark("export_order_sheet")
+def bench_export_order_sheet(ctx):
+    from data.transactions_carts import iter_cart_data_for_order_sheet
+    from ingest.xlsx import save2spreadsheet
+
+    fh = ctx.path("orders.xlsx")
+    return lambda: save2spreadsheet(
+        fh,
+        "New York Public Library",
+        iter_cart_data_for_order_sheet(ctx.workload.target_cart_id),
+    )
+
+
+@benchmark("find_matches")
+def bench_find_matches(ctx):
+    from data.transactions_cart import find_matches
+
+    middleware = StubMiddleware(ctx.middleware_latency)
+    return lambda: find_matches(
+        ctx.workload.target_cart_id,
+        ctx.creds_fh,
+        middleware,
+        NullProgbar(),
+        rate_limit=None,
+        force_refresh=True,
+    )
+
+
+@benchmark("find_matches_cached")
+def bench_find_matches_cached(ctx):
+    from data.transactions_cart import find_matches
+
+    middleware = StubMiddleware(ctx.middleware_latency)
+    # warm up the catalog cache, timed runs find all results there
+    find_matches(
+        ctx.workload.target_cart_id,
+        ctx.creds_fh,
+        middleware,
+        NullProgbar(),
+        rate_limit=None,
+        force_refresh=True,
+    )
+    return lambda: find_matches(
+        ctx.workload.target_cart_id,
+        ctx.creds_fh,
+        middleware,
+        NullProgbar(),
+        rate_limit=None,
+        force_refresh=False,
+    )
+
+
+@benchmark("find_matches_stale")
+def bench_find_matches_stale(ctx):
+    from data.transactions_cart import find_matches
+
+    middleware = StubMiddleware(ctx.middleware_latency)
+    # check the whole cart first, timed runs find nothing stale
+    find_matches(
+        ctx.workload.target_cart_id,
+        ctx.creds_fh,
+        middleware,
+        NullProgbar(),
+        rate_limit=None,
+        force_refresh=True,
+    )
+    return lambda: find_matches(
+        ctx.workload.target_cart_id,
+        ctx.creds_fh,
+        middleware,
+        NullProgbar(),
+        rate_limit=None,
+        force_refresh=True,
+        stale_only=True,
+    )
+
+
+@benchmark("add_sierra_ids_to_orders")
+def bench_add_sierra_ids_to_orders(ctx):
+    from data.transactions_carts import add_sierra_ids_to_orders
+    from ingest.sierra_exports import BPL_IDS_HEADER, NYPL_IDS_HEADER
+
+    fh = ctx.path("sierra_ids.txt")
+    with open(fh, "w", newline="") as file:
+        writer = csv.writer(file, delimiter=",", quotechar='"')
+        if ctx.workload.system_id == 1:
+            writer.writerow(BPL_IDS_HEADER)
+        else:
+            writer.writerow(NYPL_IDS_HEADER)
+        for did in ctx.workload.target_order_ids:
+            writer.writerow([f"wlo{did:010}", f"o{did:08}", f"b{did:08}"])
+
+    return lambda: add_sierra_ids_to_orders(fh, ctx.workload.system_id)
+
+
+@benchmark("apply_grid_to_selected_orders")
+def bench_apply_grid_to_selected_orders(ctx):
+    from data.transactions_cart import apply_grid_to_selected_orders
+
+    return lambda: apply_grid_to_selected_orders(
+        ctx.workload.target_order_ids, ctx.workload.grid_id, append=False
+    )
+
+
+@benchmark("apply_grid_to_selected_orders.append")
+def bench_append_grid_to_selected_orders(ctx):
+    from data.transactions_cart import apply_grid_to_selected_orders
+
+    return lambda: apply_grid_to_selected_orders(
+        ctx.workload.target_order_ids, ctx.workload.grid_id, append=True
+    )
+
+
+@benchmark("apply_fund_to_cart")
+def bench_apply_fund_to_cart(ctx):
+    from data.transactions_cart import apply_fund_to_cart
+
+    return lambda: apply_fund_to_cart(
+        ctx.workload.system_id,
+        ctx.workload.target_cart_id,
+        ctx.workload.fund_codes[:5],
+    )
+
+
+@benchmark("apply_globals_to_cart")
+def bench_apply_globals_to_cart(ctx):
+    from data.transactions_cart import apply_globals_to_cart
+
+    widgets = {
+        "langCbx": Value("English"),
+        "vendorCbx": Value(ctx.workload.vendor_names[0]),
+        "mattypeCbx": Value("print"),
+        "audnCbx": Value("adult"),
+        "poEnt": Value(""),
+        "noteEnt": Value(""),
+        "commentEnt": Value(""),
+        "discEnt": Value("40"),
+        "priceEnt": Value(""),
+        "globgrid": (ctx.workload.distset_id, ctx.workload.grid_name),
+    }
+    return lambda: apply_globals_to_cart(ctx.workload.target_cart_id, widgets)
+
+
+def _ingest_rows(ctx):
+    from data.data_objs import VenData
+
+    return [
+        VenData(
+            title=f"Ingested title {n}",
+            author=f"Author {n}",
+            isbn=f"979{n:010}",
+            price_list=Decimal(f"{10 + n % 40}.99"),
+            price_disc=Decimal(f"{6 + n % 24}.59"),
+        )
+        for n in range(len(ctx.workload.target_order_ids))
+    ]
+
+
+def _bench_create_cart(ctx, bulk):
+    from data.transactions_ingest import create_cart
+
+    rows = _ingest_rows(ctx)
+    names = count()
+    return lambda: create_cart(
+        f"bench-ingest-{'bulk' if bulk else 'rows'}-{next(names)}",
+        ctx.workload.system_id,
+        ctx.workload.user_ids[0],
+        rows,
+        NullProgbar(),
+        bulk=bulk,
+    )
+
+
+@benchmark("create_cart")
+def bench_create_cart(ctx):
+    return _bench_create_cart(ctx, bulk=True)
+
+
+@benchmark("create_cart_row_by_row")
+def bench_create_cart_row_by_row(ctx):
+    return _bench_create_cart(ctx, bulk=False)
+
+
+def run_benchmark(ctx, name: str, repeat: int = 3) -> dict:
+    """
+    Times given benchmark
+
+    args:
+        ctx: BenchmarkContext instance
+        name: str, benchmark name
+        repeat: int, number of timed runs
+    returns:
+        result: dict
+    """
+    result = dict(name=name, status="ok", items=len(ctx.workload.target_order_ids))
+    try:
+        func = BENCHMARKS[name](ctx)
+    except ImportError as exc:
+        result.update(status="skipped", error=f"{exc.__class__.__name__}: {exc}")
+        return result
+
+    times = []
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    except Exception as exc:
+        result.update(
+            status="error",
+            error=f"{exc.__class__.__name__}: {exc}",
+            traceback=traceback.format_exc(),
+        )
+
+    if times:
+        result.update(
+            times=times,
+            min=min(times),
+            median=statistics.median(times),
+            mean=statistics.mean(times),
+        )
+    return result
@@ -0,0 +1,165 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from babel.data.babel_duplicates import (
+    BabelDup,
+    cart_identifiers_stmn,
+    find_babel_duplicates,
+)
+from babel.data.datastore import (
+    create_datastore_engine,
+    initialize_datastore,
+    Cart,
+    Order,
+    Resource,
+)
+from babel.data.query_profiler import instrument_engine, profile_session
+
+
+@pytest.fixture
+def session():
+    engine = create_datastore_engine("sqlite://")
+    initialize_datastore(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Cart(did=1, name="current", user_id=1, system_id=2, library_id=1))
+    session.add(Cart(did=2, name="earlier", user_id=1, system_id=2, library_id=1))
+    session.add(Cart(did=3, name="research", user_id=1, system_id=2, library_id=2))
+    session.add(Cart(did=4, name="bpl", user_id=1, system_id=1, library_id=1))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def add_order(session, did, cart_id, isbn=None, upc=None):
+    session.add(
+        Order(
+            did=did,
+            cart_id=cart_id,
+            resource=Resource(
+                did=did, title=f"title {did}", isbn=isbn, upc=upc, dup_babel=True
+            ),
+        )
+    )
+
+
+def dup_flags(session):
+    return {
+        r.did: r.dup_babel
+        for r in session.query(Resource).join(Order).filter(Order.cart_id == 1)
+    }
+
+
+def test_find_babel_duplicates(session, tmpdir):
+    add_order(session, 1, 1, isbn="9780000000001")
+    add_order(session, 2, 1, isbn="9780000000002", upc="000000000003")
+    add_order(session, 3, 1, upc="000000000003")
+    add_order(session, 4, 1, isbn="9780000000004")
+    add_order(session, 5, 1)
+    add_order(session, 11, 2, isbn="9780000000001")
+    add_order(session, 12, 2, isbn="9780000000001")
+    add_order(session, 13, 2, upc="000000000003")
+    # other library & system
+    add_order(session, 21, 3, isbn="9780000000002")
+    add_order(session, 22, 4, isbn="9780000000004")
+    session.commit()
+
+    instrument_engine(session.bind)
+    with profile_session(log_fh=str(tmpdir.join("profile.jsonl"))) as profile:
+        duplicates = find_babel_duplicates(session, 1)
+    session.commit()
+
+    assert duplicates == {
+        1: [BabelDup(2, "earlier", 11), BabelDup(2, "earlier", 12)],
+        3: [BabelDup(1, "current", 2), BabelDup(2, "earlier", 13)],
+    }
+    assert dup_flags(session) == {1: True, 2: False, 3: True, 4: False, 5: False}
+    # cart, matches, cart identifiers, clearing & setting of flags
+    assert profile.queries == 5
+
+
+def test_find_babel_duplicates_within_cart(session):
+    add_order(session, 1, 1, isbn="9780000000001")
+    add_order(session, 2, 1, isbn="9780000000001")
+    session.commit()
+
+    assert find_babel_duplicates(session, 1) == {
+        1: [BabelDup(1, "current", 2)],
+        2: [BabelDup(1, "current", 1)],
+    }
+
+
+def test_find_babel_duplicates_upc_of_resource_with_isbn(session):
+    add_order(session, 1, 1, upc="000000000003")
+    add_order(session, 2, 1, isbn="9780000000002", upc="000000000004")
+    add_order(session, 11, 2, isbn="9780000000001", upc="000000000003")
+    add_order(session, 12, 2, upc="000000000004")
+    session.commit()
+
+    # UPC is matched only for resources without ISBN
+    assert find_babel_duplicates(session, 1) == {1: [BabelDup(2, "earlier", 11)]}
+    session.commit()
+    assert dup_flags(session) == {1: True, 2: False}
+
+
+def test_find_babel_duplicates_flags_set_in_batches(session, tmpdir, monkeypatch):
+    monkeypatch.setattr("babel.data.babel_duplicates.UPDATE_BATCH_SIZE", 2)
+    for did in range(1, 6):
+        add_order(session, did, 1, isbn=f"978000000000{did}")
+        add_order(session, 10 + did, 2, isbn=f"978000000000{did}")
+    add_order(session, 6, 1, isbn="9780000000006")
+    session.commit()
+
+    instrument_engine(session.bind)
+    with profile_session(log_fh=str(tmpdir.join("profile.jsonl"))) as profile:
+        assert len(find_babel_duplicates(session, 1)) == 5
+    session.commit()
+
+    assert dup_flags(session) == {1: True, 2: True, 3: True, 4: True, 5: True, 6: False}
+    assert profile.queries == 4 + 3
+
+
+def test_find_babel_duplicates_none(session):
+    add_order(session, 1, 1, isbn="9780000000001")
+    session.commit()
+
+    assert find_babel_duplicates(session, 1) == {}
+    session.commit()
+    assert dup_flags(session) == {1: False}
+
+
+def test_cart_identifiers_due_for_recheck(session):
+    now = datetime.now()
+    checked = dict(dup_catalog=False, dup_timestamp=now - timedelta(days=1))
+    add_order(session, 1, 1, isbn="9780000000001")
+    add_order(session, 2, 1, isbn="9780000000002")
+    add_order(session, 3, 1, isbn="9780000000003")
+    add_order(session, 4, 1, upc="000000000004")
+    add_order(session, 5, 1)
+    add_order(session, 11, 2, isbn="9780000000011")
+    session.flush()
+    resources = {r.did: r for r in session.query(Resource)}
+    for did in (2, 4, 5, 11):
+        for key, value in checked.items():
+            setattr(resources[did], key, value)
+    # checked long ago
+    resources[3].dup_catalog = True
+    resources[3].dup_timestamp = now - timedelta(days=30)
+    # failed search
+    resources[4].dup_catalog = None
+    session.commit()
+
+    def due(checked_before):
+        stmn = cart_identifiers_stmn(1, checked_before)
+        return sorted(row.did for row in session.execute(stmn))
+
+    assert due(None) == [1, 2, 3, 4, 5]
+    assert due(now - timedelta(days=7)) == [1, 3, 4]
+
+    # changed identifier resets check
+    resources[2].isbn = "9780000000022"
+    resources[5].isbn = None
+    session.commit()
+    assert due(now - timedelta(days=7)) == [1, 2, 3, 4]
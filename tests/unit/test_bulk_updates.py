@@ -0,0 +1,271 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from babel.data.bulk_updates import (
+    append_order_locations,
+    cart_order_ids_stmn,
+    replace_order_locations,
+    update_catalog_dups,
+    update_cart_orders,
+    update_cart_prices,
+)
+from babel.data.datastore_worker import delete_cascade, delete_in, delete_where
+from babel.data.datastore import (
+    create_datastore_engine,
+    initialize_datastore,
+    Branch,
+    Cart,
+    DistGrid,
+    DistSet,
+    GridLocation,
+    Order,
+    OrderLocation,
+    Resource,
+    ShelfCode,
+)
+from babel.data.query_profiler import instrument_engine, profile_session
+
+
+class StubProgbar(dict):
+    def __init__(self):
+        super().__init__(value=0, maximum=0)
+        self.updates = 0
+
+    def update(self):
+        self.updates += 1
+
+
+@pytest.fixture
+def session():
+    engine = create_datastore_engine("sqlite://")
+    initialize_datastore(engine)
+    instrument_engine(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(ShelfCode(did=1, system_id=2, code="fc", name="fiction"))
+    session.add(Cart(did=1, name="cart", user_id=1, system_id=2, library_id=1))
+    session.add(Cart(did=2, name="other", user_id=1, system_id=2, library_id=1))
+    for did in range(1, 11):
+        session.add(
+            Order(
+                did=did,
+                cart_id=1 if did <= 8 else 2,
+                resource=Resource(
+                    title=f"title {did}",
+                    price_list=None if did == 1 else 20.0,
+                    price_disc=15.0,
+                ),
+                locations=[OrderLocation(branch_id=100, shelfcode_id=1, qty=1)],
+            )
+        )
+    session.add(
+        DistSet(
+            did=1,
+            name="set",
+            system_id=2,
+            user_id=1,
+            distgrids=[
+                DistGrid(
+                    did=1,
+                    name="grid",
+                    gridlocations=[
+                        GridLocation(branch_id=101, shelfcode_id=1, qty=2),
+                        GridLocation(branch_id=102, shelfcode_id=1, qty=3),
+                    ],
+                )
+            ],
+        )
+    )
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def prices(session, cart_id):
+    return [
+        (r.price_list, r.price_disc)
+        for r in session.query(Resource)
+        .join(Order)
+        .filter(Order.cart_id == cart_id)
+        .order_by(Resource.order_id)
+    ]
+
+
+def test_update_cart_orders(session):
+    assert update_cart_orders(session, 1, lang_id=2, poPerLine="po") == 8
+    session.commit()
+
+    assert {(o.cart_id, o.lang_id, o.poPerLine) for o in session.query(Order)} == {
+        (1, 2, "po"),
+        (2, None, None),
+    }
+
+
+def test_update_cart_orders_nothing_to_update(session):
+    assert update_cart_orders(session, 1) == 0
+
+
+def test_update_cart_prices_discount(session):
+    assert update_cart_prices(session, 1, discount=Decimal("40")) == 8
+    session.commit()
+
+    result = prices(session, 1)
+    # resources without list price keep discounted price
+    assert result[0] == (None, 15.0)
+    assert [(l, round(d, 2)) for l, d in result[1:]] == [(20.0, 12.0)] * 7
+    assert set(prices(session, 2)) == {(20.0, 15.0)}
+
+
+def test_update_cart_prices_list_price(session):
+    update_cart_prices(session, 1, list_price=Decimal("10.00"))
+    session.commit()
+    assert set(prices(session, 1)) == {(10.0, 10.0)}
+
+    update_cart_prices(session, 1, list_price=Decimal("10.00"), discount=Decimal(25))
+    session.commit()
+    assert set(prices(session, 1)) == {(10.0, 7.5)}
+
+
+def test_replace_order_locations(session, tmpdir):
+    grid_rec = session.query(DistGrid).filter_by(did=1).one()
+    progbar = StubProgbar()
+
+    with profile_session(log_fh=str(tmpdir.join("profile.jsonl"))) as profile:
+        inserted = replace_order_locations(
+            session,
+            cart_order_ids_stmn(1),
+            grid_rec.gridlocations,
+            progbar,
+            batch_size=3,
+        )
+    session.commit()
+
+    assert inserted == 16
+    assert progbar["value"] == 8
+    assert progbar.updates == 3
+    # delete, select of order ids & one insert per batch
+    assert profile.queries == 5
+    locs = session.query(OrderLocation).join(Order).filter(Order.cart_id == 1)
+    assert sorted({(l.branch_id, l.qty, l.fund_id) for l in locs}) == [
+        (101, 2, None),
+        (102, 3, None),
+    ]
+    assert locs.count() == 16
+    assert session.query(OrderLocation).filter_by(order_id=9).count() == 1
+
+
+def test_replace_order_locations_of_listed_orders(session):
+    grid_rec = session.query(DistGrid).filter_by(did=1).one()
+
+    assert replace_order_locations(session, [2, 3], grid_rec.gridlocations) == 4
+    session.commit()
+
+    assert session.query(OrderLocation).filter_by(order_id=2).count() == 2
+    assert session.query(OrderLocation).filter_by(order_id=1).count() == 1
+
+
+def test_append_order_locations(session, tmpdir):
+    session.add(OrderLocation(order_id=2, branch_id=101, shelfcode_id=1, qty=1))
+    session.add(OrderLocation(order_id=3, branch_id=101, shelfcode_id=None, qty=1))
+    session.commit()
+    grid_rec = session.query(DistGrid).filter_by(did=1).one()
+    progbar = StubProgbar()
+
+    with profile_session(log_fh=str(tmpdir.join("profile.jsonl"))) as profile:
+        result = append_order_locations(
+            session, [2, 3, 4], grid_rec.gridlocations, progbar
+        )
+    session.commit()
+
+    assert result == (1, 5)
+    assert profile.queries == 3
+    assert progbar["value"] == 3
+
+    def locations(order_id):
+        return [
+            (l.branch_id, l.shelfcode_id, l.qty)
+            for l in session.query(OrderLocation)
+            .filter_by(order_id=order_id)
+            .order_by(OrderLocation.did)
+        ]
+
+    assert locations(2) == [(100, 1, 1), (101, 1, 3), (102, 1, 3)]
+    assert locations(3) == [(100, 1, 1), (101, None, 1), (101, 1, 2), (102, 1, 3)]
+    assert locations(5) == [(100, 1, 1)]
+
+
+def test_append_order_locations_merges_grid_duplicates(session):
+    grid_rec = session.query(DistGrid).filter_by(did=1).one()
+    grid_locations = grid_rec.gridlocations + [
+        GridLocation(branch_id=101, shelfcode_id=1, qty=5)
+    ]
+
+    assert append_order_locations(session, [2], grid_locations) == (0, 2)
+    session.commit()
+
+    assert (
+        session.query(OrderLocation).filter_by(order_id=2, branch_id=101).one().qty == 7
+    )
+
+
+def test_update_catalog_dups(session):
+    searched = datetime(2022, 10, 14, 10, 30)
+    results = [(1, True, "b00000010,b00000020"), (2, False, None), (3, None, None)]
+
+    assert update_catalog_dups(session, results, searched) == 3
+    session.commit()
+
+    assert [
+        (r.dup_catalog, r.dup_bibs, r.dup_timestamp)
+        for r in session.query(Resource).order_by(Resource.did).limit(4)
+    ] == [
+        (True, "b00000010,b00000020", searched),
+        (False, None, searched),
+        (None, None, searched),
+        (None, None, None),
+    ]
+
+
+def test_delete_where(session):
+    closed = session.query(Branch.did).filter(Branch.did == 100)
+    assert (
+        delete_where(session, OrderLocation, OrderLocation.branch_id.in_(closed)) == 10
+    )
+    assert session.query(OrderLocation).count() == 0
+
+
+def test_delete_in(session):
+    assert delete_in(session, OrderLocation, OrderLocation.order_id, [1, 2, 3], 2) == 3
+    assert session.query(OrderLocation).count() == 7
+
+
+def test_delete_cascade(session, tmpdir):
+    with profile_session(log_fh=str(tmpdir.join("profile.jsonl"))) as profile:
+        assert delete_cascade(session, Order, [1, 2, 3, 9], batch_size=2) == 4
+    session.commit()
+
+    # resources, locations & orders per batch
+    assert profile.queries == 6
+    assert [o.did for o in session.query(Order).order_by(Order.did)] == [
+        4,
+        5,
+        6,
+        7,
+        8,
+        10,
+    ]
+    assert session.query(Resource).count() == 6
+    assert session.query(OrderLocation).count() == 6
+
+
+def test_delete_cascade_nested(session):
+    # cart's orders cascade further to resources & locations
+    assert delete_cascade(session, Cart, [2]) == 1
+    session.commit()
+
+    assert session.query(Order).filter_by(cart_id=2).count() == 0
+    assert session.query(Resource).count() == 8
+    assert session.query(OrderLocation).count() == 8
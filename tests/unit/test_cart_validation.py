@@ -0,0 +1,205 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from babel.data.cart_validation import validate_cart
+from babel.data.datastore import (
+    create_datastore_engine,
+    initialize_datastore,
+    Branch,
+    Cart,
+    Fund,
+    FundAudnJoiner,
+    FundBranchJoiner,
+    FundLibraryJoiner,
+    FundMatTypeJoiner,
+    Order,
+    OrderLocation,
+    Resource,
+    ShelfCode,
+    Vendor,
+)
+from babel.data.fund_rules import apply_funds, load_fund_rules
+from babel.data.lookup_memo import session_memo_stats
+from babel.data.query_profiler import instrument_engine, profile_session
+
+
+@pytest.fixture
+def session():
+    engine = create_datastore_engine("sqlite://")
+    initialize_datastore(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(ShelfCode(did=1, system_id=2, code="fc", name="fiction"))
+    session.add(Vendor(did=1, name="vendor"))
+    session.add(
+        Fund(
+            did=1,
+            code="adult",
+            system_id=2,
+            audns=[FundAudnJoiner(audn_id=3)],
+            matTypes=[FundMatTypeJoiner(matType_id=1)],
+            branches=[FundBranchJoiner(branch_id=100), FundBranchJoiner(branch_id=101)],
+            libraries=[FundLibraryJoiner(library_id=1)],
+        )
+    )
+    session.add(Fund(did=2, code="empty", system_id=2))
+    session.add(Cart(did=1, name="cart", user_id=1, system_id=2, library_id=1))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def add_order(session, did, locations, title="title", price_disc=9.99, **kwargs):
+    values = dict(lang_id=1, audn_id=3, vendor_id=1, matType_id=1)
+    values.update(kwargs)
+    session.add(
+        Order(
+            did=did,
+            cart_id=1,
+            resource=Resource(title=title, price_disc=price_disc),
+            locations=[OrderLocation(**loc) for loc in locations],
+            **values,
+        )
+    )
+
+
+def location(branch_id=100, fund_id=1, **kwargs):
+    return dict(branch_id=branch_id, shelfcode_id=1, qty=1, fund_id=fund_id, **kwargs)
+
+
+def test_fund_rules(session):
+    rules = load_fund_rules(session, system_id=2)
+
+    assert rules.permits(1, 1, 3, 1, 100)
+    assert not rules.permits(1, 2, 3, 1, 100)
+    assert not rules.permits(1, 1, 1, 1, 100)
+    assert not rules.permits(1, 1, 3, 1, 102)
+    assert not rules.permits(2, 1, 3, 1, 100)
+    # incomplete orders are not rejected
+    assert rules.permits(2, 1, None, 1, 100)
+
+
+def test_fund_rules_limited_to_given_funds(session):
+    rules = load_fund_rules(session, fund_ids=[2])
+    assert not rules.permits(1, 1, 3, 1, 100)
+
+
+def test_apply_funds(session, tmpdir):
+    session.add(
+        Fund(
+            did=3,
+            code="branch101",
+            system_id=2,
+            audns=[FundAudnJoiner(audn_id=3)],
+            matTypes=[FundMatTypeJoiner(matType_id=1)],
+            branches=[FundBranchJoiner(branch_id=101)],
+            libraries=[FundLibraryJoiner(library_id=1)],
+        )
+    )
+    add_order(
+        session,
+        1,
+        [location(fund_id=None), location(101, None), location(102, None)],
+    )
+    add_order(session, 2, [location(fund_id=None)], audn_id=1)
+    session.commit()
+
+    instrument_engine(session.bind)
+    with profile_session(log_fh=str(tmpdir.join("profile.jsonl"))) as profile:
+        assert apply_funds(session, 1, [1, 3]) == (2, 2)
+    session.commit()
+
+    assert profile.queries == 3
+    assert [
+        l.fund_id for l in session.query(OrderLocation).order_by(OrderLocation.did)
+    ] == [1, 3, None, None]
+
+
+def test_apply_funds_wrong_library(session):
+    session.query(Cart).filter_by(did=1).update(dict(library_id=2))
+    add_order(session, 1, [location(fund_id=None)])
+    session.commit()
+
+    assert apply_funds(session, 1, [1]) == (0, 1)
+
+
+def test_validate_cart_valid(session):
+    add_order(session, 1, [location(), location(branch_id=101)])
+    session.commit()
+
+    assert validate_cart(session, 1) == (0, {})
+
+
+def test_validate_cart_issues(session):
+    add_order(session, 1, [location()])
+    add_order(
+        session,
+        2,
+        [location(), dict(branch_id=None, shelfcode_id=None, qty=0, fund_id=None)],
+        lang_id=None,
+        price_disc=0.0,
+    )
+    add_order(session, 3, [], audn_id=None)
+    add_order(session, 4, [location(branch_id=102), location(fund_id=2)])
+    session.query(Resource).filter_by(order_id=1).update(
+        dict(dup_catalog=True, dup_babel=True)
+    )
+    session.query(Branch).filter_by(did=100).update(dict(temp_closed=True))
+    session.commit()
+    branch_code = session.query(Branch).filter_by(did=100).one().code
+
+    iss_count, issues = validate_cart(session, 1)
+
+    assert list(issues.keys()) == [1, 2, 3, 4]
+    assert issues[1] == (
+        ["catalog duplicate", "previously ordered"],
+        {1: [f"branch closed ({branch_code})"]},
+    )
+    assert issues[2] == (
+        ["language", "discount price"],
+        {
+            1: [f"branch closed ({branch_code})"],
+            2: ["no branch", "no shelf code", "no quantity", "no fund"],
+        },
+    )
+    assert issues[3] == (["audience", "locations"], {})
+    assert issues[4] == (
+        [],
+        {
+            1: ["(incorrect) fund"],
+            2: [f"branch closed ({branch_code})", "(incorrect) fund"],
+        },
+    )
+    assert iss_count == 3 + 7 + 2 + 3
+
+
+def test_validate_cart_library_issue(session):
+    session.query(Cart).filter_by(did=1).update(dict(library_id=None))
+    add_order(session, 1, [location()])
+    session.commit()
+
+    assert validate_cart(session, 1) == (1, {0: "NYPL carts must specify library"})
+
+
+def test_validate_cart_queries_independent_of_cart_size(session, tmpdir):
+    for did in range(1, 201):
+        add_order(session, did, [location(branch_id=100 + n) for n in range(5)])
+    session.commit()
+
+    instrument_engine(session.bind)
+    with profile_session(log_fh=str(tmpdir.join("profile.jsonl"))) as profile:
+        iss_count, issues = validate_cart(session, 1)
+
+    assert iss_count == 200 * 3
+    assert profile.queries == 3
+
+
+def test_validate_cart_memoizes_fund_checks(session):
+    for did in range(1, 11):
+        add_order(session, did, [location(), location(branch_id=101)])
+    session.commit()
+
+    assert validate_cart(session, 1) == (0, {})
+    assert session_memo_stats(session)["fund_check"] == dict(
+        hits=18, misses=2, size=2, max=256
+    )
@@ -0,0 +1,231 @@
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from babel.data.catalog_cache import (
+    cache_library,
+    cached_bib_data,
+    cached_catalog_dups,
+    catalog_cache_options,
+    report_cache_stats,
+    save_catalog_cache_options,
+    store_bib_data,
+    store_catalog_dups,
+    RECHECK_DAYS,
+    TTL_HOURS,
+)
+from babel.data.datastore import (
+    create_datastore_engine,
+    initialize_datastore,
+    CatalogBibCache,
+    CatalogDupCache,
+)
+
+
+NOW = datetime(2024, 5, 1, 12)
+
+
+@pytest.fixture
+def session():
+    engine = create_datastore_engine("sqlite://")
+    initialize_datastore(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_catalog_cache_options_default(tmpdir):
+    user_data = str(tmpdir.join("user_data"))
+    assert catalog_cache_options(user_data) == dict(
+        TTL_HOURS=TTL_HOURS, FORCE_REFRESH=False, RECHECK_DAYS=RECHECK_DAYS
+    )
+
+
+def test_save_catalog_cache_options(tmpdir):
+    user_data = str(tmpdir.join("user_data"))
+    save_catalog_cache_options(user_data, 6, True, 30)
+    assert catalog_cache_options(user_data) == dict(
+        TTL_HOURS=6, FORCE_REFRESH=True, RECHECK_DAYS=30
+    )
+
+
+@pytest.mark.parametrize(
+    "system_id,library,expectation",
+    [(1, "branches", ""), (1, None, ""), (2, "branches", "branches"), (2, None, "")],
+)
+def test_cache_library(system_id, library, expectation):
+    assert cache_library(system_id, library) == expectation
+
+
+def test_store_and_retrieve_catalog_dups(session):
+    stored = store_catalog_dups(
+        session,
+        2,
+        "branches",
+        {
+            "9780000000001": (True, "b11111111,b22222222"),
+            "9780000000002": (False, None),
+            "000000000003": (None, None),
+        },
+        NOW,
+    )
+    session.commit()
+
+    assert stored == 2
+    assert cached_catalog_dups(
+        session,
+        2,
+        "branches",
+        ["9780000000001", "9780000000002", "000000000003", "9780000000001"],
+        24,
+        now=NOW,
+    ) == {
+        "9780000000001": (True, "b11111111,b22222222"),
+        "9780000000002": (False, None),
+    }
+
+
+def test_cached_catalog_dups_scoped_by_system_and_library(session):
+    store_catalog_dups(session, 2, "branches", {"9780000000001": (True, "b1")}, NOW)
+    store_catalog_dups(session, 1, "branches", {"9780000000001": (False, None)}, NOW)
+    session.commit()
+
+    assert cached_catalog_dups(session, 2, "research", ["9780000000001"], 24, NOW) == {}
+    assert cached_catalog_dups(session, 2, "branches", ["9780000000001"], 24, NOW) == {
+        "9780000000001": (True, "b1")
+    }
+    # BPL results do not depend on library
+    assert cached_catalog_dups(session, 1, None, ["9780000000001"], 24, NOW) == {
+        "9780000000001": (False, None)
+    }
+
+
+def test_cached_catalog_dups_expired(session):
+    store_catalog_dups(
+        session, 1, None, {"9780000000001": (True, "b1")}, NOW - timedelta(hours=25)
+    )
+    store_catalog_dups(
+        session, 1, None, {"9780000000002": (True, "b2")}, NOW - timedelta(hours=23)
+    )
+    session.commit()
+
+    assert cached_catalog_dups(
+        session, 1, None, ["9780000000001", "9780000000002"], 24, NOW
+    ) == {"9780000000002": (True, "b2")}
+
+
+def test_cached_catalog_dups_disabled(session):
+    store_catalog_dups(session, 1, None, {"9780000000001": (True, "b1")}, NOW)
+    session.commit()
+
+    assert cached_catalog_dups(session, 1, None, ["9780000000001"], 0, NOW) == {}
+
+
+def test_store_catalog_dups_replaces_entries(session):
+    store_catalog_dups(
+        session, 1, None, {"9780000000001": (False, None)}, NOW - timedelta(hours=30)
+    )
+    store_catalog_dups(session, 1, None, {"9780000000001": (True, "b1")}, NOW)
+    session.commit()
+
+    assert session.query(CatalogDupCache).count() == 1
+    assert cached_catalog_dups(session, 1, None, ["9780000000001"], 24, NOW) == {
+        "9780000000001": (True, "b1")
+    }
+
+
+def test_store_and_retrieve_bib_data(session):
+    bib_data = dict(bibNo="11111111", title="Foo", author="Bar")
+    item_data = [dict(locCode="mm", status="AVAILABLE")]
+
+    assert store_bib_data(session, 2, "11111111", bib_data, item_data, NOW)
+    session.commit()
+
+    assert cached_bib_data(session, 2, "11111111", 24, NOW) == (bib_data, item_data)
+    assert cached_bib_data(session, 1, "11111111", 24, NOW) is None
+    assert cached_bib_data(session, 2, "11111111", 24, NOW + timedelta(days=2)) is None
+    assert cached_bib_data(session, 2, "11111111", 0, NOW) is None
+
+
+def test_store_bib_data_without_bib(session):
+    assert not store_bib_data(session, 2, "11111111", None, None, NOW)
+    session.commit()
+
+    assert cached_bib_data(session, 2, "11111111", 24, NOW) is None
+
+
+def test_report_cache_stats(tmpdir):
+    log_fh = str(tmpdir.join("log", "profile.jsonl"))
+
+    report_cache_stats("catalog_dups", "find_matches", 3, 1, True, log_fh)
+
+    with open(log_fh) as file:
+        record = json.loads(file.readline())
+    assert record["cache"] == "catalog_dups"
+    assert record["operation"] == "find_matches"
+    assert (record["hits"], record["misses"], record["hit_rate"]) == (3, 1, 0.75)
+
+
+def test_report_cache_stats_profiling_disabled(tmpdir, caplog):
+    log_fh = str(tmpdir.join("log", "profile.jsonl"))
+
+    with caplog.at_level(logging.DEBUG, logger="babel"):
+        report_cache_stats("catalog_dups", "find_matches", 3, 1, log_fh=log_fh)
+
+    assert not os.path.exists(log_fh)
+    assert "3 hits/1 misses (75%)" in caplog.text
+
+
+@pytest.fixture
+def session_without_cache():
+    engine = create_datastore_engine("sqlite://")
+    initialize_datastore(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE catalog_dup_cache"))
+        conn.execute(text("DROP TABLE catalog_bib_cache"))
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_catalog_cache_tables_created_on_first_use(session_without_cache):
+    session = session_without_cache
+
+    assert cached_catalog_dups(session, 2, "branches", ["9780000000001"], 24) == {}
+    assert store_catalog_dups(
+        session, 2, "branches", {"9780000000001": (True, "1")}, NOW
+    )
+    assert store_bib_data(session, 2, "11111111", {"title": "foo"}, [], NOW)
+    session.commit()
+
+    assert cached_catalog_dups(session, 2, "branches", ["9780000000001"], 24, NOW) == {
+        "9780000000001": (True, "1")
+    }
+    assert cached_bib_data(session, 2, "11111111", 24, NOW) == ({"title": "foo"}, [])
+
+
+def test_catalog_cache_skipped_without_tables(session_without_cache, monkeypatch):
+    session = session_without_cache
+
+    def denied(*args, **kwargs):
+        raise OperationalError("CREATE TABLE", {}, Exception("access denied"))
+
+    monkeypatch.setattr(CatalogDupCache.__table__, "create", denied)
+    monkeypatch.setattr(CatalogBibCache.__table__, "create", denied)
+
+    assert cached_catalog_dups(session, 2, "branches", ["9780000000001"], 24) == {}
+    assert (
+        store_catalog_dups(session, 2, "branches", {"9780000000001": (True, "1")}, NOW)
+        == 0
+    )
+    assert cached_bib_data(session, 2, "11111111", 24) is None
+    assert not store_bib_data(session, 2, "11111111", {"title": "foo"}, [], NOW)
+    session.commit()
@@ -0,0 +1,260 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from babel.sierra_adapters.concurrent_search import (
+    ConcurrentSearch,
+    RateLimiter,
+    batch_queries,
+    combine_results,
+)
+
+
+class StubCatalogHandler(BaseHTTPRequestHandler):
+    """
+    Answers /search?keyword=...&keyword=... after the server's latency with
+    lines of matching keyword & bib number; keywords ending with 0 are
+    catalog duplicates; requests of keywords listed in server's `flaky`
+    fail with 503 the first time, listed in `broken` every time
+    """
+
+    def do_GET(self):
+        server = self.server
+        keywords = parse_qs(urlparse(self.path).query)["keyword"]
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            fail = bool(server.flaky.union(server.broken).intersection(keywords))
+            server.flaky.difference_update(keywords)
+        time.sleep(server.latency)
+        with server.lock:
+            server.in_flight -= 1
+
+        if fail:
+            self.send_response(503)
+            body = b""
+        else:
+            self.send_response(200)
+            body = "\n".join(
+                f"{keyword} b{keyword[-8:]}"
+                for keyword in keywords
+                if keyword.endswith("0")
+            ).encode()
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubError(Exception):
+    pass
+
+
+class StubMiddleware(requests.Session):
+    """Mimics search method of NypPlatform & BplSolr over HTTP"""
+
+    def __init__(self, endpoint):
+        super().__init__()
+        self.endpoint = endpoint
+        self.threads = set()
+        self.closed = False
+
+    def search_many(self, keywords, keyword_type=None, raise_errors=False):
+        self.threads.add(threading.get_ident())
+        response = self.get(f"{self.endpoint}/search", params={"keyword": keywords})
+        if response.status_code != 200:
+            if raise_errors:
+                raise StubError(response.status_code)
+            return {keyword: (None, None) for keyword in keywords}
+        results = {keyword: (False, None) for keyword in keywords}
+        for line in response.text.splitlines():
+            keyword, bib_no = line.split()
+            results[keyword] = (True, bib_no)
+        return results
+
+    def search(self, keywords, keyword_type=None, raise_errors=False):
+        results = self.search_many(keywords, keyword_type, raise_errors)
+        return results[keywords[0]]
+
+    def close(self):
+        self.closed = True
+        super().close()
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubCatalogHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.latency = 0.05
+    server.requests = server.in_flight = server.max_in_flight = 0
+    server.flaky = set()
+    server.broken = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def middleware(stub_server):
+    """Factory of middleware sessions, keeps track of opened sessions"""
+    sessions = []
+
+    def new_session():
+        session = StubMiddleware(f"http://127.0.0.1:{stub_server.server_port}")
+        sessions.append(session)
+        return session
+
+    new_session.sessions = sessions
+    yield new_session
+    for session in sessions:
+        session.close()
+
+
+def queries(n):
+    return [(did, [f"9780000{did:06}"], "isbn") for did in range(1, n + 1)]
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(50)
+    start = time.monotonic()
+    for _ in range(11):
+        limiter.wait()
+    assert time.monotonic() - start >= 0.19
+
+
+def test_rate_limiter_unlimited():
+    limiter = RateLimiter(None)
+    start = time.monotonic()
+    for _ in range(1000):
+        limiter.wait()
+    assert time.monotonic() - start < 0.1
+
+
+def test_invalid_max_in_flight(middleware):
+    with pytest.raises(ValueError):
+        ConcurrentSearch(middleware, max_in_flight=0)
+
+
+def test_search_all(stub_server, middleware):
+    search = ConcurrentSearch(middleware, max_in_flight=8, rate_limit=None)
+
+    start = time.perf_counter()
+    results = {key: (dup, bibs) for key, dup, bibs in search.search_all(queries(40))}
+    elapsed = time.perf_counter() - start
+
+    assert len(results) == 40
+    assert results[10] == (True, "b00000010")
+    assert results[11] == (False, None)
+    assert stub_server.requests == 40
+    assert stub_server.max_in_flight == 8
+    # 40 serial requests take at least 2s
+    assert elapsed < 40 * stub_server.latency / 2
+
+
+def test_search_all_session_per_worker(stub_server, middleware):
+    search = ConcurrentSearch(middleware, max_in_flight=4, rate_limit=None)
+
+    assert len(list(search.search_all(queries(20)))) == 20
+
+    assert 1 < len(middleware.sessions) <= 4
+    for session in middleware.sessions:
+        # used only by the worker which opened it & closed afterwards
+        assert len(session.threads) == 1
+        assert session.closed
+    assert search.sessions == []
+
+
+def test_search_all_rate_limited(stub_server, middleware):
+    search = ConcurrentSearch(middleware, max_in_flight=8, rate_limit=20)
+
+    start = time.perf_counter()
+    assert len(list(search.search_all(queries(11)))) == 11
+    assert time.perf_counter() - start >= 0.5
+
+
+def test_search_retries_failed_requests(stub_server, middleware):
+    stub_server.flaky = {"9780000000001", "9780000000002"}
+    search = ConcurrentSearch(
+        middleware, rate_limit=None, backoff=0.01, retry_errors=(StubError,)
+    )
+
+    results = {key: (dup, bibs) for key, dup, bibs in search.search_all(queries(3))}
+
+    assert results == {1: (False, None), 2: (False, None), 3: (False, None)}
+    assert stub_server.requests == 5
+
+
+def test_search_gives_up_after_retries(stub_server, middleware):
+    stub_server.latency = 0.0
+    stub_server.broken = {"9780000000001"}
+    search = ConcurrentSearch(
+        middleware, retries=2, backoff=0.01, retry_errors=(StubError,)
+    )
+
+    assert search.search(["9780000000001"], "isbn") == (None, None)
+    assert stub_server.requests == 3
+
+
+def test_batch_queries():
+    queries = [
+        (1, ["a"], "isbn"),
+        (2, ["u"], "upc"),
+        (3, ["b", "c"], "isbn"),
+        (4, ["a"], "isbn"),
+        (5, ["d"], "isbn"),
+    ]
+
+    assert list(batch_queries(queries, 3)) == [
+        ([(1, ["a"]), (3, ["b", "c"])], ["a", "b", "c"], "isbn"),
+        ([(2, ["u"])], ["u"], "upc"),
+        ([(4, ["a"]), (5, ["d"])], ["a", "d"], "isbn"),
+    ]
+
+
+def test_combine_results():
+    assert combine_results([(True, "b1,b2"), (True, "b2,b3")]) == (True, "b1,b2,b3")
+    assert combine_results([(False, None), (None, None)]) == (None, None)
+    assert combine_results([(True, "b1"), (None, None)]) == (True, "b1")
+    assert combine_results([(False, None)]) == (False, None)
+
+
+def test_search_all_batched(stub_server, middleware):
+    search = ConcurrentSearch(middleware, max_in_flight=4, rate_limit=None)
+    title_queries = queries(95) + [(96, ["9780000000010"], "isbn")]
+
+    results = {
+        key: (dup, bibs)
+        for key, dup, bibs in search.search_all(title_queries, batch_size=20)
+    }
+
+    assert len(results) == 96
+    assert results[10] == results[96] == (True, "b00000010")
+    assert results[11] == (False, None)
+    assert stub_server.requests == 5
+
+
+def test_search_all_batched_retries_failed_requests(stub_server, middleware):
+    stub_server.flaky = {"9780000000001"}
+    stub_server.broken = {"9780000000025"}
+    search = ConcurrentSearch(
+        middleware, rate_limit=None, retries=1, backoff=0.01, retry_errors=(StubError,)
+    )
+
+    results = {
+        key: (dup, bibs)
+        for key, dup, bibs in search.search_all(queries(40), batch_size=20)
+    }
+
+    assert results[20] == (True, "b00000020")
+    assert results[21] == results[40] == (None, None)
+    assert stub_server.requests == 4
@@ -0,0 +1,155 @@
+from decimal import Decimal
+import shelve
+
+from openpyxl import Workbook
+import pytest
+
+from babel.data import transactions_ingest
+from babel.data.datastore import (
+    dispose_data_access_layer,
+    session_scope,
+    Cart,
+    Order,
+    Resource,
+)
+from babel.data.transactions_ingest import create_cart, insert_resources_batch
+from babel.data.data_objs import VenData
+from babel.errors import BabelError
+from babel.ingest.xlsx import ResourceDataReader
+
+
+class Progbar(dict):
+    def __init__(self):
+        super().__init__(value=0, maximum=0)
+
+    def update(self):
+        pass
+
+
+@pytest.fixture
+def sqlite_user_data(dummy_user_data):
+    user_data = shelve.open(dummy_user_data)
+    user_data["db_config"] = dict(DB_DIALECT="sqlite")
+    user_data.close()
+    dispose_data_access_layer()
+    yield dummy_user_data
+    dispose_data_access_layer()
+
+
+@pytest.fixture
+def vendor_sheet(tmpdir):
+    fh = str(tmpdir.join("vendor.xlsx"))
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["title", "author", "isbn", "list", "disc", "comment"])
+    for n in range(25):
+        ws.append(
+            [
+                f"Title {n}",
+                f"Author {n}" if n % 3 else None,
+                f"978000000{n:04}",
+                f"{10 + n}.99",
+                f"{6 + n}.59",
+                f"comment {n}" if n % 2 else None,
+            ]
+        )
+    wb.save(fh)
+    return fh
+
+
+def read_sheet(fh):
+    return ResourceDataReader(
+        fh,
+        header_row=1,
+        title_col=0,
+        author_col=1,
+        isbn_col=2,
+        price_list_col=3,
+        price_disc_col=4,
+        comment_col=5,
+    )
+
+
+def cart_rows(session, cart_id):
+    orders = session.query(Order).filter_by(cart_id=cart_id).order_by(Order.did)
+    return [
+        (
+            o.comment,
+            o.resource.title,
+            o.resource.author,
+            o.resource.isbn,
+            o.resource.price_list,
+            o.resource.price_disc,
+        )
+        for o in orders
+    ]
+
+
+def test_create_cart_bulk_matches_row_by_row(sqlite_user_data, vendor_sheet):
+    bulk_id = create_cart(
+        "bulk", 2, 1, read_sheet(vendor_sheet), Progbar(), bulk=True, batch_size=10
+    )
+    rows_id = create_cart("rows", 2, 1, read_sheet(vendor_sheet), Progbar(), bulk=False)
+
+    with session_scope() as session:
+        bulk_rows = cart_rows(session, bulk_id)
+        assert len(bulk_rows) == 25
+        assert bulk_rows == cart_rows(session, rows_id)
+        assert bulk_rows[1] == (
+            "comment 1",
+            "Title 1",
+            "Author 1",
+            "9780000000001",
+            Decimal("11.99"),
+            Decimal("7.59"),
+        )
+        # every order has exactly one resource
+        assert session.query(Resource).count() == session.query(Order).count()
+
+
+def test_insert_resources_batch_backfills_order_ids(sqlite_user_data):
+    with session_scope() as session:
+        session.add_all(
+            [
+                Cart(did=1, name="a", user_id=1, system_id=2),
+                Cart(did=2, name="b", user_id=1, system_id=2),
+            ]
+        )
+        session.flush()
+        first = insert_resources_batch(
+            session, 1, [VenData(title="t1"), VenData(title="t2")]
+        )
+        # orders of other carts interleave with the batches
+        insert_resources_batch(session, 2, [VenData(title="other")])
+        second = insert_resources_batch(session, 1, [VenData(title="t3")])
+
+        assert len(first) == 2 and len(second) == 1
+        assert second[0] > max(first)
+        titles = {
+            r.order_id: r.title
+            for r in session.query(Resource).filter(
+                Resource.order_id.in_(first + second)
+            )
+        }
+        assert [titles[did] for did in first + second] == ["t1", "t2", "t3"]
+
+
+def test_insert_resources_batch_count_mismatch(sqlite_user_data, monkeypatch):
+    insert_many = transactions_ingest.insert_many
+
+    def insert_extra_order(session, model, mappings):
+        # simulates an order created for the cart by another workstation
+        if model is Order:
+            mappings = mappings + [dict(cart_id=1, comment=None)]
+        return insert_many(session, model, mappings)
+
+    monkeypatch.setattr(transactions_ingest, "insert_many", insert_extra_order)
+
+    with pytest.raises(BabelError):
+        with session_scope() as session:
+            session.add(Cart(did=1, name="a", user_id=1, system_id=2))
+            session.flush()
+            insert_resources_batch(session, 1, [VenData(title="t1")])
+
+    with session_scope() as session:
+        assert session.query(Resource).count() == 0
@@ -0,0 +1,96 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from babel.data.lookup_memo import (
+    LookupMemo,
+    invalidate_session_memos,
+    session_memo,
+    session_memo_stats,
+)
+
+
+def test_memo_hits_and_misses():
+    memo = LookupMemo()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return "code"
+
+    assert memo.get(1, loader) == "code"
+    assert memo.get(1, loader) == "code"
+    assert len(calls) == 1
+    assert memo.stats() == dict(hits=1, misses=1, size=1, max=256)
+
+
+def test_memo_caches_none_values():
+    memo = LookupMemo()
+    assert memo.get(1, lambda: None) is None
+    assert memo.get(1, lambda: "other") is None
+    assert memo.hits == 1
+
+
+def test_memo_bounded_size_evicts_least_recently_used():
+    memo = LookupMemo(maxsize=2)
+    memo.get("a", lambda: 1)
+    memo.get("b", lambda: 2)
+    memo.get("a", lambda: 1)
+    memo.get("c", lambda: 3)
+    assert len(memo) == 2
+    assert "a" in memo
+    assert "b" not in memo
+
+
+def test_memo_invalidate():
+    memo = LookupMemo()
+    memo.get("a", lambda: 1)
+    memo.get("b", lambda: 2)
+    memo.invalidate("a")
+    assert "a" not in memo
+    assert "b" in memo
+    memo.invalidate()
+    assert len(memo) == 0
+
+
+def test_session_memo_scoped_to_session():
+    Session = sessionmaker(bind=create_engine("sqlite://"))
+    session1 = Session()
+    session2 = Session()
+
+    memo = session_memo(session1, "branch_code")
+    assert session_memo(session1, "branch_code") is memo
+    assert session_memo(session2, "branch_code") is not memo
+
+    memo.get(1, lambda: "01")
+    memo.get(1, lambda: "01")
+    assert session_memo_stats(session1) == {
+        "branch_code": dict(hits=1, misses=1, size=1, max=256)
+    }
+    assert session_memo_stats(session2) == {
+        "branch_code": dict(hits=0, misses=0, size=0, max=256)
+    }
+
+    invalidate_session_memos(session1)
+    assert len(memo) == 0
+
+    session1.close()
+    session2.close()
+
+
+def test_session_memos_cleared_on_commit_and_rollback():
+    Session = sessionmaker(bind=create_engine("sqlite://"))
+    session = Session()
+
+    memo = session_memo(session, "branch_code")
+    session.execute(text("SELECT 1"))
+    memo.get(1, lambda: "01")
+    session.commit()
+    assert len(memo) == 0
+
+    session.execute(text("SELECT 1"))
+    memo.get(1, lambda: "01")
+    session.rollback()
+    assert len(memo) == 0
+    assert memo.stats() == dict(hits=0, misses=2, size=0, max=256)
+
+    session.close()
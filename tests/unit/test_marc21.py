@@ -0,0 +1,124 @@
+from decimal import Decimal
+import os
+
+import pytest
+from pymarc import MARCReader
+
+from babel.data.marc_export import MarcOrder, MarcResource
+from babel.marc.marc21 import make_bib, make_bib_marc, marc_file_writer
+
+
+def marc_order(wlo="wlo0000000001", mat_bib="a", title="Foo", **kwargs):
+    resource = dict(
+        title=title,
+        author="Bar",
+        isbn="9780000000001",
+        upc=None,
+        other_no=None,
+        pub_date="2024",
+        pub_place=None,
+        publisher="Spam",
+        price_disc=Decimal("9.99"),
+    )
+    resource.update({k: v for k, v in kwargs.items() if k in resource})
+    order = dict(poPerLine=None, note="note", audn="a", lang="eng")
+    order.update({k: v for k, v in kwargs.items() if k in order})
+    return MarcOrder(
+        wlo=wlo,
+        mat_bib=mat_bib,
+        mat_ord="b",
+        vendor="nv",
+        copies="2",
+        locs="agafc/2",
+        funds="10001adb/2",
+        order_date="05-01-2024",
+        resource=MarcResource(**resource),
+        **order,
+    )
+
+
+def test_make_bib():
+    bib = make_bib("NYP", "c", "NYPL240501", "xyz", marc_order(mat_bib="h"))
+
+    assert [f.tag for f in bib.fields] == [
+        "001",
+        "008",
+        "020",
+        "040",
+        "100",
+        "245",
+        "264",
+        "300",
+        "910",
+        "940",
+        "960",
+        "961",
+    ]
+    assert bib["245"]["a"] == "Foo (DVD)"
+    assert bib["910"]["a"] == "BL"
+    assert bib["960"]["t"] == "agafc/2"
+    assert bib["961"]["m"] == "NYPL240501"
+
+
+def test_make_bib_does_not_modify_order():
+    order = marc_order(mat_bib="j")
+    make_bib("BKL", "c", None, "xyz", order)
+    assert order.resource.title == "Foo"
+
+
+@pytest.mark.parametrize("oclc_code", ["BKL", "NYP"])
+@pytest.mark.parametrize(
+    "library_code,blanketPO,selector_code", [("c", None, "xyz"), ("r", "PO1", "abc")]
+)
+@pytest.mark.parametrize(
+    "order",
+    [
+        marc_order(),
+        marc_order(mat_bib="h", title="The Foo", poPerLine="12", note=None),
+        marc_order(mat_bib="i", author=None, isbn=None, upc="012345678905"),
+        marc_order(mat_bib="j", other_no="ABC 123", pub_place="New York"),
+        marc_order(title="Żółć – 東京 « Ñandú »", author="Ærø, Ōtomo"),
+        marc_order(publisher=None, pub_date=None, note=None),
+    ],
+)
+def test_make_bib_marc_identical_to_pymarc(
+    oclc_code, library_code, blanketPO, selector_code, order
+):
+    args = (oclc_code, library_code, blanketPO, selector_code, order)
+    assert make_bib_marc(*args) == make_bib(*args).as_marc()
+
+
+def test_marc_file_writer(tmpdir):
+    fh = str(tmpdir.join("orders.mrc"))
+    with open(fh, "w") as file:
+        file.write("previous export")
+
+    with marc_file_writer(fh) as file:
+        for n in range(3):
+            file.write(make_bib_marc("BKL", "c", None, "xyz", marc_order(f"wlo{n}")))
+        # destination is replaced only when all records are written
+        with open(fh) as file:
+            assert file.read() == "previous export"
+
+    with open(fh, "rb") as file:
+        assert [bib["001"].data for bib in MARCReader(file)] == [
+            "wlo0",
+            "wlo1",
+            "wlo2",
+        ]
+    assert os.listdir(str(tmpdir)) == ["orders.mrc"]
+
+
+def test_marc_file_writer_failure(tmpdir):
+    fh = str(tmpdir.join("orders.mrc"))
+    with open(fh, "w") as file:
+        file.write("previous export")
+
+    with pytest.raises(ValueError):
+        with marc_file_writer(fh) as file:
+            file.write(make_bib_marc("BKL", "c", None, "xyz", marc_order()))
+            raise ValueError
+
+    with open(fh) as file:
+        assert file.read() == "previous export"
+    assert os.listdir(str(tmpdir)) == ["orders.mrc"]
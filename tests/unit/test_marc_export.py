@@ -0,0 +1,226 @@
+from contextlib import contextmanager
+from decimal import Decimal
+import os
+
+import pytest
+from pymarc import MARCReader
+from sqlalchemy.orm import sessionmaker
+
+from babel.data.datastore import (
+    create_datastore_engine,
+    initialize_datastore,
+    Cart,
+    Fund,
+    Order,
+    OrderLocation,
+    Resource,
+    ShelfCode,
+    Vendor,
+)
+from babel.data.marc_export import (
+    cart_file_name,
+    cart_marc_orders,
+    export_carts_to_marc,
+)
+from babel.marc.marc21 import marc_file_writer
+from babel.data.query_profiler import instrument_engine, profile_session
+
+
+@pytest.fixture
+def session():
+    engine = create_datastore_engine("sqlite://")
+    initialize_datastore(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Vendor(did=1, name="vendor", bpl_code="bv", nyp_code="nv"))
+    session.add(ShelfCode(did=1, system_id=2, code="fc", name="fiction"))
+    session.add(
+        ShelfCode(did=2, system_id=2, code="wl", name="world", includes_audn=False)
+    )
+    session.add(Fund(did=1, code="10001adb", system_id=2))
+    session.add(Cart(did=1, name="cart", user_id=1, system_id=2, library_id=1))
+    session.add(Cart(did=2, name="other", user_id=1, system_id=2, library_id=1))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def add_order(session, did, cart_id=1, locations=(), **kwargs):
+    session.add(
+        Order(
+            did=did,
+            cart_id=cart_id,
+            wlo=f"wlo{did:010}",
+            audn_id=3,
+            lang_id=1,
+            matType_id=1,
+            vendor_id=1,
+            resource=Resource(
+                title=f"title {did}", price_disc=Decimal("9.99"), **kwargs
+            ),
+            locations=[
+                OrderLocation(
+                    branch_id=branch_id, shelfcode_id=shelf, fund_id=1, qty=qty
+                )
+                for branch_id, shelf, qty in locations
+            ],
+        )
+    )
+
+
+def test_cart_marc_orders(session, tmpdir):
+    add_order(session, 2, locations=[(74, 1, 2), (75, 2, 1)], isbn="9780000000002")
+    add_order(session, 1, locations=[(76, None, 3)], author="author")
+    add_order(session, 3, cart_id=2, locations=[(74, 1, 1)])
+    session.commit()
+
+    instrument_engine(session.bind)
+    with profile_session(log_fh=str(tmpdir.join("profile.jsonl"))) as profile:
+        orders = list(cart_marc_orders(session, 1, 2, "05-01-2024"))
+
+    assert profile.queries == 2
+    assert [o.wlo for o in orders] == ["wlo0000000001", "wlo0000000002"]
+    first, second = orders
+    assert (first.mat_bib, first.mat_ord, first.vendor) == ("a", "b", "nv")
+    assert (first.audn, first.lang, first.order_date) == ("a", "ara", "05-01-2024")
+    assert first.copies == "3"
+    assert first.locs == "ba/3"
+    assert first.funds == "10001adb/3"
+    assert first.resource.author == "author"
+    assert second.copies == "3"
+    assert second.locs == "agafc/2,alwl/1"
+    assert second.funds == "10001adb/2,10001adb/1"
+    assert second.resource.isbn == "9780000000002"
+    assert second.resource.price_disc == Decimal("9.99")
+
+
+def test_cart_marc_orders_bpl_codes(session):
+    add_order(session, 1, cart_id=1)
+    session.commit()
+
+    (order,) = cart_marc_orders(session, 1, 1, "05-01-2024")
+
+    assert (order.mat_bib, order.mat_ord, order.vendor) == ("a", "b", "bv")
+    assert (order.copies, order.locs, order.funds) == ("0", "", "")
+
+
+@pytest.fixture
+def batch_session(session):
+    # carts 1 & 2 finalized, 3 in-works
+    session.query(Cart).update({Cart.status_id: 2})
+    session.add(Cart(did=3, name="draft", user_id=1, system_id=2, library_id=1))
+    add_order(session, 1, locations=[(74, 1, 1)])
+    add_order(session, 2, locations=[(75, 1, 2)])
+    add_order(session, 3, cart_id=2, locations=[(76, 1, 1)])
+    add_order(session, 4, cart_id=3)
+    session.commit()
+    return session
+
+
+def read_wlos(fh):
+    with open(fh, "rb") as file:
+        return [bib["001"].data for bib in MARCReader(file)]
+
+
+@pytest.mark.parametrize("fast_serializer", [True, False])
+def test_export_carts_to_marc_combined(batch_session, tmpdir, fast_serializer):
+    fh = str(tmpdir.join("week.mrc"))
+    progress = []
+
+    report = export_carts_to_marc(
+        batch_session,
+        [2, 1],
+        fh,
+        max_workers=2,
+        progress=lambda *args: progress.append(args),
+        fast_serializer=fast_serializer,
+    )
+
+    # output in cart order
+    assert read_wlos(fh) == ["wlo0000000003", "wlo0000000001", "wlo0000000002"]
+    assert [(e.cart_id, e.name, e.orders, e.file, e.error) for e in report] == [
+        (2, "other", 1, fh, None),
+        (1, "cart", 2, fh, None),
+    ]
+    assert all(e.fetch_seconds > 0 and e.build_seconds > 0 for e in report)
+    assert [(done, total) for done, total, _ in progress] == [(1, 2), (2, 2)]
+    assert os.listdir(str(tmpdir)) == ["week.mrc"]
+
+
+def test_export_carts_to_marc_per_cart(batch_session, tmpdir):
+    report = export_carts_to_marc(
+        batch_session, [1, 2], str(tmpdir), combined=False, max_workers=1
+    )
+
+    assert [e.file for e in report] == [
+        str(tmpdir.join("cart.mrc")),
+        str(tmpdir.join("other.mrc")),
+    ]
+    assert read_wlos(report[0].file) == ["wlo0000000001", "wlo0000000002"]
+    assert read_wlos(report[1].file) == ["wlo0000000003"]
+
+
+def test_export_carts_to_marc_failures(batch_session, tmpdir):
+    # language is required in 008 field, build fails in worker
+    batch_session.query(Order).filter_by(did=3).update({Order.lang_id: None})
+    batch_session.commit()
+    fh = str(tmpdir.join("week.mrc"))
+
+    report = export_carts_to_marc(batch_session, [3, 2, 99, 1], fh, max_workers=2)
+
+    assert read_wlos(fh) == ["wlo0000000001", "wlo0000000002"]
+    assert [(e.cart_id, e.error) for e in report] == [
+        (3, "ValueError: Cart is not finalized."),
+        (2, 'TypeError: can only concatenate str (not "NoneType") to str'),
+        (99, "ValueError: Cart not found."),
+        (1, None),
+    ]
+    assert report[1].file is None
+
+
+class FailingWriter:
+    """writes only part of the data of the n-th write and raises"""
+
+    def __init__(self, file, fail_on):
+        self.file = file
+        self.fail_on = fail_on
+        self.writes = 0
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def write(self, data):
+        self.writes += 1
+        if self.writes == self.fail_on:
+            self.file.write(data[: len(data) // 2])
+            raise OSError("No space left on device")
+        return self.file.write(data)
+
+
+def test_export_carts_to_marc_combined_write_failure(batch_session, tmpdir, mocker):
+    @contextmanager
+    def failing_file_writer(outfile):
+        with marc_file_writer(outfile) as file:
+            yield FailingWriter(file, fail_on=2)
+
+    mocker.patch(
+        "babel.data.marc_export.marc_file_writer", side_effect=failing_file_writer
+    )
+    fh = str(tmpdir.join("week.mrc"))
+
+    report = export_carts_to_marc(batch_session, [2, 1], fh, max_workers=1)
+
+    # partial records of the failed cart are not left in the file
+    assert read_wlos(fh) == ["wlo0000000003"]
+    assert [(e.cart_id, e.error) for e in report] == [
+        (2, None),
+        (1, "OSError: No space left on device"),
+    ]
+
+
+def test_cart_file_name():
+    taken = set()
+    assert cart_file_name("week 1", taken) == "week 1.mrc"
+    assert cart_file_name("Week 1", taken) == "Week 1 (2).mrc"
+    assert cart_file_name('a/b:c?"', taken) == "a_b_c__.mrc"
+    assert cart_file_name("...", taken) == "cart.mrc"
@@ -0,0 +1,104 @@
+from decimal import Decimal
+
+from openpyxl import load_workbook
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from babel.data.datastore import (
+    create_datastore_engine,
+    initialize_datastore,
+    Cart,
+    Order,
+    OrderLocation,
+    Resource,
+)
+from babel.data.datastore_worker import cart_order_sheet_stmn
+from babel.ingest.xlsx import save2spreadsheet
+
+
+@pytest.fixture
+def session():
+    engine = create_datastore_engine("sqlite://")
+    initialize_datastore(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Cart(did=1, name="cart", user_id=1, system_id=2))
+    session.add(Cart(did=2, name="other", user_id=1, system_id=2))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def add_order(session, did, cart_id=1, qtys=(), price="9.99"):
+    session.add(
+        Order(
+            did=did,
+            cart_id=cart_id,
+            oid=f"o{did:07}",
+            resource=Resource(
+                title=f"title {did}", isbn="9780000000001", price_disc=Decimal(price)
+            ),
+            locations=[OrderLocation(qty=qty) for qty in qtys],
+        )
+    )
+
+
+def test_cart_order_sheet_stmn(session):
+    add_order(session, 2, qtys=[2, 3], price="10.50")
+    add_order(session, 1, qtys=[1])
+    add_order(session, 3)
+    add_order(session, 4, cart_id=2, qtys=[5])
+    session.commit()
+
+    rows = session.execute(cart_order_sheet_stmn(1)).all()
+
+    assert [(r.oid, r.title, r.qty, r.cost) for r in rows] == [
+        ("o0000001", "title 1", 1, Decimal("9.99")),
+        ("o0000002", "title 2", 5, Decimal("52.5")),
+        ("o0000003", "title 3", 0, Decimal("0")),
+    ]
+    assert rows[0].price == Decimal("9.99")
+    assert rows[0].isbn == "9780000000001"
+
+
+def test_save2spreadsheet(tmpdir):
+    fh = str(tmpdir.join("orders.xlsx"))
+    data = (
+        ["sku", "9780000000001", f"title {n}", "author", "9.99", 2, 19.98, None, "PO1"]
+        for n in range(3)
+    )
+
+    assert save2spreadsheet(fh, "New York Public Library", data) == 3
+
+    ws = load_workbook(fh).active
+    assert ws["A2"].value == "BookOps New York Public Library"
+    assert ws["A2"].font.b
+    assert [c.value for c in ws[6]][:3] == ["#", "SKU", "ISBN"]
+    assert ws["J6"].fill.fgColor.rgb == "00C4C5C6"
+    assert [c.value for c in ws[7]] == [
+        1,
+        "sku",
+        "9780000000001",
+        "title 0",
+        "author",
+        "9.99",
+        2,
+        19.98,
+        None,
+        "PO1",
+    ]
+    assert ws["D9"].value == "title 2"
+    assert ws["J9"].font.color.rgb == "00CC0000"
+    assert ws["C12"].value == "total copies="
+    assert ws["D12"].value == "=SUM(G7:G10)"
+    assert ws["D13"].value == "=SUM(H7:H10)"
+    assert ws.column_dimensions["D"].width == 25
+
+
+def test_save2spreadsheet_empty(tmpdir):
+    fh = str(tmpdir.join("orders.xlsx"))
+
+    assert save2spreadsheet(fh, "Brooklyn Public Library", iter([])) == 0
+
+    ws = load_workbook(fh).active
+    assert ws["D9"].value == "=SUM(G7:G7)"
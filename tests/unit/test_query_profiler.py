@@ -0,0 +1,168 @@
+import json
+import shelve
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from babel.data.datastore import (
+    apply_profiling_options,
+    create_datastore_engine,
+    dispose_data_access_layer,
+    get_data_access_layer,
+    session_scope,
+    Lang,
+)
+from babel.data.query_profiler import (
+    instrument_engine,
+    profile_session,
+    profiling_options,
+    save_profiling_options,
+    statement_shape,
+)
+
+
+@pytest.mark.parametrize(
+    "statement,expected",
+    [
+        ("SELECT a\n  FROM b WHERE c = ?", "SELECT a FROM b WHERE c = ?"),
+        (
+            "SELECT a FROM b WHERE c IN (?, ?, ?)",
+            "SELECT a FROM b WHERE c IN (?)",
+        ),
+        (
+            "SELECT a FROM b WHERE c IN (%(c_1_1)s, %(c_1_2)s)",
+            "SELECT a FROM b WHERE c IN (?)",
+        ),
+        (
+            "INSERT INTO b (a, c) VALUES (?, ?), (?, ?)",
+            "INSERT INTO b (a, c) VALUES (?)",
+        ),
+    ],
+)
+def test_statement_shape(statement, expected):
+    assert statement_shape(statement) == expected
+
+
+@pytest.fixture
+def profiled_engine():
+    engine = create_datastore_engine("sqlite://")
+    instrument_engine(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (did INTEGER PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO t VALUES (1), (2), (3)"))
+    yield engine
+    engine.dispose()
+
+
+def test_profile_session_counts_queries(profiled_engine, tmpdir):
+    log_fh = str(tmpdir.join("log", "profile.jsonl"))
+    with profile_session(threshold=3, log_fh=log_fh) as profile:
+        with profiled_engine.connect() as conn:
+            for did in range(1, 4):
+                conn.execute(text("SELECT * FROM t WHERE did = :did"), dict(did=did))
+            conn.execute(text("UPDATE t SET did = did + 10 WHERE did > 1"))
+
+    assert profile.queries == 4
+    assert profile.rows == 2
+    assert profile.db_time > 0
+    assert profile.n_plus_one() == []
+
+    with open(log_fh) as file:
+        summary = json.loads(file.readline())
+    assert summary["queries"] == 4
+    assert summary["statements"][0]["count"] in (1, 3)
+    assert summary["function"] is None
+
+
+def test_profile_session_flags_n_plus_one(profiled_engine, tmpdir, caplog):
+    log_fh = str(tmpdir.join("profile.jsonl"))
+    with profile_session(threshold=2, log_fh=log_fh) as profile:
+        with profiled_engine.connect() as conn:
+            for did in range(1, 4):
+                conn.execute(text("SELECT * FROM t WHERE did = :did"), dict(did=did))
+
+    assert profile.n_plus_one() == [("SELECT * FROM t WHERE did = ?", 3)]
+    assert "Possible N+1 query" in caplog.text
+
+
+def test_profile_session_failed_statement(profiled_engine, tmpdir):
+    with profile_session(log_fh=str(tmpdir.join("profile.jsonl"))) as profile:
+        with profiled_engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing"))
+            time.sleep(0.2)
+            conn.execute(text("SELECT * FROM t"))
+            # nothing left behind on the pooled connection
+            assert not conn.info.get("query_start")
+
+    assert profile.queries == 1
+    assert profile.db_time < 0.2
+
+
+def test_queries_outside_profile_not_recorded(profiled_engine, tmpdir):
+    with profile_session(log_fh=str(tmpdir.join("profile.jsonl"))) as profile:
+        pass
+    with profiled_engine.connect() as conn:
+        conn.execute(text("SELECT * FROM t"))
+
+    assert profile.queries == 0
+
+
+def test_profiling_options_default(dummy_user_data):
+    assert profiling_options(dummy_user_data) == dict(
+        ENABLED=False, N_PLUS_ONE_THRESHOLD=20
+    )
+
+
+def test_session_scope_profiled(dummy_user_data, tmpdir, mocker):
+    user_data = shelve.open(dummy_user_data)
+    user_data["db_config"] = dict(DB_DIALECT="sqlite")
+    user_data.close()
+    save_profiling_options(dummy_user_data, True, 5)
+    log_fh = str(tmpdir.join("profile.jsonl"))
+    mocker.patch("babel.data.query_profiler.PROFILE_LOG_PATH", log_fh)
+    dispose_data_access_layer()
+
+    try:
+        assert get_data_access_layer().profiling["ENABLED"]
+        with session_scope() as session:
+            for did in range(1, 8):
+                session.query(Lang).filter_by(did=did).one()
+
+        with open(log_fh) as file:
+            summary = json.loads(file.readline())
+        assert summary["queries"] == 7
+        assert summary["n_plus_one"][0]["count"] == 7
+    finally:
+        dispose_data_access_layer()
+
+
+def test_apply_profiling_options_keeps_engine(dummy_user_data, tmpdir, mocker):
+    user_data = shelve.open(dummy_user_data)
+    user_data["db_config"] = dict(DB_DIALECT="sqlite")
+    user_data.close()
+    save_profiling_options(dummy_user_data, False, 20)
+    log_fh = str(tmpdir.join("profile.jsonl"))
+    mocker.patch("babel.data.query_profiler.PROFILE_LOG_PATH", log_fh)
+    dispose_data_access_layer()
+
+    try:
+        dal = get_data_access_layer()
+        engine = dal.engine
+        save_profiling_options(dummy_user_data, True, 3)
+        apply_profiling_options()
+
+        assert get_data_access_layer() is dal
+        assert dal.engine is engine
+        assert dal.profiling == dict(ENABLED=True, N_PLUS_ONE_THRESHOLD=3)
+        with session_scope() as session:
+            for did in range(1, 5):
+                session.query(Lang).filter_by(did=did).one()
+
+        with open(log_fh) as file:
+            summary = json.loads(file.readline())
+        assert summary["n_plus_one"][0]["count"] == 4
+    finally:
+        dispose_data_access_layer()
@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from babel.data import datastore
+from babel.data.datastore import Base, Lang, RefVersion, Vendor, session_scope
+from babel.data.reference_data import ReferenceDataCache
+
+
+class StubDataAccessLayer:
+    def __init__(self, engine):
+        self.engine = engine
+        self.Session = sessionmaker(bind=engine)
+        self.profiling = dict(ENABLED=False, N_PLUS_ONE_THRESHOLD=20)
+
+
+@pytest.fixture
+def stub_datastore(monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(
+        engine, tables=[Lang.__table__, Vendor.__table__, RefVersion.__table__]
+    )
+    monkeypatch.setattr(datastore, "_dal", StubDataAccessLayer(engine))
+    with session_scope() as session:
+        session.add(Lang(did=1, code="eng", name="English"))
+        session.add(Lang(did=2, code="spa", name="Spanish"))
+    return engine
+
+
+def test_ref_versions_bumped_on_change(stub_datastore):
+    with session_scope() as session:
+        rec = session.query(RefVersion).filter_by(name="lang").one()
+        assert rec.version == 1
+
+        session.add(Lang(did=3, code="pol", name="Polish"))
+        session.flush()
+        session.expire_all()
+        rec = session.query(RefVersion).filter_by(name="lang").one()
+        assert rec.version == 2
+
+
+def test_cache_name_index(stub_datastore):
+    cache = ReferenceDataCache(check_interval=0)
+    assert cache.name_index(Lang) == {1: "English", 2: "Spanish"}
+    assert cache.code_index(Lang, name="Spanish") == {2: "spa"}
+    assert cache.record(Lang, did=1).code == "eng"
+    assert cache.record(Lang, did=5) is None
+
+
+def test_cache_not_reloaded_without_version_change(stub_datastore):
+    cache = ReferenceDataCache(check_interval=0)
+    assert len(cache.records(Lang)) == 2
+
+    # change bypassing ORM does not bump version stamp
+    stub_datastore.execute(
+        "INSERT INTO lang (did, code, name) VALUES (3, 'pol', 'Polish')"
+    )
+    assert len(cache.records(Lang)) == 2
+
+    cache.invalidate(Lang)
+    assert len(cache.records(Lang)) == 3
+
+
+def test_cache_reloaded_on_version_change(stub_datastore):
+    cache = ReferenceDataCache(check_interval=0)
+    assert cache.name_index(Lang) == {1: "English", 2: "Spanish"}
+
+    # simulates change made by another workstation
+    with session_scope() as session:
+        rec = session.query(Lang).filter_by(did=2).one()
+        rec.name = "Spanish (Castilian)"
+
+    assert cache.name_index(Lang) == {1: "English", 2: "Spanish (Castilian)"}
@@ -0,0 +1,242 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from babel.data.datastore import (
+    create_datastore_engine,
+    initialize_datastore,
+    Cart,
+    Order,
+    Sequence,
+    Wlos,
+)
+from babel.data.query_profiler import instrument_engine, profile_session
+from babel.data.sequences import (
+    allocate_blanketPO,
+    allocate_wlo_numbers,
+    assign_wlo_numbers,
+    reserve_block,
+)
+
+
+@pytest.fixture
+def engine(tmpdir):
+    # file datastore, so each thread works over its own connection
+    engine = create_datastore_engine(
+        f"sqlite:///{tmpdir.join('babeltest.db')}",
+        connect_args={"check_same_thread": False, "timeout": 30},
+    )
+    initialize_datastore(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def test_reserve_block_creates_sequence(session):
+    assert reserve_block(session, "test", 5) == 1
+    assert reserve_block(session, "test", 1) == 6
+    assert reserve_block(session, "other", 2, initial=lambda: 10) == 11
+    session.commit()
+
+    assert session.query(Sequence).filter_by(name="test").one().value == 6
+
+
+@pytest.fixture
+def session_without_sequences(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE sequence"))
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def test_reserve_block_creates_missing_sequence_table(session_without_sequences):
+    session = session_without_sequences
+
+    assert reserve_block(session, "test", 5) == 1
+    assert reserve_block(session, "test", 1) == 6
+    session.commit()
+
+    assert inspect(session.get_bind()).has_table("sequence")
+
+
+def test_allocate_wlo_numbers_without_sequence_table(
+    session_without_sequences, monkeypatch
+):
+    session = session_without_sequences
+
+    def denied(*args, **kwargs):
+        raise OperationalError("CREATE TABLE", {}, Exception("access denied"))
+
+    monkeypatch.setattr(Sequence.__table__, "create", denied)
+
+    # numbering continues after the last stored wlo number
+    assert allocate_wlo_numbers(session, 2) == ["wlo0000059511", "wlo0000059512"]
+
+
+def test_reserve_block_invalid_quantity(session):
+    with pytest.raises(ValueError):
+        reserve_block(session, "test", 0)
+
+
+def test_reserve_block_released_on_rollback(session):
+    reserve_block(session, "test", 5)
+    session.commit()
+    reserve_block(session, "test", 5)
+    session.rollback()
+
+    assert reserve_block(session, "test", 1) == 6
+
+
+def test_allocate_wlo_numbers_continues_stored_numbers(session, tmpdir):
+    instrument_engine(session.bind)
+    with profile_session(log_fh=str(tmpdir.join("profile.jsonl"))) as profile:
+        first = allocate_wlo_numbers(session, 3)
+        second = allocate_wlo_numbers(session, 100)
+
+    assert first == ["wlo0000059511", "wlo0000059512", "wlo0000059513"]
+    assert second[0] == "wlo0000059514"
+    assert second[-1] == "wlo0000059613"
+    # presence of the sequence table is checked once per engine, the first
+    # block creates the counter from the last stored wlo number, afterwards
+    # block of any size costs UPDATE & SELECT of the counter
+    assert profile.queries == 1 + 5 + 2
+
+
+def test_allocate_wlo_numbers_none(session):
+    assert allocate_wlo_numbers(session, 0) == []
+
+
+def test_allocate_wlo_numbers_too_large(session):
+    session.add(Sequence(name="wlo", value=9999999998))
+    session.commit()
+
+    with pytest.raises(ValueError):
+        allocate_wlo_numbers(session, 2)
+
+
+def test_assign_wlo_numbers(session):
+    session.add(Cart(did=1, name="cart", user_id=1, system_id=2))
+    session.add_all([Order(did=did, cart_id=1) for did in range(1, 4)])
+    session.commit()
+
+    wlo_numbers = allocate_wlo_numbers(session, 2)
+    assert assign_wlo_numbers(session, [1, 3], wlo_numbers) == 2
+    session.commit()
+
+    assert [o.wlo for o in session.query(Order).order_by(Order.did)] == [
+        wlo_numbers[0],
+        None,
+        wlo_numbers[1],
+    ]
+    assert session.query(Wlos).count() == 3
+
+
+def test_allocate_wlo_numbers_concurrently(engine):
+    Session = sessionmaker(bind=engine)
+    workers, rounds, block_size = 8, 25, 40
+
+    def allocate(_):
+        blocks = []
+        for _ in range(rounds):
+            session = Session()
+            try:
+                wlo_numbers = allocate_wlo_numbers(session, block_size)
+                # stored wlo numbers are primary keys, duplicates would fail
+                session.bulk_insert_mappings(
+                    Wlos, [dict(did=wlo) for wlo in wlo_numbers]
+                )
+                session.commit()
+            finally:
+                session.close()
+            blocks.append(wlo_numbers)
+        return blocks
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(allocate, range(workers)))
+
+    allocated = [wlo for blocks in results for block in blocks for wlo in block]
+    total = workers * rounds * block_size
+    assert len(set(allocated)) == len(allocated) == total
+    # blocks are contiguous and together fill the sequence without gaps
+    for blocks in results:
+        for block in blocks:
+            digits = [int(wlo[3:]) for wlo in block]
+            assert digits == list(range(digits[0], digits[0] + block_size))
+    assert min(allocated) == "wlo0000059511"
+    assert max(allocated) == f"wlo{59510 + total:010}"
+
+
+def test_allocate_blanketPO(session):
+    today = date.strftime(date.today(), "%Y%m%d")
+
+    assert allocate_blanketPO(session, ["amalivre"]) == f"amalivre{today}0"
+    assert allocate_blanketPO(session, ["amalivre"]) == f"amalivre{today}1"
+    assert allocate_blanketPO(session, ["a", "b"]) == f"multivendor{today}0"
+    assert allocate_blanketPO(session, []) is None
+
+
+def test_allocate_blanketPO_continues_stored_blanketPOs(session, tmpdir):
+    today = date.strftime(date.today(), "%Y%m%d")
+    for did in range(1, 13):
+        session.add(
+            Cart(
+                did=did,
+                name=f"cart {did}",
+                user_id=1,
+                system_id=2,
+                blanketPO=f"multivendor{today}{did - 1}",
+            )
+        )
+    session.add(Cart(did=13, name="other", user_id=1, system_id=2, blanketPO="x"))
+    session.commit()
+
+    assert allocate_blanketPO(session, ["a", "b"]) == f"multivendor{today}12"
+
+    instrument_engine(session.bind)
+    with profile_session(log_fh=str(tmpdir.join("profile.jsonl"))) as profile:
+        assert allocate_blanketPO(session, ["a", "b"]) == f"multivendor{today}13"
+    # no lookups of stored blanket POs once the prefix counter exists
+    assert profile.queries == 2
+
+
+def test_allocate_blanketPO_escapes_vendor_code(session):
+    today = date.strftime(date.today(), "%Y%m%d")
+    session.add(
+        Cart(did=1, name="cart", user_id=1, system_id=2, blanketPO=f"abc{today}5")
+    )
+    session.commit()
+
+    assert allocate_blanketPO(session, ["a_c"]) == f"a_c{today}0"
+    assert allocate_blanketPO(session, ["abc"]) == f"abc{today}6"
+
+
+def test_allocate_blanketPO_drops_previous_days_counters(session):
+    today = date.strftime(date.today(), "%Y%m%d")
+    session.add_all(
+        [
+            Sequence(name="wlo", value=10),
+            Sequence(name="blanketPO:amalivre20200101", value=3),
+            Sequence(name="blanketPO:multivendor20200102", value=1),
+            Sequence(name=f"blanketPO:multivendor{today}", value=4),
+        ]
+    )
+    session.commit()
+
+    assert allocate_blanketPO(session, ["amalivre"]) == f"amalivre{today}0"
+    assert sorted(name for (name,) in session.query(Sequence.name)) == [
+        f"blanketPO:amalivre{today}",
+        f"blanketPO:multivendor{today}",
+        "wlo",
+    ]
+    assert allocate_blanketPO(session, ["a", "b"]) == f"multivendor{today}5"
@@ -0,0 +1,70 @@
+from openpyxl import Workbook
+import pytest
+
+from babel.ingest.xlsx import SheetReader
+
+
+@pytest.fixture
+def sheet(tmpdir):
+    def make(rows):
+        fh = str(tmpdir.join("vendor.xlsx"))
+        wb = Workbook()
+        ws = wb.active
+        for row in rows:
+            ws.append(row)
+        wb.save(fh)
+        return fh
+
+    return make
+
+
+def test_sheet_reader(sheet):
+    fh = sheet(
+        [
+            ["Vendor sheet"],
+            ["title", "author", None, "isbn"],
+            ["Foo", None, None, "9780000000001"],
+            ["Bar", "Spam"],
+            [],
+            [],
+        ]
+    )
+
+    reader = SheetReader(fh)
+
+    assert (reader.max_row, reader.max_column, reader.range) == (4, 4, "A1:D4")
+    assert not reader.truncated
+    assert list(reader) == [
+        ["Vendor sheet", None, None, None],
+        ["title", "author", None, "isbn"],
+        ["Foo", None, None, "9780000000001"],
+        ["Bar", "Spam", None, None],
+    ]
+
+
+def test_sheet_reader_max_rows(sheet):
+    fh = sheet([[f"title {n}", n] for n in range(100)] + [[1, 2, 3, 4, 5]])
+
+    reader = SheetReader(fh, max_rows=10)
+
+    assert reader.truncated
+    assert (reader.max_row, reader.max_column) == (10, 2)
+    rows = list(reader)
+    assert rows[0] == ["title 0", 0]
+    assert rows[-1] == ["title 9", 9]
+
+
+def test_sheet_reader_exact_max_rows(sheet):
+    fh = sheet([[n] for n in range(10)])
+
+    reader = SheetReader(fh, max_rows=10)
+
+    assert not reader.truncated
+    assert reader.max_row == 10
+
+
+def test_sheet_reader_empty(sheet):
+    reader = SheetReader(sheet([]))
+
+    assert (reader.max_row, reader.max_column) == (0, 1)
+    assert list(reader) == []
@@ -4,6 +4,7 @@ import shelve
 
 import pytest
 from bookops_nypl_platform import PlatformToken
+from bookops_nypl_platform.errors import BookopsPlatformError
 
 
 from babel import paths
@@ -36,6 +37,16 @@ def test_closing_platform_session(
     user_data.close()
 
 
+def test_new_session(mock_platform):
+    with mock_platform.new_session() as session:
+        assert session is not mock_platform
+        assert session.library == mock_platform.library
+        assert session.branch_idx is mock_platform.branch_idx
+        # token is copied, refreshing it does not affect other sessions
+        assert session.authorization is not mock_platform.authorization
+        assert session.authorization.token_str == mock_platform.authorization.token_str
+
+
 @pytest.mark.parametrize("arg", [[], "foo", 1])
 def test_invalid_library_arg(caplog, arg, dummy_user_data, mock_vault):
     with caplog.at_level(logging.ERROR):
@@ -338,3 +349,37 @@ def test_get_bib_and_item_data_error(mock_platform, mock_platform_error):
     with does_not_raise():
         result = mock_platform.get_bib_and_item_data("21742979")
         assert result == (None, None)
+
+
+def test_search_many_success(
+    monkeypatch, mock_platform, mock_platform_session_get_list_response_200http
+):
+    monkeypatch.setattr(
+        "babel.sierra_adapters.platform.NypPlatform._has_matching_location",
+        lambda *args: True,
+    )
+    result = mock_platform.search_many(["1517908019", "9780000000000"])
+    assert result == {
+        "1517908019": (True, "21776219,21742979"),
+        "9780000000000": (False, None),
+    }
+
+
+def test_search_many_no_matches_at_all(
+    mock_platform, mock_platform_session_response_404http_not_found
+):
+    result = mock_platform.search_many(["9781517908010", "9780000000000"])
+    assert result == {"9781517908010": (False, None), "9780000000000": (False, None)}
+
+
+def test_search_many_exception(caplog, mock_platform, mock_platform_error):
+    with caplog.at_level(logging.WARNING):
+        result = mock_platform.search_many(["9781517908010"])
+
+    assert result == {"9781517908010": (None, None)}
+    assert "Encountered problem with Platform request. Skipping." in caplog.text
+
+
+def test_search_many_exception_raised(mock_platform, mock_platform_error):
+    with pytest.raises(BookopsPlatformError):
+        mock_platform.search_many(["9781517908010"], raise_errors=True)
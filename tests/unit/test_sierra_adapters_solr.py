@@ -3,6 +3,8 @@ import logging
 import shelve
 
 import pytest
+import requests
+from bookops_bpl_solr.session import BookopsSolrError
 
 from babel.sierra_adapters.solr import BplSolr
 from babel.errors import BabelError
@@ -32,6 +34,14 @@ def test_initiate_BplSolr(caplog, dummy_user_data):
     assert "Initiating session with BPL Solr." in caplog.text
 
 
+def test_new_session(dummy_user_data, mock_vault):
+    with BplSolr(dummy_user_data) as solr:
+        with solr.new_session() as session:
+            assert session is not solr
+            assert session.creds_fh == solr.creds_fh
+            assert session.headers["User-Agent"] == "BookOps/Babel"
+
+
 def test_get_creds(caplog, dummy_user_data, mock_vault):
     with caplog.at_level(logging.DEBUG):
         session = BplSolr(dummy_user_data)
@@ -171,3 +181,45 @@ def test_search_unsupported(caplog, dummy_user_data, mock_vault):
         in caplog.text
     )
     assert result == (False, None)
+
+
+def test_search_many_isbns(dummy_user_data, mock_solr_search_success, mock_vault):
+    with BplSolr(dummy_user_data) as solr:
+        result = solr.search_many(["9781419864179", "1419864173", "9780000000000"])
+
+    assert result == {
+        "9781419864179": (True, "11499389,11499399"),
+        "1419864173": (True, "11499389,11499399"),
+        "9780000000000": (False, None),
+    }
+
+
+def test_search_many_upcs(dummy_user_data, mock_solr_search_success, mock_vault):
+    with BplSolr(dummy_user_data) as solr:
+        result = solr.search_many(["085391200390", "000000000000"], "upc")
+
+    assert result == {
+        "085391200390": (True, "11499389,11499399"),
+        "000000000000": (False, None),
+    }
+
+
+def test_search_many_not_found(dummy_user_data, mock_vault, mock_solr_search_not_found):
+    with BplSolr(dummy_user_data) as solr:
+        result = solr.search_many(["1419864173"], "isbn")
+
+    assert result == {"1419864173": (False, None)}
+
+
+def test_search_many_exception(caplog, monkeypatch, dummy_user_data, mock_vault):
+    def _patch(*args, **kwargs):
+        raise BookopsSolrError
+
+    monkeypatch.setattr(requests.Session, "get", _patch)
+    with BplSolr(dummy_user_data) as solr:
+        with caplog.at_level(logging.WARNING):
+            assert solr.search_many(["1419864173"]) == {"1419864173": (False, None)}
+        with pytest.raises(BookopsSolrError):
+            solr.search_many(["1419864173"], raise_errors=True)
+
+    assert "Encountered problem with Solr request. Skipping." in caplog.text
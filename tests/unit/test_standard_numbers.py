@@ -0,0 +1,75 @@
+import pytest
+
+from babel.sierra_adapters.standard_numbers import (
+    batched_matches,
+    match_keywords,
+    standard_number_forms,
+)
+
+
+@pytest.mark.parametrize(
+    "arg,expectation",
+    [
+        ("1517908019", {"1517908019", "9781517908010"}),
+        ("978-1-5179-0801-0", {"1517908019", "9781517908010"}),
+        ("080442957x", {"080442957X", "9780804429573"}),
+        ("9791032305690", {"9791032305690"}),
+        ("085391200390", {"085391200390", "0085391200390"}),
+        ("0085391200390", {"085391200390", "0085391200390"}),
+        ("0 85391 20039 0", {"085391200390", "0085391200390"}),
+        ("9781517908010 (pbk.)", {"1517908019", "9781517908010"}),
+        ("1517908019 (v. 1 : alk. paper)", {"1517908019", "9781517908010"}),
+        ("085391200390 : DVD", {"085391200390", "0085391200390"}),
+    ],
+)
+def test_standard_number_forms(arg, expectation):
+    assert standard_number_forms(arg) == expectation
+
+
+def test_match_keywords():
+    bibs = [
+        ("21776219", ["9781517908010", "1517908019"]),
+        ("21742979", ["1517908019"]),
+        ("21742980", None),
+        ("21742981", ["085391200390"]),
+    ]
+    assert match_keywords(["9781517908010", "085391200390", "9780000000000"], bibs) == {
+        "9781517908010": (True, "21776219,21742979"),
+        "085391200390": (True, "21742981"),
+        "9780000000000": (False, None),
+    }
+
+
+def test_batched_matches_splits_truncated_batches():
+    requests = []
+
+    def search(keywords):
+        requests.append(keywords)
+        bibs = [(f"b{kw[-3:]}", [kw]) for kw in keywords if kw.endswith("0")]
+        return bibs[:2], len(bibs) > 2
+
+    keywords = [f"9780000000{n:03}" for n in range(0, 80, 10)]
+    result = batched_matches(search, keywords)
+
+    assert result == {kw: (True, f"b{kw[-3:]}") for kw in keywords}
+    assert [len(r) for r in requests] == [8, 4, 2, 2, 4, 2, 2]
+
+
+def test_match_keywords_qualified_standard_numbers():
+    bibs = [
+        ("21776219", ["9781517908010 (pbk.)"]),
+        ("21742979", ["1517908019 (hardcover : alk. paper)"]),
+        ("21742981", ["0085391200390"]),
+        ("21742982", ["0 85391 20039 0 (widescreen)"]),
+    ]
+    assert match_keywords(["9781517908010", "085391200390"], bibs) == {
+        "9781517908010": (True, "21776219,21742979"),
+        "085391200390": (True, "21742981,21742982"),
+    }
+
+
+def test_match_keywords_single_keyword_attributes_all_bibs():
+    bibs = [("21776219", ["9781517908010"]), ("21742979", None), ("21742980", ["x"])]
+    assert match_keywords(["9781517908010"], bibs) == {
+        "9781517908010": (True, "21776219,21742979,21742980")
+    }